@@ -7,6 +7,7 @@ import numpy as np
 from chat_engine.data_models.runtime_data.data_store import DataStore, DataStoreType
 from chat_engine.data_models.runtime_data.event_model import EventData
 from chat_engine.data_models.runtime_data.time_unit_type import TimeUnitType
+from engine_utils.audio_format import AUDIO_DTYPE, convert_audio
 
 
 @dataclass
@@ -33,15 +34,19 @@ class DataBundleEntry:
     time_unit: TimeUnitType = TimeUnitType.NONE
     channel_axis: Optional[int] = field(default=None)
     channel_names: Optional[List[str]] = field(default=None)
+    # 声明数据类型时，写入的数组在 set_data 时转换为该类型（类型一致时不复制），读取方无需再判断
+    dtype: Optional[str] = field(default=None)
 
     @staticmethod
-    def create_audio_entry(name: str, channel_num: int, sample_rate: int) -> "DataBundleEntry":
+    def create_audio_entry(name: str, channel_num: int, sample_rate: int,
+                           dtype: str = AUDIO_DTYPE) -> "DataBundleEntry":
         return DataBundleEntry(
             name=name,
             shape=[channel_num, VariableSize()],
             time_axis=1,
             sample_rate=sample_rate,
             time_unit=TimeUnitType.AUDIO_SAMPLE,
+            dtype=dtype,
         )
 
     @staticmethod
@@ -276,6 +281,11 @@ class DataBundle:
         return True
 
     def set_array_data(self, name: str, entry: DataBundleEntry, data: np.ndarray):
+        if entry.dtype is not None and data.dtype != entry.dtype:
+            if entry.time_unit == TimeUnitType.AUDIO_SAMPLE:
+                data = convert_audio(data, entry.dtype)
+            else:
+                data = data.astype(entry.dtype)
         timed_axis_size = entry.get_time_axis_size(data.shape)
         if timed_axis_size is None or timed_axis_size <= 0:
             raise RuntimeError(f"Dimension mismatch: {name}: {data.shape} is not valid")
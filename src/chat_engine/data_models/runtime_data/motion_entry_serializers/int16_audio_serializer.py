@@ -5,6 +5,7 @@ import numpy as np
 from chat_engine.data_models.runtime_data.motion_data_descriptors import MotionDataDescription, BufferDescription
 from chat_engine.data_models.runtime_data.motion_entry_serializer_base import BaseMotionEntrySerializer, \
     EntrySerializeResult
+from engine_utils.audio_format import to_int16
 
 
 class MotionEntryAudioInt16Serializer(BaseMotionEntrySerializer):
@@ -23,10 +24,7 @@ class MotionEntryAudioInt16Serializer(BaseMotionEntrySerializer):
                 buffer_descriptor=buffer_descriptor,
             )
         out_descriptor = BufferDescription.model_validate(buffer_descriptor.model_dump())
-        out_data = data
-        if data.dtype in (np.float16, np.float32, np.float64):
-            out_data = data * 32767
-        out_data = out_data.astype(np.int16)
+        out_data = to_int16(data)
         out_descriptor.data_type = str(out_data.dtype)
         result = EntrySerializeResult(
             data=out_data.tobytes(),
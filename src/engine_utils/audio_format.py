@@ -0,0 +1,59 @@
+from typing import Union
+
+import numpy as np
+
+
+# 引擎内部音频的约定格式：float32，取值 [-1, 1]，形状为 [声道数, 采样数]，采样率由 DataBundleEntry 声明；
+# 只在边界（网络、算法、编解码）处转换，中间各环节直接传递数组或其视图
+AUDIO_DTYPE = "float32"
+INT16_SCALE = 32767
+
+
+def to_float32(audio: Union[np.ndarray, bytes, bytearray, memoryview]) -> np.ndarray:
+    """
+    转换为 float32，已是 float32 时原样返回（不复制）；int16 数组或 PCM 字节只分配一次输出
+    """
+    if not isinstance(audio, np.ndarray):
+        audio = np.frombuffer(audio, dtype=np.int16)
+    if audio.dtype == np.float32:
+        return audio
+    if audio.dtype == np.int16:
+        return np.multiply(audio, np.float32(1 / INT16_SCALE), dtype=np.float32)
+    return audio.astype(np.float32)
+
+
+def to_int16(audio: Union[np.ndarray, bytes, bytearray, memoryview]) -> np.ndarray:
+    """
+    转换为 int16，已是 int16 时原样返回（不复制）；浮点数组缩放后在临时数组上原地截断，再转换一次
+    """
+    if not isinstance(audio, np.ndarray):
+        return np.frombuffer(audio, dtype=np.int16)
+    if audio.dtype == np.int16:
+        return audio
+    if audio.dtype.kind == "f":
+        scaled = np.multiply(audio, INT16_SCALE, dtype=np.float32)
+        np.clip(scaled, -INT16_SCALE - 1, INT16_SCALE, out=scaled)
+        return scaled.astype(np.int16)
+    return audio.astype(np.int16)
+
+
+def convert_audio(audio: np.ndarray, dtype: Union[str, np.dtype]) -> np.ndarray:
+    dtype = np.dtype(dtype)
+    if audio.dtype == dtype:
+        return audio
+    if dtype == np.float32:
+        return to_float32(audio)
+    if dtype == np.int16:
+        return to_int16(audio)
+    return audio.astype(dtype)
+
+
+def as_channel_first(audio: np.ndarray, channel_num: int = 1) -> np.ndarray:
+    """
+    一维音频或 [N, 1] 等单声道布局转为 [channel_num, N] 的视图
+    """
+    if audio.ndim == 2 and audio.shape[0] == channel_num:
+        return audio
+    if channel_num == 1:
+        return audio.reshape(1, -1)
+    return audio.reshape(-1, channel_num).T
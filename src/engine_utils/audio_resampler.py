@@ -0,0 +1,198 @@
+import functools
+import math
+from typing import Tuple
+
+import numpy as np
+
+
+# 每侧 sinc 过零点数与 kaiser 窗参数，阻带约 -80dB
+_NUM_ZEROS = 16
+_ROLLOFF = 0.945
+_KAISER_BETA = 8.6
+# 相位数不超过该值时逐相位计算，否则按组分段做矩阵乘法
+_PHASE_LOOP_MAX_UP = 8
+# 按组计算时每段的输出数，段越长稠密矩阵中的零越多
+_GROUP_SIZE = 32
+
+
+@functools.lru_cache(maxsize=32)
+def _polyphase_filter(up: int, down: int) -> Tuple[np.ndarray, int, int, int]:
+    """
+    按升采样倍数 up、降采样倍数 down 设计 kaiser 窗 sinc 低通，并拆成 up 个相位，
+    返回 (相位滤波器 [up, taps], 半长 half_length（升采样域样本）, 每相位抽头数 taps, 输出延迟 delay（输出样本）)
+    """
+    factor = max(up, down)
+    cutoff = 0.5 * _ROLLOFF / factor
+    half_length = int(math.ceil(_NUM_ZEROS * factor / _ROLLOFF))
+    taps = int(math.ceil((2 * half_length + 1) / up))
+    offsets = np.arange(taps * up, dtype=np.float64) - half_length
+    window = np.zeros(taps * up, dtype=np.float64)
+    window[:2 * half_length + 1] = np.kaiser(2 * half_length + 1, _KAISER_BETA)
+    prototype = 2 * cutoff * np.sinc(2 * cutoff * offsets) * window * up
+    # phase_filters[r, k] 对应升采样域偏移 (taps - 1 - k) * up + r - half_length，按输入时间顺序排列，可直接与输入窗口做点积
+    phase_filters = np.ascontiguousarray(prototype.reshape(taps, up).T[:, ::-1].astype(np.float32))
+    phase_filters.setflags(write=False)
+    # 多延迟一个输入周期，使前 n 个输入恰好能产出 ceil(n * up / down) 个输出
+    delay = int(math.ceil((half_length + up) / down))
+    return phase_filters, half_length, taps, delay
+
+
+@functools.lru_cache(maxsize=1024)
+def _block_filters(up: int, down: int, residue: int) -> Tuple[Tuple[np.ndarray, int], ...]:
+    """
+    （去掉延迟后的）输出 m 满足 m % up == residue 时，从 m 开始的一组 up 个输出每 _GROUP_SIZE 个一段，
+    每段对应一个稠密滤波矩阵 [span, 段长]，与长 span 的输入窗口相乘即得到这一段输出；
+    返回各段的矩阵与其首个输入窗口相对输出 residue 所在组的位置
+    """
+    phase_filters, half_length, taps, _ = _polyphase_filter(up, down)
+    positions = (residue + np.arange(up)) * down + half_length
+    last_inputs = positions // up
+    windows = last_inputs - taps + 1
+    phases = positions - last_inputs * up
+    filters = []
+    for start in range(0, up, _GROUP_SIZE):
+        group = np.arange(start, min(start + _GROUP_SIZE, up))
+        first_window = int(windows[group[0]])
+        block_filter = np.zeros((int(windows[group[-1]]) - first_window + taps, len(group)), dtype=np.float32)
+        rows = (windows[group] - first_window)[:, np.newaxis] + np.arange(taps)
+        block_filter[rows, np.arange(len(group))[:, np.newaxis]] = phase_filters[phases[group]]
+        block_filter.setflags(write=False)
+        filters.append((block_filter, first_window))
+    return tuple(filters)
+
+
+class StreamingResampler:
+    """
+    有状态的流式多相重采样器，分块输入的结果与整段一次重采样一致，块边界处没有截断伪影：
+    - 滤波器按采样率对缓存，同一采样率对的所有实例共享
+    - 保留上一块末尾的输入作为下一块的历史；同一相位的输出对应的输入窗口是等间隔的，
+      相位少时在滑动窗口视图上按相位各做一次矩阵乘法，不复制输入；相位多（如 22050 -> 24000 的 160 个相位）时
+      把相邻相位按段合成稠密滤波矩阵，每段一次矩阵乘法算出所有组的输出
+    - trim_delay 为 True 时去掉滤波器延迟，输出与输入对齐，尾部在 flush 时输出，总长度为 ceil(n * target / orig)；
+      为 False 时输出固定延迟 delay 个样本，每块输出长度严格按采样率比例，适合按固定时长切片的场景
+    """
+
+    def __init__(self, orig_sr: int, target_sr: int, trim_delay: bool = True):
+        self.orig_sr = orig_sr
+        self.target_sr = target_sr
+        self.trim_delay = trim_delay
+        gcd = math.gcd(orig_sr, target_sr)
+        self.up = target_sr // gcd
+        self.down = orig_sr // gcd
+        self.passthrough = self.up == self.down
+        if not self.passthrough:
+            self._phase_filters, self._half_length, self._taps, self.delay = _polyphase_filter(self.up, self.down)
+        else:
+            self.delay = 0
+        self.reset()
+
+    def reset(self):
+        self._input_count = 0
+        self._next_output = 0
+        if self.passthrough:
+            return
+        # 起始之前视为静音，预填足够的零作为第一个输出的历史
+        padding = self._taps + int(math.ceil(self.delay * self.down / self.up)) + 1
+        self._buffer = np.zeros(padding, dtype=np.float32)
+        self._buffer_start = -padding
+
+    def process(self, audio: np.ndarray) -> np.ndarray:
+        """
+        输入一维音频块，返回当前可以输出的重采样结果（float32）
+        """
+        audio = np.asarray(audio).reshape(-1)
+        if self.passthrough:
+            return audio.astype(np.float32, copy=False)
+        if len(audio) == 0:
+            return np.zeros(0, dtype=np.float32)
+        # int16 等输入在拼接时直接转换写入新缓冲，不单独分配一份 float32 副本
+        buffer = np.empty(len(self._buffer) + len(audio), dtype=np.float32)
+        buffer[:len(self._buffer)] = self._buffer
+        buffer[len(self._buffer):] = audio
+        self._buffer = buffer
+        self._input_count += len(audio)
+        output_end = -(-self._input_count * self.up // self.down)
+        return self._compute(output_end)
+
+    def flush(self) -> np.ndarray:
+        """
+        以静音补齐滤波器尾部，输出剩余样本并重置状态
+        """
+        if self.passthrough:
+            self.reset()
+            return np.zeros(0, dtype=np.float32)
+        output_end = -(-self._input_count * self.up // self.down) + self.delay
+        padding = int(math.ceil(self.delay * self.down / self.up)) + self._taps + 1
+        self._buffer = np.concatenate([self._buffer, np.zeros(padding, dtype=np.float32)])
+        output = self._compute(output_end)
+        self.reset()
+        return output
+
+    def _compute(self, output_end: int) -> np.ndarray:
+        output_start = max(self._next_output, self.delay if self.trim_delay else 0)
+        count = max(0, output_end - output_start)
+        output = np.zeros(count, dtype=np.float32)
+        if count > 0:
+            if self.up <= _PHASE_LOOP_MAX_UP:
+                self._compute_phases(output, output_start)
+            else:
+                self._compute_blocks(output, output_start)
+        self._next_output = max(self._next_output, output_end)
+        # 丢弃之后不会再用到的历史
+        first_needed = ((self._next_output - self.delay) * self.down + self._half_length) // self.up - self._taps
+        drop = first_needed - self._buffer_start
+        if drop > 0:
+            self._buffer = self._buffer[drop:]
+            self._buffer_start += drop
+        return output
+
+    def _compute_phases(self, output: np.ndarray, output_start: int):
+        # 输出 m 与 m + up 相位相同，输入窗口相差 down 个样本，在滑动窗口视图上按相位各做一次矩阵乘法，不复制输入
+        windows = np.lib.stride_tricks.sliding_window_view(self._buffer, self._taps)
+        for offset in range(min(self.up, len(output))):
+            position = (output_start + offset - self.delay) * self.down + self._half_length
+            last_input = position // self.up
+            phase = position - last_input * self.up
+            first_window = last_input - self._taps + 1 - self._buffer_start
+            count = len(range(offset, len(output), self.up))
+            rows = windows[first_window:first_window + (count - 1) * self.down + 1:self.down]
+            output[offset::self.up] = np.einsum("mk,k->m", rows, self._phase_filters[phase])
+
+    def _compute_blocks(self, output: np.ndarray, output_start: int):
+        # 相位很多时逐相位计算的调用开销占主导：连续 up 个输出为一组，各组输入窗口间隔 down 个样本，
+        # 组内每段输出在所有组上一次矩阵乘法算完
+        count = len(output)
+        residue = (output_start - self.delay) % self.up
+        group_start = (output_start - self.delay - residue) // self.up * self.down - self._buffer_start
+        filters = _block_filters(self.up, self.down, residue)
+        last_filter, last_window = filters[-1]
+        blocks = max(0, min(count // self.up,
+                            (len(self._buffer) - group_start - last_window - last_filter.shape[0]) // self.down + 1))
+        if blocks > 0:
+            grouped = output[:blocks * self.up].reshape(blocks, self.up)
+            stride = self._buffer.strides[0]
+            offset = 0
+            for block_filter, first_window in filters:
+                # 相邻窗口重叠，BLAS 不能直接使用重叠的跨步视图，先复制
+                inputs = np.ndarray((blocks, block_filter.shape[0]), dtype=np.float32, buffer=self._buffer,
+                                    offset=(group_start + first_window) * stride, strides=(stride * self.down, stride))
+                grouped[:, offset:offset + block_filter.shape[1]] = np.ascontiguousarray(inputs) @ block_filter
+                offset += block_filter.shape[1]
+        # 不足一组的尾部逐个取窗口
+        rest = np.arange(blocks * self.up, count)
+        if len(rest) > 0:
+            positions = (output_start + rest - self.delay) * self.down + self._half_length
+            last_inputs = positions // self.up
+            rows = self._buffer[(last_inputs - self._taps + 1 - self._buffer_start)[:, np.newaxis]
+                                + np.arange(self._taps)]
+            output[rest] = np.einsum("mk,mk->m", rows, self._phase_filters[positions - last_inputs * self.up])
+
+
+def resample(audio: np.ndarray, orig_sr: int, target_sr: int) -> np.ndarray:
+    """
+    整段重采样，输出长度为 ceil(len(audio) * target_sr / orig_sr)
+    """
+    if orig_sr == target_sr:
+        return np.asarray(audio, dtype=np.float32)
+    resampler = StreamingResampler(orig_sr, target_sr)
+    return np.concatenate([resampler.process(audio), resampler.flush()])
@@ -0,0 +1,83 @@
+from typing import List
+
+import av
+import numpy as np
+from loguru import logger
+
+
+class StreamingAudioDecoder:
+    """
+    增量解码压缩音频流（默认 MP3）：每收到一段字节就解析出完整帧并解码为 float32 PCM，
+    按 chunk_ms 凑成固定长度的分块输出，不需要等整段音频下载完成
+    """
+
+    def __init__(self, sample_rate: int, codec_name: str = "mp3", chunk_ms: float = 160):
+        self.sample_rate = sample_rate
+        self.chunk_samples = max(1, int(sample_rate * chunk_ms / 1000))
+        self.decoded_samples = 0
+        self.skipped_packets = 0
+        self._codec = av.CodecContext.create(codec_name, "r")
+        self._resampler = av.AudioResampler(format="flt", layout="mono", rate=sample_rate)
+        self._pieces: List[np.ndarray] = []
+        self._buffered = 0
+
+    def _decode_packet(self, packet):
+        try:
+            frames = self._codec.decode(packet)
+        except av.error.InvalidDataError:
+            # ID3 标签等非音频数据
+            self.skipped_packets += 1
+            return
+        for frame in frames:
+            self._append_frames(self._resampler.resample(frame))
+
+    def _append_frames(self, frames):
+        for frame in frames:
+            samples = frame.to_ndarray().reshape(-1)
+            if len(samples) == 0:
+                continue
+            self._pieces.append(samples)
+            self._buffered += len(samples)
+            self.decoded_samples += len(samples)
+
+    def _take_chunks(self, final: bool) -> List[np.ndarray]:
+        if self._buffered < self.chunk_samples and not (final and self._buffered > 0):
+            return []
+        samples = np.concatenate(self._pieces) if len(self._pieces) > 1 else self._pieces[0]
+        chunk_count = len(samples) // self.chunk_samples
+        if final:
+            split_points = [index * self.chunk_samples for index in range(1, chunk_count + 1)
+                            if index * self.chunk_samples < len(samples)]
+            chunks = np.split(samples, split_points)
+            rest = samples[:0]
+        else:
+            end = chunk_count * self.chunk_samples
+            chunks = np.split(samples[:end], chunk_count)
+            rest = samples[end:]
+        self._pieces = [rest] if len(rest) > 0 else []
+        self._buffered = len(rest)
+        return [chunk[np.newaxis, ...] for chunk in chunks]
+
+    def feed(self, data: bytes) -> List[np.ndarray]:
+        """
+        放入一段压缩数据，返回已凑满的 (1, chunk_samples) 分块
+        """
+        if data:
+            for packet in self._codec.parse(data):
+                self._decode_packet(packet)
+        return self._take_chunks(final=False)
+
+    def flush(self) -> List[np.ndarray]:
+        """
+        数据结束，解码缓冲中的剩余帧并输出全部剩余样本，最后一块可能不足 chunk_samples
+        """
+        try:
+            for packet in self._codec.parse(b""):
+                self._decode_packet(packet)
+            self._decode_packet(None)
+            self._append_frames(self._resampler.resample(None))
+        except av.error.EOFError:
+            pass
+        except Exception as e:
+            logger.warning(f"flush audio decoder failed: {e}")
+        return self._take_chunks(final=True)
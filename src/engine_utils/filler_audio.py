@@ -0,0 +1,338 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+from pydantic import BaseModel, Field
+
+from chat_engine.common.handler_base import HandlerDataInfo
+from chat_engine.contexts.handler_context import HandlerContext
+from chat_engine.data_models.chat_data.chat_data_model import ChatData
+from chat_engine.data_models.chat_data_type import ChatDataType
+from chat_engine.data_models.runtime_data.data_bundle import DataBundle, DataBundleDefinition
+
+
+DEFAULT_FILLER_PHRASES = ["嗯，", "好的，我想一下。", "嗯，让我想想。"]
+
+
+class FillerAudioLibrary:
+    """
+    一个音色的填充语音（“嗯”、“好的，我想一下”等），由 TTS handler 在后台用自身的合成方法生成，
+    合成经过 TTS 缓存，重启后直接从磁盘缓存读取
+    """
+
+    def __init__(self, phrases: List[str], sample_rate: int):
+        self.phrases = [phrase for phrase in phrases if len(phrase.strip()) > 0]
+        self.sample_rate = sample_rate
+        self._clips: List[np.ndarray] = []
+        self._next_index = 0
+        self._lock = threading.Lock()
+        self.ready = threading.Event()
+
+    def prepare(self, synthesize: Callable[[str], Optional[np.ndarray]]):
+        start_time = time.monotonic()
+        clips = []
+        for phrase in self.phrases:
+            try:
+                audio = synthesize(phrase)
+            except Exception as e:
+                logger.warning(f"synthesize filler {phrase} failed: {e}")
+                continue
+            if audio is None:
+                continue
+            audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+            if len(audio) > 0:
+                clips.append(audio)
+        with self._lock:
+            self._clips = clips
+        self.ready.set()
+        logger.info(f"prepared {len(clips)} filler clips in {round((time.monotonic() - start_time) * 1e3)} ms")
+
+    def prepare_async(self, synthesize: Callable[[str], Optional[np.ndarray]]) -> threading.Thread:
+        thread = threading.Thread(target=self.prepare, args=(synthesize,), name="filler_prepare", daemon=True)
+        thread.start()
+        return thread
+
+    def next_clip(self) -> Optional[np.ndarray]:
+        """
+        轮流取用，避免连续几轮都是同一句
+        """
+        with self._lock:
+            if len(self._clips) == 0:
+                return None
+            clip = self._clips[self._next_index % len(self._clips)]
+            self._next_index += 1
+            return clip
+
+
+@dataclass
+class _FillerTurn:
+    speech_id: Any
+    start_time: float
+    clip: Optional[np.ndarray] = None
+    position: int = 0
+    emit_start_time: float = 0.0
+    finished: bool = False
+
+
+@dataclass
+class FillerTurnStats:
+    speech_id: Any
+    first_audio_ms: float
+    filler_ms: float
+    timeout: bool = False
+
+
+@dataclass
+class FillerStats:
+    turn_count: int = 0
+    filler_turn_count: int = 0
+    timeout_count: int = 0
+    filler_seconds: float = 0.0
+    first_audio_seconds: float = 0.0
+    recent_turns: List[FillerTurnStats] = field(default_factory=list)
+
+
+class FillerAudioPlayer:
+    """
+    每个会话一个，在用户说完（human_text_end）后计时：
+    - delay_ms 内没有输出真实音频时，按实时速度分块输出一段填充语音（最多领先播放 chunk_ms），speech_id 与本轮回答相同，
+      数字人按普通语音驱动口型
+    - 真实音频到达时停止输出，填充语音接下来 fade_ms 的内容淡出后叠加到真实音频开头，实现交叉淡化
+    - 上一段语音仍在输出时不插入填充语音；超过 max_wait_ms 仍没有真实音频时输出结束标记
+    emit(audio, speech_id, speech_end) 负责把 (1, N) 的音频发送出去，需标记为填充音频，不再经过 on_output
+    """
+
+    def __init__(self, library: FillerAudioLibrary, emit: Callable[[np.ndarray, Any, bool], None],
+                 delay_ms: int = 800, chunk_ms: int = 100, fade_ms: int = 60, max_wait_ms: int = 10000,
+                 name: str = "filler"):
+        self.library = library
+        self.emit = emit
+        self.sample_rate = library.sample_rate
+        self.delay = delay_ms / 1000
+        self.chunk_samples = max(1, int(self.sample_rate * chunk_ms / 1000))
+        self.fade_samples = int(self.sample_rate * fade_ms / 1000)
+        self.max_wait = max_wait_ms / 1000
+        self.stats = FillerStats()
+        self._turn: Optional[_FillerTurn] = None
+        self._active_speech_id = None
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def start_turn(self, speech_id):
+        with self._condition:
+            if self._active_speech_id is not None and self._active_speech_id != speech_id:
+                # 上一段回答还在输出，数字人没有静默，不需要填充
+                self._turn = None
+                return
+            self._turn = _FillerTurn(speech_id=speech_id, start_time=time.monotonic())
+            self._condition.notify_all()
+
+    def cancel(self):
+        with self._condition:
+            self._turn = None
+
+    def on_output(self, speech_id, audio: np.ndarray, speech_end: bool) -> np.ndarray:
+        """
+        TTS 输出真实音频前调用，返回需要输出的音频（可能叠加了填充语音的淡出部分）
+        """
+        with self._condition:
+            self._active_speech_id = None if speech_end else speech_id
+            turn = self._turn
+            if turn is None or turn.speech_id != speech_id:
+                return audio
+            self._turn = None
+            if turn.clip is not None and not turn.finished and self.fade_samples > 0:
+                audio = self._crossfade(turn.clip[turn.position:turn.position + self.fade_samples], audio)
+            self._record_turn(turn, turn.position, timeout=False)
+        return audio
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._turn = None
+            self._condition.notify_all()
+
+    @staticmethod
+    def _crossfade(tail: np.ndarray, audio: np.ndarray) -> np.ndarray:
+        length = min(len(tail), audio.shape[-1])
+        if length == 0:
+            return audio
+        mixed = np.array(audio, dtype=np.float32, copy=True)
+        fade_in = np.linspace(0.0, 1.0, length, dtype=np.float32)
+        mixed[..., :length] = mixed[..., :length] * fade_in + tail[:length] * fade_in[::-1]
+        return mixed
+
+    def _record_turn(self, turn: _FillerTurn, filler_samples: int, timeout: bool):
+        first_audio = time.monotonic() - turn.start_time
+        filler_seconds = filler_samples / self.sample_rate
+        self.stats.turn_count += 1
+        if filler_samples > 0:
+            self.stats.filler_turn_count += 1
+            self.stats.filler_seconds += filler_seconds
+        if timeout:
+            self.stats.timeout_count += 1
+        else:
+            self.stats.first_audio_seconds += first_audio
+        turn_stats = FillerTurnStats(speech_id=turn.speech_id, first_audio_ms=round(first_audio * 1e3),
+                                     filler_ms=round(filler_seconds * 1e3), timeout=timeout)
+        self.stats.recent_turns = (self.stats.recent_turns + [turn_stats])[-20:]
+        if filler_samples > 0 or timeout:
+            logger.info(f"filler turn {turn_stats}")
+
+    def get_stats(self) -> Dict[str, float]:
+        answered = self.stats.turn_count - self.stats.timeout_count
+        return {
+            "turns": self.stats.turn_count,
+            "filler_turns": self.stats.filler_turn_count,
+            "timeouts": self.stats.timeout_count,
+            "filler_seconds": round(self.stats.filler_seconds, 3),
+            "mean_first_audio_ms": round(self.stats.first_audio_seconds / answered * 1e3) if answered > 0 else 0,
+        }
+
+    def _run(self):
+        while True:
+            with self._condition:
+                output = self._next_output()
+            if output is None:
+                return
+            # emit 可能经下游在其他线程回到 on_output / start_turn，释放锁后再调用；
+            # 取块时已推进 position，期间到达的真实音频从下一块开始淡化
+            try:
+                self.emit(*output)
+            except Exception as e:
+                logger.error(f"emit filler audio failed: {e}")
+
+    def _next_output(self) -> Optional[Tuple[np.ndarray, Any, bool]]:
+        """
+        持有锁调用，等到下一块需要输出的填充语音并返回 (audio, speech_id, speech_end)，关闭时返回 None
+        """
+        while not self._closed:
+            turn = self._turn
+            if turn is None:
+                self._condition.wait()
+                continue
+            now = time.monotonic()
+            if now - turn.start_time >= self.max_wait:
+                self._turn = None
+                self._record_turn(turn, turn.position, timeout=True)
+                if turn.position > 0:
+                    # 已播放填充语音，结束本段语音，避免数字人一直处于说话状态
+                    return np.zeros(shape=(1, 240), dtype=np.float32), turn.speech_id, True
+                continue
+            if turn.finished:
+                self._condition.wait(turn.start_time + self.max_wait - now)
+                continue
+            if turn.clip is None:
+                wait = turn.start_time + self.delay - now
+                if wait > 0:
+                    self._condition.wait(wait)
+                    continue
+                turn.clip = self.library.next_clip()
+                if turn.clip is None:
+                    # 填充语音还没准备好，本轮不填充
+                    self._turn = None
+                    continue
+                turn.emit_start_time = now
+            # 已输出的内容播放完才输出下一块，保持最多领先播放一个分块
+            next_time = turn.emit_start_time + turn.position / self.sample_rate
+            if next_time > now:
+                self._condition.wait(next_time - now)
+                continue
+            chunk = turn.clip[turn.position:turn.position + self.chunk_samples]
+            turn.position += len(chunk)
+            turn.finished = turn.position >= len(turn.clip)
+            return chunk[np.newaxis, ...], turn.speech_id, False
+        return None
+
+
+class FillerConfig(BaseModel):
+    """
+    TTS handler 配置中填充语音相关的字段，各 TTSConfig 继承
+    """
+    # 用户说完后超过 filler_delay_ms 仍没有合成音频时，先播放一句预合成的填充语音，真实音频到达时交叉淡出
+    enable_filler: bool = Field(default=False)
+    filler_phrases: List[str] = Field(default_factory=lambda: list(DEFAULT_FILLER_PHRASES))
+    filler_delay_ms: int = Field(default=800)
+    filler_fade_ms: int = Field(default=60)
+
+
+class FillerContextMixin:
+    """
+    TTS 会话上下文混入：真实音频输出前通知填充语音播放器停止填充，并与填充语音交叉淡化
+    """
+    filler_player: Optional[FillerAudioPlayer] = None
+
+    def submit_data(self, data):
+        if self.filler_player is not None and isinstance(data, DataBundle) \
+                and not data.get_meta("avatar_audio_filler", False):
+            audio = data.get_main_data()
+            output_audio = self.filler_player.on_output(
+                data.get_meta("speech_id"), audio, data.get_meta("avatar_speech_end", False))
+            if output_audio is not audio:
+                data.set_main_data(output_audio)
+        super().submit_data(data)
+
+
+class FillerAudioSupport:
+    """
+    TTS handler 中填充语音的公共接线，handler 只需提供整段合成方法（返回一维 float32 音频）和输出定义：
+    load 时 create，get_handler_detail 中 add_inputs，start_context / handle / destroy_context 中调用对应方法
+    """
+
+    def __init__(self, config: FillerConfig, sample_rate: int, synthesize: Callable[[str], Optional[np.ndarray]],
+                 name: str):
+        self.name = name
+        self.delay_ms = config.filler_delay_ms
+        self.fade_ms = config.filler_fade_ms
+        self.library = FillerAudioLibrary(config.filler_phrases, sample_rate)
+        self.library.prepare_async(synthesize)
+
+    @classmethod
+    def create(cls, config, sample_rate: int, synthesize: Callable[[str], Optional[np.ndarray]],
+               name: str) -> Optional["FillerAudioSupport"]:
+        if not isinstance(config, FillerConfig) or not config.enable_filler:
+            return None
+        return cls(config, sample_rate, synthesize, name)
+
+    @staticmethod
+    def add_inputs(inputs: Dict[ChatDataType, HandlerDataInfo]):
+        # 用户说完即开始计时
+        inputs[ChatDataType.HUMAN_TEXT] = HandlerDataInfo(
+            type=ChatDataType.HUMAN_TEXT,
+        )
+
+    def start_context(self, context: HandlerContext, output_definition: DataBundleDefinition):
+        def emit_filler(audio: np.ndarray, speech_id, speech_end: bool):
+            output = DataBundle(output_definition)
+            output.set_main_data(audio)
+            output.add_meta("avatar_speech_end", speech_end)
+            output.add_meta("avatar_audio_filler", True)
+            output.add_meta("speech_id", speech_id)
+            context.submit_data(output)
+
+        context.filler_player = FillerAudioPlayer(
+            self.library, emit_filler, delay_ms=self.delay_ms, fade_ms=self.fade_ms,
+            name=f"{self.name}_filler_{context.session_id}")
+
+    @staticmethod
+    def handle(context: HandlerContext, inputs: ChatData) -> bool:
+        """
+        处理用户文本输入，返回 True 表示输入已处理，handler 不需要继续处理
+        """
+        if inputs.type != ChatDataType.HUMAN_TEXT:
+            return False
+        player = getattr(context, "filler_player", None)
+        if player is not None and inputs.data.get_meta("human_text_end", False):
+            player.start_turn(inputs.data.get_meta("speech_id") or context.session_id)
+        return True
+
+    def destroy_context(self, context: HandlerContext):
+        player = getattr(context, "filler_player", None)
+        if player is not None:
+            player.close()
+            logger.info(f"{self.name} filler {player.get_stats()}")
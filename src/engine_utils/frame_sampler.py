@@ -0,0 +1,240 @@
+import base64
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from io import BytesIO
+from typing import Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+import PIL.Image
+from loguru import logger
+
+
+# 所有会话共享的编码线程池，缩放和 JPEG 编码不占用 handler 线程
+_encode_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="frame_encoder")
+
+
+def normalize_frame(video_frame: np.ndarray) -> Optional[np.ndarray]:
+    """
+    去掉 batch 维度并转换为 uint8 的 (H, W, 3) 数组，浮点数据按 [0, 1] 处理
+    """
+    frame = np.squeeze(video_frame)
+    if frame.ndim != 3 or frame.shape[-1] != 3:
+        return None
+    if frame.dtype != np.uint8:
+        frame = (np.clip(frame, 0.0, 1.0) * 255.0).astype(np.uint8)
+    return frame
+
+
+class SampledFrame:
+    """
+    被采样器选中的关键帧，缩放后的图像和编码结果在后台生成并缓存，重复发送不会重复编码
+    """
+
+    def __init__(self, frame: np.ndarray, timestamp, difference: float, max_side: int,
+                 jpeg_quality: int, pre_encode: bool):
+        self.timestamp = timestamp
+        self.difference = difference
+        self.consumed = False
+        self.encode_time = 0.0
+        self._frame = frame
+        self._max_side = max_side
+        self._jpeg_quality = jpeg_quality
+        self._image: Optional[PIL.Image.Image] = None
+        self._encoded: Dict[Tuple[str, int], bytes] = {}
+        self._base64: Dict[Tuple[str, int], str] = {}
+        self._lock = threading.Lock()
+        self._future: Future = _encode_executor.submit(self._prepare, pre_encode)
+
+    def _prepare(self, pre_encode: bool):
+        start_time = time.monotonic()
+        # 摄像头输出为 BGR，PIL 使用 RGB
+        image = PIL.Image.fromarray(self._frame[..., ::-1])
+        if self._max_side > 0 and max(image.size) > self._max_side:
+            scale = self._max_side / max(image.size)
+            image = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+                                 PIL.Image.BILINEAR)
+        self._image = image
+        self._frame = None
+        with self._lock:
+            self.encode_time += time.monotonic() - start_time
+        if pre_encode:
+            self.get_base64()
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self.get_image().size
+
+    def get_image(self) -> PIL.Image.Image:
+        """
+        返回缩放后的 RGB 图像，后台处理未完成时等待
+        """
+        if self._image is None:
+            self._future.result()
+        return self._image
+
+    def get_bytes(self, format: str = "JPEG", quality: Optional[int] = None) -> bytes:
+        """
+        返回编码后的图像数据，同一格式只编码一次
+        """
+        if quality is None:
+            quality = self._jpeg_quality
+        key = (format, quality)
+        encoded = self._encoded.get(key)
+        if encoded is not None:
+            return encoded
+        image = self.get_image()
+        with self._lock:
+            encoded = self._encoded.get(key)
+            if encoded is not None:
+                return encoded
+            start_time = time.monotonic()
+            buffered = BytesIO()
+            image.save(buffered, format=format, quality=quality)
+            encoded = buffered.getvalue()
+            self._encoded[key] = encoded
+            self.encode_time += time.monotonic() - start_time
+        return encoded
+
+    def get_base64(self, format: str = "JPEG", quality: Optional[int] = None) -> str:
+        if quality is None:
+            quality = self._jpeg_quality
+        key = (format, quality)
+        encoded = self._base64.get(key)
+        if encoded is None:
+            encoded = base64.b64encode(self.get_bytes(format, quality)).decode("ascii")
+            self._base64[key] = encoded
+        return encoded
+
+    def get_data_url(self, format: str = "JPEG", quality: Optional[int] = None) -> str:
+        return f"data:image/{format.lower()};base64,{self.get_base64(format, quality)}"
+
+
+class FrameSampler:
+    """
+    按帧间差异选择关键帧：每帧只计算一张小灰度缩略图与上一关键帧比较，
+    差异超过 diff_threshold（归一化到 [0, 1]）且距上一关键帧至少 min_interval_ms 时才保留，
+    保留的帧缩放到 max_side 并在后台预编码。
+    """
+
+    def __init__(self, max_side: int = 768, diff_threshold: float = 0.04, min_interval_ms: float = 200,
+                 max_frames: int = 16, jpeg_quality: int = 75, pre_encode: bool = True, thumbnail_size: int = 32):
+        self.max_side = max_side
+        self.diff_threshold = diff_threshold
+        self.min_interval = min_interval_ms / 1000.0
+        self.jpeg_quality = jpeg_quality
+        self.pre_encode = pre_encode
+        self.thumbnail_size = thumbnail_size
+        self.frames: Deque[SampledFrame] = deque(maxlen=max_frames)
+        self.latest: Optional[SampledFrame] = None
+        self._last_thumbnail: Optional[np.ndarray] = None
+        self._last_accept_time = 0.0
+        self.pushed_count = 0
+        self.accepted_count = 0
+        self._turn_frames = 0
+        self._turn_bytes = 0
+        self._turn_encode_time = 0.0
+
+    def _thumbnail(self, frame: np.ndarray) -> np.ndarray:
+        step_y = max(1, frame.shape[0] // self.thumbnail_size)
+        step_x = max(1, frame.shape[1] // self.thumbnail_size)
+        return frame[::step_y, ::step_x].mean(axis=-1, dtype=np.float32)
+
+    def push(self, video_frame: np.ndarray, timestamp=None) -> Optional[SampledFrame]:
+        """
+        放入一帧，被选为关键帧时返回 SampledFrame，否则返回 None
+        """
+        if video_frame is None:
+            return None
+        frame = normalize_frame(video_frame)
+        if frame is None:
+            return None
+        self.pushed_count += 1
+        now = time.monotonic()
+        if self._last_thumbnail is not None and now - self._last_accept_time < self.min_interval:
+            return None
+        thumbnail = self._thumbnail(frame)
+        if self._last_thumbnail is None or self._last_thumbnail.shape != thumbnail.shape:
+            difference = 1.0
+        else:
+            difference = float(np.abs(thumbnail - self._last_thumbnail).mean()) / 255.0
+            if difference < self.diff_threshold:
+                return None
+        self._last_thumbnail = thumbnail
+        self._last_accept_time = now
+        sampled = SampledFrame(frame, timestamp, difference, self.max_side, self.jpeg_quality, self.pre_encode)
+        self.frames.append(sampled)
+        self.latest = sampled
+        self.accepted_count += 1
+        return sampled
+
+    def count_between(self, start_time=None, end_time=None) -> int:
+        return len(self._window(start_time, end_time))
+
+    def _window(self, start_time, end_time) -> List[SampledFrame]:
+        return [frame for frame in self.frames if not frame.consumed
+                and (start_time is None or frame.timestamp >= start_time)
+                and (end_time is None or frame.timestamp < end_time)]
+
+    def select(self, max_count: Optional[int] = None, start_time=None, end_time=None) -> List[SampledFrame]:
+        """
+        选出时间窗口内尚未使用的关键帧，超过 max_count 时保留最新一帧和差异最大的帧，按时间顺序返回；
+        窗口内及更早的帧都会被标记为已使用
+        """
+        window = self._window(start_time, end_time)
+        for frame in self.frames:
+            if end_time is None or frame.timestamp < end_time:
+                frame.consumed = True
+        if max_count is None or len(window) <= max_count:
+            return window
+        if max_count <= 0:
+            return []
+        latest = window[-1]
+        candidates = sorted(window[:-1], key=lambda frame: frame.difference, reverse=True)[:max_count - 1]
+        selected = set(id(frame) for frame in candidates)
+        return [frame for frame in window[:-1] if id(frame) in selected] + [latest]
+
+    def select_or_latest(self, max_count: Optional[int] = None, start_time=None, end_time=None) -> List[SampledFrame]:
+        """
+        与 select 相同，但窗口内没有新的关键帧（画面静止）时沿用最近的关键帧，
+        保证模型每次都能拿到当前画面
+        """
+        frames = self.select(max_count, start_time, end_time)
+        if len(frames) == 0 and self.latest is not None \
+                and (end_time is None or self.latest.timestamp < end_time):
+            frames = [self.latest]
+        return frames
+
+    def record_sent(self, frame: SampledFrame, encoded: Optional[str] = None):
+        """
+        记录一帧被发送，用于统计每轮发送字节数和编码耗时
+        """
+        self._turn_frames += 1
+        if encoded is not None:
+            self._turn_bytes += len(encoded)
+        self._turn_encode_time += frame.encode_time
+
+    def take_turn_stats(self) -> Dict[str, float]:
+        stats = {
+            "frames": self._turn_frames,
+            "bytes": self._turn_bytes,
+            "encode_ms": round(self._turn_encode_time * 1e3, 1),
+            "pushed": self.pushed_count,
+            "accepted": self.accepted_count,
+        }
+        self._turn_frames = 0
+        self._turn_bytes = 0
+        self._turn_encode_time = 0.0
+        return stats
+
+    def log_turn_stats(self, tag: str):
+        stats = self.take_turn_stats()
+        if stats["frames"] > 0:
+            logger.info(f"{tag} video frames sent {stats['frames']}, bytes {stats['bytes']}, "
+                        f"encode {stats['encode_ms']} ms, keyframes {stats['accepted']}/{stats['pushed']}")
+
+    def clear(self):
+        self.frames.clear()
+        self.latest = None
+        self._last_thumbnail = None
@@ -0,0 +1,155 @@
+import importlib.util
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+import httpx
+from loguru import logger
+from openai import OpenAI
+
+
+@dataclass
+class LLMClientPoolConfig:
+    max_connections: int = 8
+    keepalive_expiry: float = 120.0
+    connect_timeout: float = 5.0
+    request_timeout: float = 60.0
+    http2: bool = True
+    prewarm_connections: int = 1
+
+
+@dataclass
+class _PooledClient:
+    client: OpenAI
+    http_client: httpx.Client
+    config: LLMClientPoolConfig
+    ref_count: int = 0
+    prewarm_thread: Optional[threading.Thread] = field(default=None)
+
+
+class LLMClientPool:
+    """
+    按 (base_url, api_key) 共享的 OpenAI 客户端池，同一个端点的所有会话复用同一组 keep-alive 连接，
+    避免每个会话重新建立 TCP/TLS 连接。
+    """
+
+    def __init__(self):
+        self._clients: Dict[Tuple[str, str], _PooledClient] = {}
+        self._lock = threading.Lock()
+        self._http2_available = importlib.util.find_spec("h2") is not None
+
+    @staticmethod
+    def _make_key(base_url: Optional[str], api_key: Optional[str]) -> Tuple[str, str]:
+        return (base_url or "").rstrip("/"), api_key or ""
+
+    def _create_client(self, base_url: Optional[str], api_key: Optional[str],
+                       config: LLMClientPoolConfig) -> _PooledClient:
+        http2 = config.http2
+        if http2 and not self._http2_available:
+            logger.warning("h2 is not installed, LLM client pool falls back to HTTP/1.1 keep-alive")
+            http2 = False
+        http_client = httpx.Client(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=config.max_connections,
+                max_keepalive_connections=config.max_connections,
+                keepalive_expiry=config.keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(config.request_timeout, connect=config.connect_timeout),
+        )
+        client = OpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            http_client=http_client,
+            timeout=httpx.Timeout(config.request_timeout, connect=config.connect_timeout),
+        )
+        return _PooledClient(client=client, http_client=http_client, config=config)
+
+    def _get_or_create(self, key: Tuple[str, str], base_url: Optional[str], api_key: Optional[str],
+                       config: Optional[LLMClientPoolConfig]) -> _PooledClient:
+        pooled = self._clients.get(key)
+        if pooled is None:
+            pooled = self._create_client(base_url, api_key, config or LLMClientPoolConfig())
+            self._clients[key] = pooled
+            logger.info(f"LLM client pool created client for {key[0]}")
+        return pooled
+
+    def acquire(self, base_url: Optional[str], api_key: Optional[str],
+                config: Optional[LLMClientPoolConfig] = None) -> OpenAI:
+        """
+        获取（必要时创建）端点对应的客户端并增加引用计数，通常在 handler load 时调用，与 release 成对使用
+        """
+        key = self._make_key(base_url, api_key)
+        with self._lock:
+            pooled = self._get_or_create(key, base_url, api_key, config)
+            pooled.ref_count += 1
+            return pooled.client
+
+    def get_client(self, base_url: Optional[str], api_key: Optional[str],
+                   config: Optional[LLMClientPoolConfig] = None) -> OpenAI:
+        """
+        获取端点对应的共享客户端，不改变引用计数，供会话级 context 使用
+        """
+        key = self._make_key(base_url, api_key)
+        with self._lock:
+            return self._get_or_create(key, base_url, api_key, config).client
+
+    def prewarm(self, base_url: Optional[str], api_key: Optional[str], connection_num: Optional[int] = None):
+        """
+        在后台线程中预先建立连接，使首个会话的首次请求不再承担 TCP/TLS 握手耗时
+        """
+        key = self._make_key(base_url, api_key)
+        with self._lock:
+            pooled = self._clients.get(key)
+            if pooled is None or not key[0]:
+                return
+            if pooled.prewarm_thread is not None and pooled.prewarm_thread.is_alive():
+                return
+            if connection_num is None:
+                connection_num = pooled.config.prewarm_connections
+            connection_num = max(0, min(connection_num, pooled.config.max_connections))
+            if connection_num == 0:
+                return
+
+            def _prewarm():
+                def _touch():
+                    try:
+                        # 任意响应（包括 401/404）都说明连接已建立并进入 keep-alive 池
+                        pooled.http_client.get(f"{key[0]}/models",
+                                               headers={"Authorization": f"Bearer {key[1]}"},
+                                               timeout=pooled.config.connect_timeout * 2)
+                    except Exception as e:
+                        logger.warning(f"LLM client prewarm for {key[0]} failed: {e}")
+                workers = [threading.Thread(target=_touch, daemon=True) for _ in range(connection_num)]
+                for worker in workers:
+                    worker.start()
+                for worker in workers:
+                    worker.join()
+                logger.info(f"LLM client pool prewarmed {connection_num} connection(s) to {key[0]}")
+
+            pooled.prewarm_thread = threading.Thread(target=_prewarm, daemon=True)
+            pooled.prewarm_thread.start()
+
+    def release(self, base_url: Optional[str], api_key: Optional[str]):
+        key = self._make_key(base_url, api_key)
+        with self._lock:
+            pooled = self._clients.get(key)
+            if pooled is None:
+                return
+            pooled.ref_count -= 1
+            if pooled.ref_count > 0:
+                return
+            self._clients.pop(key)
+        pooled.http_client.close()
+        logger.info(f"LLM client pool closed client for {key[0]}")
+
+    def close_all(self):
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for pooled in clients:
+            pooled.http_client.close()
+
+
+# 全局实例
+llm_client_pool = LLMClientPool()
@@ -0,0 +1,137 @@
+from typing import List, Optional
+
+
+# 中文标点及 ! ? 换行可直接作为切分点；ASCII 的 . , 需要结合前后字符判断
+DEFAULT_HARD_PUNCTUATION = "。！？!?~\n"
+DEFAULT_SOFT_PUNCTUATION = "，、；：,;:"
+DEFAULT_ABBREVIATIONS = frozenset([
+    "mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "vs", "etc", "e.g", "i.e", "no", "inc", "ltd", "co",
+    "jan", "feb", "mar", "apr", "jun", "jul", "aug", "sep", "sept", "oct", "nov", "dec",
+])
+_CLOSING_CHARS = "\"')]}”’》」』）"
+
+
+class StreamingSentenceSegmenter:
+    """
+    流式分句器：每次只扫描新到达的文本，
+    - 第一段在达到 first_min_chars 后遇到任意标点即切分，超过 first_max_chars 仍无标点时强制切分，尽快开始合成
+    - 之后每段的最短长度从 min_chars 按 growth 倍数增长（不超过 max_chars 的一半），短句会与后面的句子合并
+    - 超过 max_chars 仍无可用标点时强制切分，英文优先在空格处切分
+    - 数字中的小数点/千分位（3.14、1,000）、常见英文缩写（Mr.、e.g.）后的句点不作为切分点
+    """
+
+    def __init__(self, first_min_chars: int = 4, first_max_chars: int = 20, min_chars: int = 8,
+                 max_chars: int = 80, growth: float = 2.0,
+                 hard_punctuation: str = DEFAULT_HARD_PUNCTUATION,
+                 soft_punctuation: str = DEFAULT_SOFT_PUNCTUATION,
+                 abbreviations=DEFAULT_ABBREVIATIONS):
+        self.first_min_chars = first_min_chars
+        self.first_max_chars = max(first_max_chars, first_min_chars)
+        self.min_chars = min_chars
+        self.max_chars = max(max_chars, min_chars)
+        self.growth = growth
+        self.hard_punctuation = set(hard_punctuation)
+        self.soft_punctuation = set(soft_punctuation)
+        self.abbreviations = abbreviations
+        self._buffer = ''
+        self._scan_pos = 0
+        self.segment_count = 0
+
+    def reset(self):
+        self._buffer = ''
+        self._scan_pos = 0
+        self.segment_count = 0
+
+    @property
+    def pending_text(self) -> str:
+        return self._buffer
+
+    def _current_min_chars(self) -> int:
+        if self.segment_count == 0:
+            return self.first_min_chars
+        grown = self.min_chars * (self.growth ** (self.segment_count - 1))
+        return int(min(grown, self.max_chars // 2))
+
+    def _current_max_chars(self) -> int:
+        return self.first_max_chars if self.segment_count == 0 else self.max_chars
+
+    def _is_break(self, text: str, index: int) -> Optional[bool]:
+        """
+        判断 index 处的字符是否为切分点，需要后续字符才能判断时返回 None
+        """
+        char = text[index]
+        if char not in ".,":
+            return char in self.hard_punctuation or char in self.soft_punctuation
+        if index + 1 >= len(text):
+            return None
+        prev_char = text[index - 1] if index > 0 else ''
+        next_char = text[index + 1]
+        if prev_char.isdigit() and next_char.isdigit():
+            return False
+        if char == ',':
+            return True
+        if not (next_char.isspace() or next_char in _CLOSING_CHARS or not next_char.isascii()):
+            # example.com、e.g 等词内句点
+            return False
+        word_start = index
+        while word_start > 0 and (text[word_start - 1].isalpha() or text[word_start - 1] == '.') \
+                and text[word_start - 1].isascii():
+            word_start -= 1
+        word = text[word_start:index]
+        if word.lower() in self.abbreviations or (len(word) == 1 and word.isupper()):
+            return False
+        return True
+
+    def _force_break_pos(self, text: str, end: int) -> int:
+        # 英文文本优先在最后一个空格处切分，避免切断单词
+        space_pos = text.rfind(' ', 0, end)
+        if space_pos >= self._current_min_chars():
+            return space_pos + 1
+        return end
+
+    def push(self, text: str) -> List[str]:
+        """
+        追加文本，返回可以送去合成的完整分段
+        """
+        segments = []
+        if not text:
+            return segments
+        buffer = self._buffer + text
+        start = 0
+        index = self._scan_pos
+        while index < len(buffer):
+            length = index + 1 - start
+            decision = self._is_break(buffer, index)
+            if decision is None:
+                break
+            if decision and length >= self._current_min_chars():
+                segments.append(buffer[start:index + 1])
+                self.segment_count += 1
+                start = index + 1
+            elif length >= self._current_max_chars():
+                end = start + self._force_break_pos(buffer[start:index + 1], length)
+                segments.append(buffer[start:end])
+                self.segment_count += 1
+                start = end
+            index += 1
+        self._buffer = buffer[start:]
+        self._scan_pos = index - start
+        return segments
+
+    def flush(self) -> Optional[str]:
+        """
+        文本结束时返回剩余的全部内容，并重置状态以便下一轮使用
+        """
+        remaining = self._buffer
+        self.reset()
+        return remaining if len(remaining) > 0 else None
+
+    def split(self, text: str) -> List[str]:
+        """
+        对完整文本分段，与逐段 push 再 flush 的结果一致
+        """
+        segments = self.push(text)
+        remaining = self.flush()
+        if remaining is not None:
+            segments.append(remaining)
+        return segments
@@ -0,0 +1,187 @@
+import threading
+import weakref
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Dict, Iterable, Optional, Set, Tuple, Union
+
+import numpy as np
+
+
+_ALIGNMENT = 64
+_SLOT_FREE = 0
+_SLOT_IN_USE = 1
+
+
+def _align(size: int) -> int:
+    return -(-size // _ALIGNMENT) * _ALIGNMENT
+
+
+@dataclass(frozen=True)
+class SharedArrayRef:
+    """
+    经进程间队列传递的数组引用：共享内存名称、槽位与数组格式，序列化后只有几十字节
+    """
+    ring_name: str
+    slot_count: int
+    slot_bytes: int
+    slot: int
+    shape: Tuple[int, ...]
+    dtype: str
+
+    @property
+    def offset(self) -> int:
+        return _align(self.slot_count) + self.slot * self.slot_bytes
+
+
+class SharedArrayRing:
+    """
+    生产者侧的共享内存环形缓冲：slot_count 个固定大小的槽位，头部每个槽位一个状态字节；
+    - pack 把数组写入一个空闲槽位并返回 SharedArrayRef，队列上只传递引用
+    - 消费者侧的视图全部被回收后由 SharedArrayReader 把槽位置回空闲
+    - 共享内存在第一次写入时按 max(slot_bytes, 数组大小) 分配；没有空闲槽位、数组放不下
+      或 slot_count 为 0 时返回数组本身，由调用方按原方式经队列传递
+    - 指定 name 时共享内存使用该名称，生产者进程被强制结束后其他进程可以按名称 unlink
+    """
+
+    def __init__(self, slot_count: int, slot_bytes: int = 0, name: Optional[str] = None):
+        self.slot_count = slot_count
+        self.slot_bytes = _align(slot_bytes)
+        self.shared_count = 0
+        self.inline_count = 0
+        self._name = name
+        self._shm: Optional[shared_memory.SharedMemory] = None
+        self._next_slot = 0
+
+    @property
+    def name(self) -> Optional[str]:
+        return self._shm.name if self._shm is not None else None
+
+    def pack(self, array: np.ndarray) -> Union[SharedArrayRef, np.ndarray]:
+        if self.slot_count <= 0:
+            return array
+        if self._shm is None:
+            self._allocate(array.nbytes)
+        slot = self._acquire_slot() if array.nbytes <= self.slot_bytes else None
+        if slot is None:
+            self.inline_count += 1
+            return array
+        ref = SharedArrayRef(ring_name=self._shm.name, slot_count=self.slot_count, slot_bytes=self.slot_bytes,
+                             slot=slot, shape=tuple(array.shape), dtype=array.dtype.str)
+        target = np.ndarray(array.shape, dtype=array.dtype, buffer=self._shm.buf, offset=ref.offset)
+        target[...] = array
+        del target
+        self._shm.buf[slot] = _SLOT_IN_USE
+        self.shared_count += 1
+        return ref
+
+    def release(self, ref: SharedArrayRef):
+        """
+        释放没有交给消费者的引用（例如清空队列时取出的引用）
+        """
+        if self._shm is not None and ref.ring_name == self._shm.name:
+            self._shm.buf[ref.slot] = _SLOT_FREE
+
+    def close(self):
+        if self._shm is None:
+            return
+        self._shm.close()
+        self._shm.unlink()
+        self._shm = None
+
+    @staticmethod
+    def unlink(name: str) -> bool:
+        """
+        按名称删除共享内存，用于生产者进程没有执行 close 就退出的情况；不存在时返回 False
+        """
+        try:
+            shm = shared_memory.SharedMemory(name=name)
+        except FileNotFoundError:
+            return False
+        shm.close()
+        shm.unlink()
+        return True
+
+    def _allocate(self, nbytes: int):
+        self.slot_bytes = max(self.slot_bytes, _align(nbytes))
+        header_bytes = _align(self.slot_count)
+        self._shm = shared_memory.SharedMemory(name=self._name, create=True, size=header_bytes + self.slot_count * self.slot_bytes)
+        self._shm.buf[:self.slot_count] = bytes(self.slot_count)
+
+    def _acquire_slot(self) -> Optional[int]:
+        # 按环的顺序从下一个槽位开始找；消费者释放顺序可能与写入顺序不同
+        for i in range(self.slot_count):
+            slot = (self._next_slot + i) % self.slot_count
+            if self._shm.buf[slot] == _SLOT_FREE:
+                self._next_slot = (slot + 1) % self.slot_count
+                return slot
+        return None
+
+
+def _release_slot(reader: "SharedArrayReader", ring_name: str, shm: shared_memory.SharedMemory, slot: int):
+    shm.buf[slot] = _SLOT_FREE
+    with reader._lock:
+        reader._outstanding[ring_name] -= 1
+        # 生产者已被替换的映射在最后一个视图回收后解除
+        if reader._outstanding[ring_name] == 0 and ring_name in reader._closing:
+            reader._closing.discard(ring_name)
+            reader._outstanding.pop(ring_name)
+            reader._rings.pop(ring_name).close()
+
+
+class SharedArrayReader:
+    """
+    消费者侧：按名称附加生产者的共享内存，把 SharedArrayRef 还原为零拷贝的 numpy 视图；
+    视图及其派生视图全部被回收时释放槽位，期间生产者不会覆盖该槽位。其他消息原样返回
+    """
+
+    def __init__(self):
+        self._rings: Dict[str, shared_memory.SharedMemory] = {}
+        self._outstanding: Dict[str, int] = {}
+        self._closing: Set[str] = set()
+        # 视图可能在任意线程、任意一次内存分配触发的回收中释放，用可重入锁
+        self._lock = threading.RLock()
+
+    def unpack(self, message):
+        if not isinstance(message, SharedArrayRef):
+            return message
+        with self._lock:
+            shm = self._rings.get(message.ring_name)
+            if shm is None:
+                shm = shared_memory.SharedMemory(name=message.ring_name)
+                self._rings[message.ring_name] = shm
+                self._outstanding[message.ring_name] = 0
+            self._outstanding[message.ring_name] += 1
+        count = int(np.prod(message.shape))
+        array = np.frombuffer(shm.buf, dtype=message.dtype, count=count, offset=message.offset)
+        # frombuffer 每次生成一个独立的 memoryview 作为 base，派生的视图都经由它引用共享内存，
+        # 它被回收即说明这一帧的视图都已不再使用
+        weakref.finalize(array.base, _release_slot, self, message.ring_name, shm, message.slot)
+        return array.reshape(message.shape)
+
+    def close_rings(self, names: Iterable[str]):
+        """
+        生产者退出或被替换后解除其共享内存的映射；仍有未回收视图的映射在视图回收后解除
+        """
+        with self._lock:
+            for name in names:
+                if name not in self._rings:
+                    continue
+                if self._outstanding[name] == 0:
+                    self._rings.pop(name).close()
+                    self._outstanding.pop(name)
+                else:
+                    self._closing.add(name)
+
+    @property
+    def ring_count(self) -> int:
+        return len(self._rings)
+
+    def close(self):
+        """
+        解除没有未回收视图的共享内存映射；仍有视图的映射保留到视图回收后随进程释放
+        """
+        with self._lock:
+            for name in list(self._rings):
+                if self._outstanding[name] == 0:
+                    self._rings.pop(name).close()
+                    self._outstanding.pop(name)
@@ -0,0 +1,211 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+from loguru import logger
+
+
+class SynthesisJob:
+    """
+    一个待合成的句子，合成结果按顺序放入 chunks 队列，结束时放入 END
+    """
+
+    END = object()
+
+    def __init__(self, text: Optional[str], speech_id, generation: int, speech_end: bool = False):
+        self.text = text
+        self.speech_id = speech_id
+        self.generation = generation
+        self.speech_end = speech_end
+        self.cancelled = False
+        self.future = None
+        self.chunks: queue.Queue = queue.Queue()
+
+    def put(self, chunk: np.ndarray):
+        self.chunks.put(chunk)
+
+    def close(self):
+        self.chunks.put(self.END)
+
+
+class SentenceSynthesisPipeline:
+    """
+    会话级的句子并行合成管线：
+    - 最多 max_parallel 个句子同时合成，输出按提交顺序重新排序后依次交给 emit
+    - cancel 时丢弃所有未输出的句子，正在合成的句子在下一个分块处停止
+    - 以输出音频的累计时长估算播放进度，分块晚于播放进度到达时记为一次欠载
+    """
+
+    def __init__(self, synthesize: Callable[[SynthesisJob], Iterable[np.ndarray]],
+                 emit: Callable[[SynthesisJob, np.ndarray], None], sample_rate: int,
+                 max_parallel: int = 3, name: str = "tts"):
+        self.synthesize = synthesize
+        self.emit = emit
+        self.sample_rate = sample_rate
+        self.name = name
+        self.underrun_count = 0
+        self.underrun_time = 0.0
+        self.cancel_count = 0
+
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_parallel), thread_name_prefix=f"{name}_synth")
+        self._jobs: queue.Queue = queue.Queue()
+        self._pending: List[SynthesisJob] = []
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._turn_stats: Dict = {}
+        self._turn_speech_id = None
+        self._playback_end: Optional[float] = None
+        self._reset_turn()
+        self._emit_thread = threading.Thread(target=self._emit_loop, daemon=True, name=f"{name}_emit")
+        self._emit_thread.start()
+
+    def _add_job(self, job: SynthesisJob) -> SynthesisJob:
+        with self._lock:
+            job.generation = self._generation
+            self._pending.append(job)
+        self._jobs.put(job)
+        return job
+
+    def submit(self, text: str, speech_id) -> SynthesisJob:
+        """
+        提交一个句子，立即返回，合成在线程池中进行
+        """
+        job = SynthesisJob(text, speech_id, self._generation)
+        self._start_turn(speech_id)
+        job.future = self._executor.submit(self._run, job)
+        return self._add_job(job)
+
+    def submit_audio(self, audio: np.ndarray, speech_id, speech_end: bool = False) -> SynthesisJob:
+        """
+        提交已有的音频（预合成结果或结束标记），与合成中的句子一起按顺序输出
+        """
+        job = SynthesisJob(None, speech_id, self._generation, speech_end=speech_end)
+        self._start_turn(speech_id)
+        job.put(audio)
+        job.close()
+        return self._add_job(job)
+
+    def has_pending(self) -> bool:
+        with self._lock:
+            return len(self._pending) > 0
+
+    def cancel(self):
+        """
+        打断：丢弃所有尚未输出的句子，结束标记保留，下游仍能收到被打断语音的结束信号
+        """
+        with self._lock:
+            self._generation += 1
+            pending = [job for job in self._pending if not job.speech_end]
+            self._pending = [job for job in self._pending if job.speech_end]
+            for job in self._pending:
+                job.generation = self._generation
+        for job in pending:
+            job.cancelled = True
+            if job.future is not None:
+                job.future.cancel()
+        if len(pending) > 0:
+            self.cancel_count += 1
+            logger.info(f"{self.name} cancelled {len(pending)} pending sentence(s)")
+        self._reset_turn()
+
+    def shutdown(self):
+        self.cancel()
+        self._jobs.put(None)
+        self._executor.shutdown(wait=False)
+
+    def _run(self, job: SynthesisJob):
+        try:
+            if job.cancelled:
+                return
+            for chunk in self.synthesize(job):
+                if job.cancelled:
+                    break
+                job.put(chunk)
+        except Exception as e:
+            logger.error(f"{self.name} synthesize {job.text} failed: {e}")
+        finally:
+            job.close()
+
+    def _start_turn(self, speech_id):
+        self._turn_speech_id = speech_id
+        if self._turn_stats["submit_time"] is None:
+            self._turn_stats["submit_time"] = time.monotonic()
+
+    def _is_current_turn(self, job: SynthesisJob) -> bool:
+        # 被打断语音的结束标记可能在下一轮开始后才输出，不能计入或清空下一轮的统计
+        return self._turn_speech_id is None or job.speech_id == self._turn_speech_id
+
+    def _reset_turn(self):
+        self._turn_speech_id = None
+        self._playback_end = None
+        self._turn_stats = {
+            "submit_time": None,
+            "first_audio_time": None,
+            "sentences": 0,
+            "underruns": 0,
+            "underrun_time": 0.0,
+        }
+
+    def _emit_loop(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            try:
+                self._emit_job(job)
+            except Exception as e:
+                logger.error(f"{self.name} emit failed: {e}")
+            with self._lock:
+                if job in self._pending:
+                    self._pending.remove(job)
+
+    def _emit_job(self, job: SynthesisJob):
+        first_chunk = True
+        while not job.cancelled and job.generation == self._generation:
+            try:
+                chunk = job.chunks.get(timeout=0.05)
+            except queue.Empty:
+                continue
+            if chunk is SynthesisJob.END:
+                break
+            now = time.monotonic()
+            self._check_underrun(job, now, first_chunk)
+            first_chunk = False
+            if job.cancelled:
+                return
+            self.emit(job, chunk)
+            duration = chunk.shape[-1] / self.sample_rate
+            self._playback_end = max(self._playback_end or now, now) + duration
+        if job.speech_end and not job.cancelled and self._is_current_turn(job):
+            self._log_turn_stats(job)
+            self._reset_turn()
+
+    def _check_underrun(self, job: SynthesisJob, now: float, first_chunk: bool):
+        if not self._is_current_turn(job):
+            return
+        stats = self._turn_stats
+        if stats["first_audio_time"] is None:
+            stats["first_audio_time"] = now
+        if job.speech_end:
+            return
+        if first_chunk:
+            stats["sentences"] += 1
+        if self._playback_end is not None and now > self._playback_end:
+            gap = now - self._playback_end
+            stats["underruns"] += 1
+            stats["underrun_time"] += gap
+            self.underrun_count += 1
+            self.underrun_time += gap
+            logger.debug(f"{self.name} playback underrun {round(gap * 1e3)} ms before {job.text}")
+
+    def _log_turn_stats(self, job: SynthesisJob):
+        stats = self._turn_stats
+        first_audio_ms = None
+        if stats["submit_time"] is not None and stats["first_audio_time"] is not None:
+            first_audio_ms = round((stats["first_audio_time"] - stats["submit_time"]) * 1e3)
+        logger.info(f"{self.name} speech {job.speech_id} sentences {stats['sentences']}, "
+                    f"first audio {first_audio_ms} ms, underruns {stats['underruns']} "
+                    f"({round(stats['underrun_time'] * 1e3)} ms)")
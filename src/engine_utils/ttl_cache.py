@@ -0,0 +1,136 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from loguru import logger
+
+
+@dataclass
+class _CacheEntry:
+    value: Any
+    expire_time: float
+    stale_expire_time: float
+
+
+class TTLCache:
+    """
+    LRU bounded cache with TTL and stale-while-revalidate.
+    - fresh entry: returned directly
+    - stale entry (expired but within stale_ttl): returned directly, a background refresh is started
+    - missing entry: loaded, concurrent loads of the same key share one in-flight fetch
+    """
+
+    def __init__(self, name: str, max_size: int = 1024, ttl: float = 300.0, stale_ttl: float = 3600.0,
+                 max_workers: int = 4):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries: OrderedDict[Hashable, _CacheEntry] = OrderedDict()
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}_loader")
+        self.hit_count = 0
+        self.stale_hit_count = 0
+        self.miss_count = 0
+
+    def _put_locked(self, key: Hashable, value: Any):
+        now = time.monotonic()
+        self._entries[key] = _CacheEntry(value=value, expire_time=now + self.ttl,
+                                         stale_expire_time=now + self.ttl + self.stale_ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._put_locked(key, value)
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.stale_expire_time < time.monotonic():
+                return None
+            return entry.value
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def _load(self, key: Hashable, loader: Callable[[], Any]):
+        try:
+            value = loader()
+            # loader 返回 None 表示本次获取失败，不写入缓存，下次继续尝试
+            if value is not None:
+                with self._lock:
+                    self._put_locked(key, value)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _submit_locked(self, key: Hashable, loader: Callable[[], Any]) -> Future:
+        future = self._inflight.get(key)
+        if future is None:
+            future = self._executor.submit(self._load, key, loader)
+            self._inflight[key] = future
+        return future
+
+    def prefetch(self, key: Hashable, loader: Callable[[], Any]) -> Optional[Future]:
+        """
+        Start an asynchronous load if the key is missing or expired, returns the in-flight future if any.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expire_time >= time.monotonic():
+                return None
+            return self._submit_locked(key, loader)
+
+    def get(self, key: Hashable, loader: Callable[[], Any], timeout: Optional[float] = None,
+            default: Any = None) -> Any:
+        """
+        Get value of key, load it by loader on miss. Waits at most timeout seconds for a missing value,
+        the load continues in background after timeout and default is returned.
+        """
+        with self._lock:
+            now = time.monotonic()
+            entry = self._entries.get(key)
+            if entry is not None and entry.expire_time >= now:
+                self._entries.move_to_end(key)
+                self.hit_count += 1
+                return entry.value
+            if entry is not None and entry.stale_expire_time >= now:
+                self._entries.move_to_end(key)
+                self.stale_hit_count += 1
+                self._submit_locked(key, loader)
+                return entry.value
+            self.miss_count += 1
+            future = self._submit_locked(key, loader)
+        try:
+            value = future.result(timeout=timeout)
+        except FutureTimeoutError:
+            logger.warning(f"[{self.name}] load of {key} not finished in {timeout}s, use default value")
+            return default
+        except Exception as e:
+            logger.error(f"[{self.name}] load of {key} failed: {e}")
+            return default
+        return default if value is None else value
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hit": self.hit_count,
+                "stale_hit": self.stale_hit_count,
+                "miss": self.miss_count,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,207 @@
+import hashlib
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Dict, Iterator, Optional
+
+import numpy as np
+from loguru import logger
+
+from engine_utils.directory_info import DirectoryInfo
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+def iter_audio_chunks(audio: np.ndarray, chunk_samples: int) -> Iterator[np.ndarray]:
+    """
+    按最后一维切分音频，chunk_samples 不大于 0 时整段输出；
+    磁盘缓存返回的内存映射按块复制，只读取用到的部分
+    """
+    length = audio.shape[-1]
+    copy = isinstance(audio, np.memmap)
+    if chunk_samples <= 0 or length <= chunk_samples:
+        yield np.array(audio) if copy else audio
+        return
+    for start in range(0, length, chunk_samples):
+        chunk = audio[..., start:start + chunk_samples]
+        yield np.array(chunk) if copy else chunk
+
+
+class TTSCache:
+    """
+    按内容寻址的合成音频缓存，键由引擎、音色、采样率和规范化后的文本计算：
+    - 内存层：LRU，总字节数不超过 memory_budget
+    - 磁盘层：每条音频一个 .npy 文件，按访问时间 LRU 淘汰，总字节数不超过 disk_budget
+    磁盘命中时返回只读的内存映射（np.memmap），调用方按块切片或复制，不整段读入内存；
+    映射不常驻内存，不放入内存层，也不占用 memory_budget，只刷新磁盘层的 LRU 顺序；
+    进程重启后磁盘层按文件修改时间恢复 LRU 顺序
+    """
+
+    def __init__(self, memory_budget: int, disk_dir: Optional[str] = None, disk_budget: int = 0):
+        self.memory_budget = memory_budget
+        self.disk_dir = disk_dir if disk_budget > 0 else None
+        self.disk_budget = disk_budget
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        if self.disk_dir is not None:
+            self._load_disk_index()
+
+    @staticmethod
+    def make_key(engine: str, voice, sample_rate: int, text: str) -> str:
+        content = f"{engine}\n{voice}\n{sample_rate}\n{normalize_text(text)}"
+        return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.npy")
+
+    def _load_disk_index(self):
+        os.makedirs(self.disk_dir, exist_ok=True)
+        entries = []
+        for entry in os.scandir(self.disk_dir):
+            if entry.is_file() and entry.name.endswith(".npy"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+        self._evict_disk()
+        if len(self._disk) > 0:
+            logger.info(f"tts cache loaded {len(self._disk)} entries ({self._disk_bytes} bytes) from {self.disk_dir}")
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return audio
+            on_disk = key in self._disk
+            if on_disk:
+                self._disk.move_to_end(key)
+        if on_disk:
+            audio = self._read_disk(key)
+            if audio is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                return audio
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _read_disk(self, key: str) -> Optional[np.ndarray]:
+        path = self._disk_path(key)
+        try:
+            audio = np.load(path, mmap_mode="r")
+            os.utime(path)
+            return audio
+        except Exception as e:
+            logger.warning(f"read tts cache {path} failed: {e}")
+            with self._lock:
+                size = self._disk.pop(key, None)
+                if size is not None:
+                    self._disk_bytes -= size
+            return None
+
+    def put(self, key: str, audio: np.ndarray):
+        if audio is None or audio.size == 0:
+            return
+        audio = np.ascontiguousarray(audio)
+        with self._lock:
+            self._put_memory(key, audio)
+            write_disk = self.disk_dir is not None and key not in self._disk and audio.nbytes <= self.disk_budget
+        if write_disk:
+            self._write_disk(key, audio)
+
+    def _put_memory(self, key: str, audio: np.ndarray):
+        if audio.nbytes > self.memory_budget:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= previous.nbytes
+        self._memory[key] = audio
+        self._memory_bytes += audio.nbytes
+        while self._memory_bytes > self.memory_budget:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted.nbytes
+            self.evictions += 1
+
+    def _write_disk(self, key: str, audio: np.ndarray):
+        path = self._disk_path(key)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                np.save(f, audio)
+            os.replace(temp_path, path)
+            size = os.path.getsize(path)
+        except Exception as e:
+            logger.warning(f"write tts cache {path} failed: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+        with self._lock:
+            self._disk[key] = size
+            self._disk_bytes += size
+            self._evict_disk()
+
+    def _evict_disk(self):
+        while self._disk_bytes > self.disk_budget and len(self._disk) > 0:
+            key, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self._disk_path(key))
+            except OSError:
+                pass
+
+    def get_stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups > 0 else 0.0,
+                "evictions": self.evictions,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+            }
+
+    def log_stats(self, tag: str):
+        stats = self.get_stats()
+        logger.info(f"{tag} tts cache hit rate {stats['hit_rate']} "
+                    f"(memory {stats['memory_hits']}, disk {stats['disk_hits']}, miss {stats['misses']}), "
+                    f"memory {stats['memory_entries']} entries {stats['memory_bytes']} bytes, "
+                    f"disk {stats['disk_entries']} entries {stats['disk_bytes']} bytes, evictions {stats['evictions']}")
+
+
+_caches: Dict[Optional[str], TTSCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_tts_cache(memory_mb: float, disk_mb: float = 0, disk_dir: Optional[str] = None) -> TTSCache:
+    """
+    使用同一磁盘目录的 TTS handler 共享一个缓存实例，以先创建者的容量配置为准；
+    disk_dir 为空时使用项目目录下的 temp/tts_cache，disk_mb 为 0 时只使用内存层
+    """
+    if disk_mb > 0:
+        disk_dir = os.path.abspath(disk_dir or os.path.join(DirectoryInfo.get_project_dir(), "temp", "tts_cache"))
+    else:
+        disk_dir = None
+    with _caches_lock:
+        cache = _caches.get(disk_dir)
+        if cache is None:
+            cache = TTSCache(int(memory_mb * 1024 * 1024), disk_dir, int(disk_mb * 1024 * 1024))
+            _caches[disk_dir] = cache
+        return cache
@@ -44,6 +44,7 @@ class ASRContext(HandlerContext):
                                           "dump_talk_audio.pcm")
             self.audio_dump_file = open(dump_file_path, "wb")
         self.shared_states = None
+        self.speculative_sent = False
 
 
 class HandlerASR(HandlerBase, ABC):
@@ -122,9 +123,21 @@ class HandlerASR(HandlerBase, ABC):
                     continue
                 context.output_audios.append(audio_segment)
 
+        if inputs.data.get_meta("human_speech_resume", False) and context.speculative_sent:
+            # 用户继续说话，通知下游丢弃推测请求
+            context.speculative_sent = False
+            yield self._create_speculative_cancel(output_definition, speech_id)
+
         speech_end = inputs.data.get_meta("human_speech_end", False)
         if not speech_end:
+            if inputs.data.get_meta("human_speech_pause", False):
+                speculative_output = self._recognize_partial(context, output_definition, speech_id)
+                if speculative_output is not None:
+                    context.speculative_sent = True
+                    yield speculative_output
             return
+        speculative_sent = context.speculative_sent
+        context.speculative_sent = False
 
         # prefill remainder audio in slice context
         remainder_audio = context.audio_slice_context.flush()
@@ -146,6 +159,8 @@ class HandlerASR(HandlerBase, ABC):
         if len(output_text) == 0:
             # 如果 ASR 识别结果为空，则需要重新开启vad
             context.shared_states.enable_vad = True
+            if speculative_sent:
+                yield self._create_speculative_cancel(output_definition, speech_id)
             return
         output = DataBundle(output_definition)
         output.set_main_data(output_text)
@@ -159,5 +174,36 @@ class HandlerASR(HandlerBase, ABC):
         end_output.add_meta("speech_id", speech_id)
         yield end_output
 
+    @staticmethod
+    def _create_speculative_cancel(output_definition, speech_id):
+        cancel_output = DataBundle(output_definition)
+        cancel_output.set_main_data('')
+        cancel_output.add_meta('human_text_end', False)
+        cancel_output.add_meta('human_text_speculative_cancel', True)
+        cancel_output.add_meta('speech_id', speech_id)
+        return cancel_output
+
+    def _recognize_partial(self, context: ASRContext, output_definition, speech_id):
+        """
+        在静音尚未达到 end_delay 时识别已收到的音频，不改变切片状态，结果标记为推测文本
+        """
+        audios = list(context.output_audios)
+        remainder_audio = context.audio_slice_context.last_remainder
+        if remainder_audio is not None and remainder_audio.shape[0] > 0:
+            audios.append(remainder_audio)
+        if len(audios) == 0:
+            return None
+        res = self.model.generate(input=np.concatenate(audios), batch_size_s=10)
+        output_text = re.sub(r"<\|.*?\|>", "", res[0]['text'])
+        if len(output_text) == 0:
+            return None
+        logger.info(f'speculative asr result {output_text}')
+        output = DataBundle(output_definition)
+        output.set_main_data(output_text)
+        output.add_meta('human_text_end', False)
+        output.add_meta('human_text_speculative', True)
+        output.add_meta('speech_id', speech_id)
+        return output
+
     def destroy_context(self, context: HandlerContext):
         pass
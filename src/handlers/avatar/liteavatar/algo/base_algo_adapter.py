@@ -27,10 +27,59 @@ class BaseAlgoAdapter(ABC):
     def mouth2full(self, mouth_image: np.ndarray, bg_frame_id: int) -> np.ndarray:
         pass
 
+    def signal2img_batch(self,
+                         signal_data_list: List[SignalType],
+                         avatar_status_list: List[AvatarStatus]) -> tuple[List[np.ndarray], List[int]]:
+        """
+        render mouth images of consecutive frames in one call,
+        adapters with batched inference should override this
+        """
+        mouth_images, bg_frame_ids = [], []
+        for signal_data, avatar_status in zip(signal_data_list, avatar_status_list):
+            mouth_image, bg_frame_id = self.signal2img(signal_data, avatar_status)
+            mouth_images.append(mouth_image)
+            bg_frame_ids.append(bg_frame_id)
+        return mouth_images, bg_frame_ids
+
+    def mouth2full_batch(self, mouth_images: List[np.ndarray], bg_frame_ids: List[int]) -> List[np.ndarray]:
+        """
+        merge mouth images of consecutive frames into their backgrounds in one call
+        """
+        return [self.mouth2full(mouth_image, bg_frame_id)
+                for mouth_image, bg_frame_id in zip(mouth_images, bg_frame_ids)]
+
     @abstractmethod
     def get_idle_signal(self, idle_frame_count) -> List[SignalType]:
         pass
 
+    def get_idle_image_count(self) -> int:
+        """
+        return number of distinct idle images, one per background frame;
+        0 if idle images can not be pre-rendered
+        """
+        return 0
+
+    def render_idle_image(self, bg_frame_id: int) -> np.ndarray:
+        """
+        return mouth image of idle signal on background frame bg_frame_id,
+        which must not depend on avatar status
+        """
+        raise NotImplementedError
+
+    def next_bg_frame_id(self) -> int:
+        """
+        advance background frame as signal2img does, for frames taken from idle cache
+        """
+        raise NotImplementedError
+
+    def create_session_adapter(self) -> "BaseAlgoAdapter":
+        """
+        return an adapter for one more session after init, sharing loaded models
+        and avatar data with this one but keeping its own per session state;
+        adapters without per session state can be shared as is
+        """
+        return self
+
     @abstractmethod
     def get_algo_config(self) -> AvatarAlgoConfig:
         """
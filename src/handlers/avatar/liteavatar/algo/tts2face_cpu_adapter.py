@@ -1,4 +1,5 @@
 
+import copy
 import os
 import shutil
 import sys
@@ -24,6 +25,7 @@ class Tts2faceCpuAdapter(BaseAlgoAdapter):
         super().__init__()
         self.tts2face = None
         self._bg_counter = None
+        self._bg_step = 1
         self.handler_root = handler_root
         if self.handler_root is None:
             self.handler_root = os.path.join(DirectoryInfo.get_project_dir(),
@@ -43,12 +45,18 @@ class Tts2faceCpuAdapter(BaseAlgoAdapter):
                 data_dir=data_dir,
                 fps=init_option.video_frame_rate
             )
-        bg_step = self.TARGET_FPS // init_option.video_frame_rate
+        self._bg_step = self.TARGET_FPS // init_option.video_frame_rate
         self.tts2face.load_dynamic_model(data_dir)
-        self._bg_counter = BgFrameCounter(len(self.tts2face.ref_img_list), bg_step)
+        self._bg_counter = BgFrameCounter(len(self.tts2face.ref_img_list), self._bg_step)
         self.warm_up()
         return super().init(init_option)
 
+    def create_session_adapter(self):
+        # models and background images are shared, background frame position is per session
+        session_adapter = copy.copy(self)
+        session_adapter._bg_counter = BgFrameCounter(len(self.tts2face.ref_img_list), self._bg_step)
+        return session_adapter
+
     @timeit
     def audio2signal(self, audio_slice):
         signal_list = self.tts2face.audio2param(
@@ -60,10 +68,32 @@ class Tts2faceCpuAdapter(BaseAlgoAdapter):
 
     @timeit
     def signal2img(self, signal_data, avatar_status: AvatarStatus):
-        bg_frame_id = self._bg_counter.get_and_update_bg_index()
+        bg_frame_id = self.next_bg_frame_id()
         mouth_img = self.tts2face.param2img(signal_data, bg_frame_id)
         return mouth_img, bg_frame_id
 
+    @timeit
+    def signal2img_batch(self, signal_data_list, avatar_status_list):
+        # liteAvatar renders a single param per call, the batch saves the per frame overhead around it
+        bg_frame_ids = [self.next_bg_frame_id() for _ in signal_data_list]
+        mouth_imgs = [self.tts2face.param2img(signal_data, bg_frame_id)
+                      for signal_data, bg_frame_id in zip(signal_data_list, bg_frame_ids)]
+        return mouth_imgs, bg_frame_ids
+
+    @timeit
+    def mouth2full_batch(self, mouth_images, bg_frame_ids):
+        return [self.tts2face.merge_mouth_to_bg(mouth_image, bg_frame_id, False)[0]
+                for mouth_image, bg_frame_id in zip(mouth_images, bg_frame_ids)]
+
+    def get_idle_image_count(self):
+        return len(self.tts2face.ref_img_list)
+
+    def render_idle_image(self, bg_frame_id):
+        return self.tts2face.param2img(self.tts2face.get_idle_param(), bg_frame_id)
+
+    def next_bg_frame_id(self):
+        return self._bg_counter.get_and_update_bg_index()
+
     @timeit
     def mouth2full(self, mouth_image, bg_frame_id, use_bg=False):
         full_img, _ = self.tts2face.merge_mouth_to_bg(mouth_image, bg_frame_id, use_bg)
@@ -7,6 +7,8 @@ import torch.multiprocessing as mp
 
 from chat_engine.data_models.runtime_data.data_bundle import DataBundleDefinition, DataBundleEntry, \
     VariableSize
+from engine_utils.audio_format import to_int16
+from engine_utils.shared_array_ring import SharedArrayReader
 from handlers.avatar.liteavatar.model.audio_input import SpeechAudio
 from chat_engine.common.handler_base import HandlerBase, HandlerDetail, HandlerBaseInfo, HandlerDataInfo, \
     ChatDataConsumeMode
@@ -27,6 +29,7 @@ class HandlerTts2Face(HandlerBase, ABC):
     def __init__(self):
         super().__init__()
         self.lite_avatar_worker_manager: Optional[LiteAvatarWorkerManager] = None
+        self.array_reader = SharedArrayReader()
         
         self.output_data_definitions: Dict[ChatDataType, DataBundleDefinition] = {}
 
@@ -43,10 +46,12 @@ class HandlerTts2Face(HandlerBase, ABC):
              handler_config: Optional[Tts2FaceConfigModel] = None):
 
         audio_output_definition = DataBundleDefinition()
+        # 算法进程输出 int16 音频，原样交给 RTC 发送，不再转换为 float32
         audio_output_definition.add_entry(DataBundleEntry.create_audio_entry(
             "avatar_audio",
             1,
             24000,
+            dtype="int16",
         ))
         audio_output_definition.lockdown()
         self.output_data_definitions[ChatDataType.AVATAR_AUDIO] = audio_output_definition
@@ -61,7 +66,7 @@ class HandlerTts2Face(HandlerBase, ABC):
         video_output_definition.lockdown()
         self.output_data_definitions[ChatDataType.AVATAR_VIDEO] = video_output_definition
         self.lite_avatar_worker_manager = LiteAvatarWorkerManager(
-            handler_config.concurrent_limit, self.handler_root, handler_config)
+            handler_config.concurrent_limit, self.handler_root, handler_config, self.array_reader)
     
     def create_context(self, session_context: SessionContext,
                        handler_config: Optional[Tts2FaceConfigModel] = None) -> HandlerContext:
@@ -73,7 +78,7 @@ class HandlerTts2Face(HandlerBase, ABC):
         if worker is None:
             raise Exception("No available lite avatar worker")
 
-        context = HandlerTts2FaceContext("session", worker, self.shared_state)
+        context = HandlerTts2FaceContext("session", worker, self.shared_state, self.array_reader)
         context.output_data_definitions = self.output_data_definitions
         return context
 
@@ -113,8 +118,8 @@ class HandlerTts2Face(HandlerBase, ABC):
         audio_entry = inputs.data.get_main_definition_entry()
         audio_array = inputs.data.get_main_data()
         if audio_array is not None:
-            if audio_array.dtype != np.int16:
-                audio_array = (audio_array * 32767).astype(np.int16)
+            # 进入算法进程前唯一一次格式转换
+            audio_array = to_int16(audio_array)
         else:
             audio_array = np.zeros([512], dtype=np.int16)
         #logger.info(f's2v: {audio_array.shape} type {type(audio_array)}')
@@ -136,6 +141,7 @@ class HandlerTts2Face(HandlerBase, ABC):
         if self.lite_avatar_worker_manager is not None:
             self.lite_avatar_worker_manager.destroy()
             self.lite_avatar_worker_manager = None
+        self.array_reader.close()
 
 
 if __name__ == "__main__":
@@ -1,11 +1,11 @@
 
 from fractions import Fraction
-from queue import Queue
+from queue import Empty, Full, Queue
 import sys
 from threading import Thread
 import threading
 import time
-from typing import List
+from typing import List, Optional
 
 import av
 import cv2
@@ -15,6 +15,8 @@ from handlers.avatar.liteavatar.algo.audio2signal_speed_limiter import Audio2Sig
 from handlers.avatar.liteavatar.algo.base_algo_adapter import BaseAlgoAdapter
 from handlers.avatar.liteavatar.media.speech_audio_processor import SpeechAudioProcessor
 from handlers.avatar.liteavatar.avatar_output_handler import AvatarOutputHandler
+from handlers.avatar.liteavatar.media.frame_time_stats import FrameTimeStats
+from handlers.avatar.liteavatar.media.idle_frame_cache import IdleFrameCache
 from handlers.avatar.liteavatar.media.video_audio_aligner import VideoAudioAligner
 from handlers.avatar.liteavatar.model.algo_model import (
     AvatarInitOption, AudioResult, AudioSlice, AvatarStatus, MouthResult, SignalResult, VideoResult)
@@ -23,9 +25,16 @@ from src.engine_utils.interval_counter import IntervalCounter
 
 
 class AvatarProcessor:
+    # interval in seconds between frame time stability logs while a session is running
+    FRAME_STATS_LOG_INTERVAL = 30
+    # idle frames are rendered just in time, only when output has fewer frames than this left
+    IDLE_LOOKAHEAD_FRAMES = 2
+
     def __init__(self,
                  algo_adapter: BaseAlgoAdapter,
-                 init_option: AvatarInitOption):
+                 init_option: AvatarInitOption,
+                 init_algo: bool = True,
+                 idle_frame_cache: Optional[IdleFrameCache] = None):
         
         ## TODO remove debugger logger
         logger.remove()
@@ -44,7 +53,7 @@ class AvatarProcessor:
         self._session_running = False
         self._audio2signal_thread: Thread = None
         self._signal2img_thread: Thread = None
-        self._mouth2full_thread: Thread = None
+        self._output_thread: Thread = None
         self._global_frame_count = 0
         self._current_audio_pts = 0     # in ms
         self._current_video_pts = 0
@@ -60,11 +69,22 @@ class AvatarProcessor:
         # statistic counter
         self._audio2signal_counter = IntervalCounter("generate signal")
         self._callback_counter = IntervalCounter("avatar callback")
+        self._frame_time_stats = FrameTimeStats(init_option.video_frame_rate)
+        self._frame_stats_log_time = 0
+        self._render_frame_count = 0
+        self._render_cpu_time = 0.0
 
         # for debug
         self._debug_mode = init_option.debug
 
-        self._init_algo()
+        # algo adapter shared with other processors in the same process is initialized by its owner
+        if init_algo:
+            self._init_algo()
+
+        # idle frames can be shared by processors with the same algo models, debug frames are drawn on and not cached
+        self.idle_frame_cache = idle_frame_cache
+        if self.idle_frame_cache is None and init_option.enable_idle_frame_cache and not self._debug_mode:
+            self.idle_frame_cache = IdleFrameCache.build(self._algo_adapter, self._compose_full_image)
 
     def start(self):
         self._session_running = True
@@ -74,18 +94,23 @@ class AvatarProcessor:
         self._session_start_time = time.time()
         self._audio2signal_counter = IntervalCounter("generate signal")
         self._callback_counter = IntervalCounter("avatar callback")
+        self._frame_time_stats.reset()
+        self._frame_stats_log_time = time.time()
+        self._render_frame_count = 0
+        self._render_cpu_time = 0.0
 
     def stop(self):
-        logger.info("stop avatar processor, totol session time {:.3f}",
-                    time.time() - self._session_start_time)
+        logger.info("stop avatar processor, totol session time {:.3f}, frame time {}, render {}",
+                    time.time() - self._session_start_time, self._frame_time_stats.summary(),
+                    self.get_render_summary())
         self._session_running = False
         self._callback_stop()
         if self._signal2img_thread is not None:
             self._signal2img_thread.join()
         if self._audio2signal_thread is not None:
             self._audio2signal_thread.join()
-        if self._mouth2full_thread is not None:
-            self._mouth2full_thread.join()
+        if self._output_thread is not None:
+            self._output_thread.join()
         logger.info("avatar processor stopped")
 
     def add_audio(self, speech_audio: SpeechAudio):
@@ -168,98 +193,130 @@ class AvatarProcessor:
 
     def _signal2img_loop(self):
         """
-        generate image and do callbacks
+        render fully composed frames, up to render_batch_size speech frames in one call;
+        pacing is applied at output, the bounded mouth image queue keeps rendering ahead in check
         """
         logger.info("signal2img loop started")
-        start_time = -1
-        timestamp = 0
-        
+        batch_size = max(1, self._init_option.render_batch_size)
+        idle_wait = 0.5 / self._init_option.video_frame_rate
+
         # delay start to ensure no extra audio and video generated
         time.sleep(0.5)
-        
+
         while self._session_running:
-            if self._signal_queue.empty():
-                # generate idle
-                signal_val = self._algo_adapter.get_idle_signal(1)[0]
-                avatar_status = AvatarStatus.LISTENING if self._last_speech_ended else AvatarStatus.SPEAKING
-                signal = SignalResult(
-                    speech_id=self._current_speech_id,
-                    end_of_speech=False,
-                    middle_data=signal_val,
-                    frame_id=0,
-                    avatar_status=avatar_status,
-                    audio_slice=self._get_idle_audio_slice(1)
-                )
+            signals = self._take_signals(batch_size)
+            if len(signals) == 0 and self._mouth_img_queue.qsize() >= self.IDLE_LOOKAHEAD_FRAMES:
+                time.sleep(idle_wait)
+                continue
+            cpu_start = time.thread_time()
+            if len(signals) == 0:
+                mouth_results = [self._render_idle_frame()]
             else:
-                signal: SignalResult = self._signal_queue.get_nowait()
-
-            out_image, bg_frame_id = self._algo_adapter.signal2img(signal.middle_data, signal.avatar_status)
-            # create mouth result
-            mouth_result = MouthResult(
-                speech_id=signal.speech_id,
-                mouth_image=out_image,
-                bg_frame_id=bg_frame_id,
-                end_of_speech=signal.end_of_speech,
-                avatar_status=signal.avatar_status,
-                audio_slice=signal.audio_slice,
-                global_frame_id=self._global_frame_count
-            )
-            
-            self._global_frame_count += 1
+                mouth_results = self._render_signals(signals)
+            self._render_cpu_time += time.thread_time() - cpu_start
+            self._render_frame_count += len(mouth_results)
+            for mouth_result in mouth_results:
+                self._put_mouth_result(mouth_result)
 
-            self._mouth_img_queue.put(mouth_result)
-            self._callback_counter.add_property("signal2img")
+        logger.info("signal2img loop ended")
 
-            if start_time == -1:
-                start_time = time.time()
-                timestamp = 0
-            else:
-                timestamp += 1 / self._init_option.video_frame_rate
-                wait = start_time + timestamp - time.time()
-                if wait > 0:
-                    time.sleep(wait)
+    def _take_signals(self, batch_size: int) -> List[SignalResult]:
+        signals = []
+        while len(signals) < batch_size:
+            try:
+                signals.append(self._signal_queue.get_nowait())
+            except Empty:
+                break
+        return signals
+
+    def _render_idle_frame(self) -> MouthResult:
+        avatar_status = AvatarStatus.LISTENING if self._last_speech_ended else AvatarStatus.SPEAKING
+        signal = SignalResult(
+            speech_id=self._current_speech_id,
+            end_of_speech=False,
+            middle_data=None,
+            frame_id=0,
+            avatar_status=avatar_status,
+            audio_slice=self._get_idle_audio_slice(1)
+        )
+        if self.idle_frame_cache is not None:
+            # idle frame is fully composed already, only background frame advances
+            bg_frame_id = self._algo_adapter.next_bg_frame_id()
+            idle_image = self.idle_frame_cache.get(bg_frame_id)
+            if idle_image is not None:
+                self._callback_counter.add_property("idle_cache")
+                return self._create_mouth_result(signal, idle_image, bg_frame_id)
+        signal.middle_data = self._algo_adapter.get_idle_signal(1)[0]
+        return self._render_signals([signal])[0]
+
+    def _render_signals(self, signals: List[SignalResult]) -> List[MouthResult]:
+        mouth_images, bg_frame_ids = self._algo_adapter.signal2img_batch(
+            [signal.middle_data for signal in signals], [signal.avatar_status for signal in signals])
+        debug_texts = None
+        if self._debug_mode:
+            debug_texts = [f"{signal.avatar_status} {self._global_frame_count + i}" for i, signal in enumerate(signals)]
+        full_images = self._compose_full_images(mouth_images, bg_frame_ids, debug_texts)
+        self._callback_counter.add_property("signal2img", len(signals))
+        return [self._create_mouth_result(signal, full_image, bg_frame_id)
+                for signal, full_image, bg_frame_id in zip(signals, full_images, bg_frame_ids)]
+
+    def _create_mouth_result(self, signal: SignalResult, full_image, bg_frame_id: int) -> MouthResult:
+        mouth_result = MouthResult(
+            speech_id=signal.speech_id,
+            mouth_image=None,
+            full_image=full_image,
+            bg_frame_id=bg_frame_id,
+            end_of_speech=signal.end_of_speech,
+            avatar_status=signal.avatar_status,
+            audio_slice=signal.audio_slice,
+            global_frame_id=self._global_frame_count
+        )
+        self._global_frame_count += 1
+        return mouth_result
 
-        logger.info("signal2img loop ended")
+    def _put_mouth_result(self, mouth_result: MouthResult):
+        while self._session_running:
+            try:
+                self._mouth_img_queue.put(mouth_result, timeout=0.1)
+                return
+            except Full:
+                continue
 
-    def _mouth2full_loop(self):
-        logger.info("combine img loop started")
+    def _output_loop(self):
+        """
+        deliver rendered frames and their audio at video frame rate
+        """
+        logger.info("output loop started")
+        start_time = -1
+        frame_index = 0
         while self._session_running:
             try:
                 mouth_reusult: MouthResult = self._mouth_img_queue.get(timeout=0.1)
-            except Exception:
+            except Empty:
                 continue
-            image = mouth_reusult.mouth_image
-            bg_frame_id = mouth_reusult.bg_frame_id
-            full_img = self._algo_adapter.mouth2full(image, bg_frame_id)
+            if start_time == -1:
+                start_time = time.time()
+            else:
+                frame_index += 1
+                wait = start_time + frame_index / self._init_option.video_frame_rate - time.time()
+                if wait > 0:
+                    time.sleep(wait)
             
             if mouth_reusult.audio_slice is not None:
-                # create audio result
-                audio_data = mouth_reusult.audio_slice.play_audio_data
-                audio_frame = av.AudioFrame.from_ndarray(
-                    np.frombuffer(audio_data, dtype=np.int16).reshape(1, -1),
-                    format="s16",
-                    layout="mono"
-                )
-                audio_time_base = Fraction(1, self._init_option.audio_sample_rate)
-                audio_frame.time_base = audio_time_base
-                audio_frame.pts = self._current_audio_pts
-                audio_frame.sample_rate = mouth_reusult.audio_slice.play_audio_sample_rate
-                self._current_audio_pts += len(audio_data) // 2
+                # create audio result, an int16 view on the slice bytes which is passed to the output as is
+                audio_data = np.frombuffer(mouth_reusult.audio_slice.play_audio_data, dtype=np.int16).reshape(1, -1)
+                self._current_audio_pts += audio_data.shape[-1]
 
                 audio_result = AudioResult(
-                    audio_frame=audio_frame,
+                    audio_data=audio_data,
+                    sample_rate=mouth_reusult.audio_slice.play_audio_sample_rate,
                     speech_id=mouth_reusult.audio_slice.speech_id
                 )
                 self._callback_audio(audio_result)
                 logger.debug("create audio with duration {:.3f}s, status: {}",
                              mouth_reusult.audio_slice.get_audio_duration(), mouth_reusult.avatar_status)
             # create video result
-            if self._debug_mode:
-                full_img = cv2.putText(
-                    full_img, f"{mouth_reusult.avatar_status} {mouth_reusult.global_frame_id}",
-                    (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-            full_img = cv2.flip(full_img, 1)
-            video_frame = av.VideoFrame.from_ndarray(full_img, format="bgr24")
+            video_frame = av.VideoFrame.from_ndarray(mouth_reusult.full_image, format="bgr24")
             video_frame.time_base = Fraction(1, self._init_option.video_frame_rate)
             video_frame.pts = self._current_video_pts
             self._current_video_pts += 1
@@ -269,21 +326,37 @@ class AvatarProcessor:
                 speech_id=mouth_reusult.speech_id,
                 avatar_status=mouth_reusult.avatar_status,
                 end_of_speech=mouth_reusult.end_of_speech,
-                bg_frame_id=bg_frame_id
+                bg_frame_id=mouth_reusult.bg_frame_id
             )
 
             self._callback_image(image_result)
+            self._record_frame_time()
             
             if self._callback_avatar_status != image_result.avatar_status and self._callback_avatar_status is not None:
                 self._callback_avatar_status_changed(mouth_reusult.speech_id, image_result.avatar_status)
             self._callback_avatar_status = image_result.avatar_status
             
-        logger.info("combine img loop ended")
+        logger.info("output loop ended")
+
+    def _compose_full_images(self, mouth_images: List[np.ndarray], bg_frame_ids: List[int],
+                             debug_texts: Optional[List[str]] = None) -> List[np.ndarray]:
+        full_images = self._algo_adapter.mouth2full_batch(mouth_images, bg_frame_ids)
+        for i, full_img in enumerate(full_images):
+            if debug_texts is not None:
+                full_img = cv2.putText(full_img, debug_texts[i], (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+            # horizontal flip as a view, the copy into the video frame handles the strides
+            full_images[i] = full_img[:, ::-1]
+        return full_images
+
+    def _compose_full_image(self, mouth_image, bg_frame_id: int):
+        return self._compose_full_images([mouth_image], [bg_frame_id])[0]
 
     def _reset_processor_status(self):
         self._audio_slice_queue = Queue()
         self._signal_queue = Queue()
-        self._mouth_img_queue = Queue()
+        # rendered frames wait here for output, bounded so that rendering stays at most a few batches ahead
+        self._mouth_img_queue = Queue(maxsize=2 * max(1, self._init_option.render_batch_size)
+                                      + self.IDLE_LOOKAHEAD_FRAMES)
         algo_config = self._algo_adapter.get_algo_config()
         self._speech_audio_processor = SpeechAudioProcessor(
             self._init_option.audio_sample_rate,
@@ -303,8 +376,28 @@ class AvatarProcessor:
         self._audio2signal_thread.start()
         self._signal2img_thread = threading.Thread(target=self._signal2img_loop)
         self._signal2img_thread.start()
-        self._mouth2full_thread = threading.Thread(target=self._mouth2full_loop)
-        self._mouth2full_thread.start()
+        self._output_thread = threading.Thread(target=self._output_loop)
+        self._output_thread.start()
+
+    def _record_frame_time(self):
+        self._frame_time_stats.record()
+        if time.time() - self._frame_stats_log_time >= self.FRAME_STATS_LOG_INTERVAL:
+            self._frame_stats_log_time = time.time()
+            logger.info("avatar frame time {}, render {}", self._frame_time_stats.summary(), self.get_render_summary())
+
+    def get_frame_time_summary(self):
+        return self._frame_time_stats.summary()
+
+    def get_render_summary(self):
+        """
+        frames rendered per cpu second of the render thread, including frames from idle cache
+        """
+        fps_per_core = self._render_frame_count / self._render_cpu_time if self._render_cpu_time > 0 else 0
+        return {
+            "frames": self._render_frame_count,
+            "cpu_s": round(self._render_cpu_time, 3),
+            "fps_per_core": round(fps_per_core, 1),
+        }
 
     def _callback_image(self, image_result: VideoResult):
         self._callback_counter.add_property("image_callback")
@@ -313,8 +406,8 @@ class AvatarProcessor:
                 output_handler.on_video(image_result)
 
     def _callback_audio(self, audio_result: AudioResult):
-        audio_frame = audio_result.audio_frame
-        self._callback_counter.add_property("audio_callback", audio_frame.samples / audio_frame.sample_rate)
+        self._callback_counter.add_property("audio_callback",
+                                            audio_result.audio_data.shape[-1] / audio_result.sample_rate)
         if self._session_running:
             for output_handler in self._output_handlers:
                 output_handler.on_audio(audio_result)
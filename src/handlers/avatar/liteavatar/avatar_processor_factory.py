@@ -1,4 +1,5 @@
 from loguru import logger
+from handlers.avatar.liteavatar.algo.base_algo_adapter import BaseAlgoAdapter
 from handlers.avatar.liteavatar.model.algo_model import AvatarInitOption
 from handlers.avatar.liteavatar.avatar_processor import AvatarProcessor
 
@@ -13,12 +14,21 @@ class AvatarProcessorFactory:
     @staticmethod
     def create_avatar_processor(handler_root: str, algo_type: AvatarAlgoType,
                                 init_option: AvatarInitOption) -> AvatarProcessor:
-        algo_adapter = None
         logger.info("create avatar processor with init option: {}", init_option)
+        algo_adapter = AvatarProcessorFactory.create_algo_adapter(handler_root, algo_type)
+        return AvatarProcessor(algo_adapter, init_option)
+
+    @staticmethod
+    def create_algo_adapter(handler_root: str, algo_type: AvatarAlgoType) -> BaseAlgoAdapter:
+        """
+        create an uninitialized algo adapter, which can be shared by several processors
+        through create_session_adapter after init
+        """
+        algo_adapter = None
         if algo_type == AvatarAlgoType.SAMPLE:
             from tests.inttest.avatar.sample_adapter import SampleAdapter
             algo_adapter = SampleAdapter()
         if algo_type == AvatarAlgoType.TTS2FACE_CPU:
             from handlers.avatar.liteavatar.algo.tts2face_cpu_adapter import Tts2faceCpuAdapter
             algo_adapter = Tts2faceCpuAdapter(handler_root)
-        return AvatarProcessor(algo_adapter, init_option)
+        return algo_adapter
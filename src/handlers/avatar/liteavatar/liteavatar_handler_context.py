@@ -10,16 +10,20 @@ from chat_engine.data_models.chat_data_type import ChatDataType
 from chat_engine.data_models.runtime_data.data_bundle import DataBundle, DataBundleDefinition
 from chat_engine.data_models.chat_data.chat_data_model import ChatData
 from chat_engine.common.engine_channel_type import EngineChannelType
-from handlers.avatar.liteavatar.liteavatar_worker import LiteAvatarWorker, Tts2FaceEvent
+from engine_utils.shared_array_ring import SharedArrayReader
+from handlers.avatar.liteavatar.liteavatar_worker import LiteAvatarSlot, Tts2FaceEvent
 
 
 class HandlerTts2FaceContext(HandlerContext):
     def __init__(self,
                  session_id: str,
-                 lite_avatar_worker: LiteAvatarWorker,
-                 shared_status):
+                 lite_avatar_worker: LiteAvatarSlot,
+                 shared_status,
+                 array_reader: SharedArrayReader):
         super().__init__(session_id)
-        self.lite_avatar_worker: LiteAvatarWorker = lite_avatar_worker
+        self.lite_avatar_worker: LiteAvatarSlot = lite_avatar_worker
+        # 算法进程经共享内存输出的音视频在这里还原为零拷贝视图
+        self.array_reader = array_reader
         self.shared_state: SharedStates = shared_status
 
         self.output_data_definitions: Dict[ChatDataType, DataBundleDefinition] = {}
@@ -39,7 +43,7 @@ class HandlerTts2FaceContext(HandlerContext):
             return
         data_bundle = DataBundle(definition)
         if chat_data_type.channel_type == EngineChannelType.AUDIO:
-            data_bundle.set_main_data(data.squeeze()[np.newaxis, ...])
+            data_bundle.set_main_data(data.reshape(1, -1))
         elif chat_data_type.channel_type == EngineChannelType.VIDEO:
             data_bundle.set_main_data(data[np.newaxis, ...])
         else:
@@ -54,8 +58,7 @@ class HandlerTts2FaceContext(HandlerContext):
             if self.lite_avatar_worker.audio_out_queue.qsize() > 0:
                 no_output = False
                 try:
-                    audio_tensor = self.lite_avatar_worker.audio_out_queue.get_nowait()
-                    audio = audio_tensor.numpy()
+                    audio = self.array_reader.unpack(self.lite_avatar_worker.audio_out_queue.get_nowait())
                     # self.rtc_audio_queue.put_nowait(audio)
                     self.return_data(audio, ChatDataType.AVATAR_AUDIO)
                     no_output = False
@@ -65,8 +68,9 @@ class HandlerTts2FaceContext(HandlerContext):
             if self.lite_avatar_worker.video_out_queue.qsize() > 0:
                 no_output = False
                 try:
-                    video_tensor = self.lite_avatar_worker.video_out_queue.get_nowait()
-                    video = video_tensor.numpy()
+                    video = self.array_reader.unpack(self.lite_avatar_worker.video_out_queue.get_nowait())
+                    if not isinstance(video, np.ndarray):
+                        video = video.numpy()
                     # self.rtc_video_queue.put_nowait(video)
                     self.return_data(video, ChatDataType.AVATAR_VIDEO)
                     no_output = False
@@ -91,7 +95,10 @@ class HandlerTts2FaceContext(HandlerContext):
     def clear(self):
         logger.info("clear tts2face context")
         self.loop_running = False
-        self.lite_avatar_worker.event_in_queue.put_nowait(Tts2FaceEvent.STOP)
-        self.media_out_thread.join()
-        self.event_out_thread.join()
-        self.lite_avatar_worker.release()
\ No newline at end of file
+        try:
+            self.lite_avatar_worker.event_in_queue.put_nowait(Tts2FaceEvent.STOP)
+            self.media_out_thread.join()
+            self.event_out_thread.join()
+        finally:
+            # worker 进入 STOPPING，算法进程处理完 STOP 后由 manager 放回空闲
+            self.lite_avatar_worker.release()
\ No newline at end of file
@@ -2,9 +2,11 @@ from loguru import logger
 import torch.multiprocessing as mp
 import threading
 import time
-from typing import Optional
+from typing import List, Optional
 from enum import Enum
 import os
+import resource
+import uuid
 import torch
 
 import sysconfig
@@ -19,6 +21,7 @@ from handlers.avatar.liteavatar.avatar_processor import AvatarProcessor
 from handlers.avatar.liteavatar.avatar_processor_factory import AvatarProcessorFactory, AvatarAlgoType
 from handlers.avatar.liteavatar.model.algo_model import AvatarInitOption, AudioResult, VideoResult, AvatarStatus
 from engine_utils.interval_counter import IntervalCounter
+from engine_utils.shared_array_ring import SharedArrayRef, SharedArrayRing
 from chat_engine.common.handler_base import HandlerBaseConfigModel
 from pydantic import BaseModel, Field
 
@@ -32,6 +35,19 @@ class Tts2FaceConfigModel(HandlerBaseConfigModel, BaseModel):
     fps: int = Field(default=25)
     enable_fast_mode: bool = Field(default=False)
     use_gpu: bool = Field(default=True)
+    # 所有 worker 并行启动，等待模型加载完成的最长时间
+    worker_start_timeout: float = Field(default=180)
+    # 进程存活与心跳检查间隔，心跳超过 heartbeat_timeout 未更新视为卡死，结束并重新拉起
+    health_check_interval: float = Field(default=2)
+    heartbeat_timeout: float = Field(default=30)
+    # 每个算法进程承载的会话数，同一进程内的会话共享已加载的模型与形象数据，各自拥有独立的处理线程与队列
+    sessions_per_process: int = Field(default=1)
+    # 每路会话输出视频帧与音频的共享内存槽位数，队列上只传递槽位引用；0 表示按原方式经队列序列化传递
+    shared_memory_slots: int = Field(default=16)
+    # 启动时为每个背景帧预先合成空闲帧，聆听状态直接取用，不再逐帧推理与贴合
+    enable_idle_frame_cache: bool = Field(default=True)
+    # 说话时每次渲染与合成的最大帧数，帧按帧率在输出时再逐帧发送
+    render_batch_size: int = Field(default=4)
 
 
 class Tts2FaceEvent(Enum):
@@ -41,12 +57,18 @@ class Tts2FaceEvent(Enum):
     LISTENING_TO_SPEAKING = 2001
     SPEAKING_TO_LISTENING = 2002
 
+# 音频共享内存槽位按 24kHz int16 两秒分配，超过的音频块经队列传递
+AUDIO_SLOT_BYTES = 24000 * 2 * 2
+
+
 class Tts2FaceOutputHandler(AvatarOutputHandler):
     def __init__(self, audio_output_queue, video_output_queue,
-                 event_out_queue):
+                 event_out_queue, audio_ring: SharedArrayRing, video_ring: SharedArrayRing):
         self.audio_output_queue = audio_output_queue
         self.video_output_queue = video_output_queue
         self.event_out_queue = event_out_queue
+        self.audio_ring = audio_ring
+        self.video_ring = video_ring
         self._video_producer_counter = IntervalCounter("video_producer")
 
     def on_start(self, init_option: AvatarInitOption):
@@ -56,17 +78,18 @@ class Tts2FaceOutputHandler(AvatarOutputHandler):
         logger.info("on algo processor stop")
 
     def on_audio(self, audio_result: AudioResult):
-        audio_frame = audio_result.audio_frame
-        audio_data = audio_frame.to_ndarray()
-        audio_tensor = torch.from_numpy(audio_data)
-        self.audio_output_queue.put_nowait(audio_tensor)
+        # int16 [1, N] 写入共享内存只发送引用，由 handler 以 int16 格式输出
+        self.audio_output_queue.put_nowait(self.audio_ring.pack(audio_result.audio_data))
 
     def on_video(self, video_result: VideoResult):
         self._video_producer_counter.add()
         video_frame = video_result.video_frame
         video_data = video_frame.to_ndarray(format="bgr24")
-        video_tensor = torch.from_numpy(video_data)
-        self.video_output_queue.put_nowait(video_tensor)
+        message = self.video_ring.pack(video_data)
+        if not isinstance(message, SharedArrayRef):
+            # 共享内存未启用或槽位都在使用中，按原方式以 tensor 传递
+            message = torch.from_numpy(video_data)
+        self.video_output_queue.put_nowait(message)
 
     def on_avatar_status_change(self, speech_id, avatar_status: AvatarStatus):
         logger.info(f"Avatar status changed: {speech_id} {avatar_status}")
@@ -77,12 +100,34 @@ class Tts2FaceOutputHandler(AvatarOutputHandler):
 class WorkerStatus(Enum):
     IDLE = 1001
     BUSY = 1002
- 
+    # 进程已启动，模型尚未加载完成
+    STARTING = 1003
+    # 会话已结束，等待算法进程处理完 STOP
+    STOPPING = 1004
+    CRASHED = 1005
 
-class LiteAvatarWorker:
-    def __init__(self,
-                 handler_root: str,
-                 config: Tts2FaceConfigModel):
+
+def get_process_rss() -> int:
+    """
+    当前进程的常驻内存字节数，读不到 /proc 时退化为峰值常驻内存
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class LiteAvatarSlot:
+    """
+    算法进程中的一路会话：独立的输入输出队列、AvatarProcessor 与处理线程，
+    handler context 通过它与算法进程通信
+    """
+
+    def __init__(self, index: int, ring_prefix: str):
+        self.index = index
+        # 共享内存名称由父进程确定，算法进程被结束或崩溃时父进程按名称 unlink
+        self.ring_names = [f"{ring_prefix}_{index}a", f"{ring_prefix}_{index}v"]
         self.event_in_queue = mp.Queue()
         self.event_out_queue = mp.Queue()
         self.audio_in_queue = mp.Queue()
@@ -95,57 +140,61 @@ class LiteAvatarWorker:
             self.audio_out_queue,
             self.video_out_queue
         ]
+        # 由算法进程写入：没有会话在运行（STOP 已处理完）
+        self.idle_event = mp.Event()
         self.processor: Optional[AvatarProcessor] = None
+        self.audio_ring: Optional[SharedArrayRing] = None
+        self.video_ring: Optional[SharedArrayRing] = None
         self.session_running = False
         self.audio_input_thread = None
-        self.worker_status = WorkerStatus.IDLE
-        self._avatar_process = mp.Process(target=self.start_avatar, args=[handler_root, config])
-        self._avatar_process.start()
-    
-    
+        self.worker_status = WorkerStatus.STARTING
+
     def get_status(self):
         return self.worker_status
-    
+
+    def update_status(self, ready: bool):
+        """
+        根据算法进程的就绪与空闲状态推进 STARTING -> IDLE、STOPPING -> IDLE
+        """
+        if self.worker_status == WorkerStatus.STARTING and ready:
+            self.worker_status = WorkerStatus.IDLE
+        elif self.worker_status == WorkerStatus.STOPPING and self.idle_event.is_set():
+            self.worker_status = WorkerStatus.IDLE
+
     def recruit(self):
         self.worker_status = WorkerStatus.BUSY
-    
-    def release(self):
-        self.worker_status = WorkerStatus.IDLE
+        # 由父进程先清除，算法进程处理完之后的 STOP 才会重新置位，避免把尚未停止的会话位置分配给新会话
+        self.idle_event.clear()
+        self.event_in_queue.put_nowait(Tts2FaceEvent.START)
 
-    def start_avatar(self,
-                     handler_root: str,
-                     config: Tts2FaceConfigModel):
+    def release(self):
+        if self.worker_status == WorkerStatus.BUSY:
+            self.worker_status = WorkerStatus.STOPPING
 
-        self.processor = AvatarProcessorFactory.create_avatar_processor(
-            handler_root,
-            AvatarAlgoType.TTS2FACE_CPU,
-            AvatarInitOption(
-                audio_sample_rate=24000,
-                video_frame_rate=config.fps,
-                avatar_name=config.avatar_name,
-                debug=config.debug,
-                enable_fast_mode=config.enable_fast_mode,
-                use_gpu=config.use_gpu
-            )
-        )
-        # start event input loop
-        event_in_loop = threading.Thread(target=self._event_input_loop)
+    def start(self, processor: AvatarProcessor, shared_memory_slots: int):
+        """
+        在算法进程中调用，绑定本会话的 processor 与输出共享内存并开始接收事件
+        """
+        self.processor = processor
+        self.audio_ring = SharedArrayRing(shared_memory_slots, AUDIO_SLOT_BYTES, name=self.ring_names[0])
+        self.video_ring = SharedArrayRing(shared_memory_slots, name=self.ring_names[1])
+        event_in_loop = threading.Thread(target=self._event_input_loop, name=f"liteavatar_slot_{self.index}")
         event_in_loop.start()
-        
-        # keep process alive
-        while True:
-            time.sleep(1)
-    
+        self.idle_event.set()
+
     def _event_input_loop(self):
         while True:
             event: Tts2FaceEvent = self.event_in_queue.get()
-            logger.info("receive event: {}", event)
+            logger.info("session {} receive event: {}", self.index, event)
             if event == Tts2FaceEvent.START:
+                self.idle_event.clear()
                 self.session_running = True
                 result_hanler = Tts2FaceOutputHandler(
                     audio_output_queue=self.audio_out_queue,
                     video_output_queue=self.video_out_queue,
                     event_out_queue=self.event_out_queue,
+                    audio_ring=self.audio_ring,
+                    video_ring=self.video_ring,
                 )
                 self.processor.register_output_handler(result_hanler)
                 self.processor.start()
@@ -155,12 +204,20 @@ class LiteAvatarWorker:
             elif event == Tts2FaceEvent.STOP:
                 self.session_running = False
                 self.processor.stop()
+                logger.info("session {} shared memory output: audio {}/{}, video {}/{} frames shared/inline",
+                            self.index, self.audio_ring.shared_count, self.audio_ring.inline_count,
+                            self.video_ring.shared_count, self.video_ring.inline_count)
                 self.processor.clear_output_handlers()
                 self.audio_input_thread.join()
                 self.audio_input_thread = None
                 self._clear_mp_queues()
-                self.context = None
-    
+                self.idle_event.set()
+
+    def close_rings(self):
+        for ring in (self.audio_ring, self.video_ring):
+            if ring is not None:
+                ring.close()
+
     def _audio_input_loop(self):
         while self.session_running:
             try:
@@ -172,8 +229,92 @@ class LiteAvatarWorker:
     def _clear_mp_queues(self):
         for q in self.io_queues:
             while not q.empty():
-                q.get()
-    
+                message = q.get()
+                # 未被 handler 取走的共享内存引用在这里释放槽位
+                if isinstance(message, SharedArrayRef):
+                    self.audio_ring.release(message)
+                    self.video_ring.release(message)
+
+
+class LiteAvatarWorker:
+    """
+    一个算法进程，加载一份模型与形象数据，承载 sessions_per_process 路会话
+    """
+
+    def __init__(self,
+                 handler_root: str,
+                 config: Tts2FaceConfigModel):
+        ring_prefix = f"lav_{uuid.uuid4().hex[:12]}"
+        self.slots: List[LiteAvatarSlot] = [
+            LiteAvatarSlot(index, ring_prefix) for index in range(max(1, config.sessions_per_process))]
+        # 以下状态由算法进程写入：模型加载完成、心跳时间、常驻内存字节数
+        self.ready_event = mp.Event()
+        self.heartbeat = mp.Value('d', 0.0)
+        self.rss_bytes = mp.Value('q', 0)
+        self.spawn_time = time.monotonic()
+        self._avatar_process = mp.Process(target=self.start_avatar, args=[handler_root, config])
+        self._avatar_process.start()
+
+    def is_alive(self) -> bool:
+        return self._avatar_process is not None and self._avatar_process.is_alive()
+
+    def is_starting(self) -> bool:
+        return not self.ready_event.is_set()
+
+    def heartbeat_age(self) -> float:
+        return time.time() - self.heartbeat.value
+
+    def update_status(self):
+        ready = self.ready_event.is_set()
+        for slot in self.slots:
+            slot.update_status(ready)
+
+    @property
+    def ring_names(self) -> List[str]:
+        return [name for slot in self.slots for name in slot.ring_names]
+
+    def mark_crashed(self):
+        for slot in self.slots:
+            slot.worker_status = WorkerStatus.CRASHED
+
+    def start_avatar(self,
+                     handler_root: str,
+                     config: Tts2FaceConfigModel):
+        init_option = AvatarInitOption(
+            audio_sample_rate=24000,
+            video_frame_rate=config.fps,
+            avatar_name=config.avatar_name,
+            debug=config.debug,
+            enable_fast_mode=config.enable_fast_mode,
+            use_gpu=config.use_gpu,
+            enable_idle_frame_cache=config.enable_idle_frame_cache,
+            render_batch_size=config.render_batch_size
+        )
+        logger.info("create avatar processors for {} sessions with init option: {}", len(self.slots), init_option)
+        # 模型与形象数据只加载一次，各会话的 processor 共享
+        algo_adapter = AvatarProcessorFactory.create_algo_adapter(handler_root, AvatarAlgoType.TTS2FACE_CPU)
+        algo_adapter.init(init_option)
+        idle_frame_cache = None
+        for slot in self.slots:
+            processor = AvatarProcessor(algo_adapter.create_session_adapter(), init_option, init_algo=False,
+                                        idle_frame_cache=idle_frame_cache)
+            # 第一个 processor 渲染的空闲帧缓存由其余会话共享
+            idle_frame_cache = processor.idle_frame_cache
+            slot.start(processor, config.shared_memory_slots)
+        self.rss_bytes.value = get_process_rss()
+        self.ready_event.set()
+        logger.info("lite avatar worker ready with {} sessions", len(self.slots))
+
+        # keep process alive
+        try:
+            while True:
+                self.heartbeat.value = time.time()
+                self.rss_bytes.value = get_process_rss()
+                time.sleep(1)
+        finally:
+            for slot in self.slots:
+                slot.close_rings()
+
     def destroy(self):
         """terminate avatar process when object is destroyed"""
         try:
@@ -188,4 +329,11 @@ class LiteAvatarWorker:
                         self._avatar_process.join()
                 logger.info("Avatar process terminated successfully")
         except Exception as e:
-            logger.error(f"Error during avatar process cleanup: {e}")
\ No newline at end of file
+            logger.error(f"Error during avatar process cleanup: {e}")
+        # 进程被结束时来不及关闭共享内存，由父进程按名称删除
+        for name in self.ring_names:
+            try:
+                if SharedArrayRing.unlink(name):
+                    logger.info("unlink shared memory {}", name)
+            except Exception as e:
+                logger.error(f"Error unlinking shared memory {name}: {e}")
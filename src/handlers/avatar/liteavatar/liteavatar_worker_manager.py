@@ -1,30 +1,132 @@
+import math
+import threading
 import time
+from typing import Dict, List, Optional
+
 from loguru import logger
 
-from handlers.avatar.liteavatar.liteavatar_worker import LiteAvatarWorker, \
-    Tts2FaceConfigModel, Tts2FaceEvent, WorkerStatus
+from engine_utils.shared_array_ring import SharedArrayReader
+from handlers.avatar.liteavatar.liteavatar_worker import LiteAvatarSlot, LiteAvatarWorker, \
+    Tts2FaceConfigModel, WorkerStatus
 
 
 class LiteAvatarWorkerManager:
-    
-    def __init__(self, concurrent_limit: int, handler_root: str, config: Tts2FaceConfigModel):
+    """
+    LiteAvatar 算法进程池：
+    - 所有 worker 并行启动，算法进程加载完模型后置位就绪，不再固定等待
+    - 会话结束后 worker 进入 STOPPING，算法进程处理完 STOP 才回到 IDLE 接受新会话
+    - 后台线程检查进程存活与心跳，退出或卡死的 worker 被结束并在原位置重新拉起
+    - 每个 worker 进程承载 sessions_per_process 路会话，按会话位置分配，进程异常时其上所有会话一起重启
+    - worker 结束时删除其输出共享内存，并解除 array_reader 中对应的映射
+    """
+
+    def __init__(self, concurrent_limit: int, handler_root: str, config: Tts2FaceConfigModel,
+                 array_reader: Optional[SharedArrayReader] = None):
         self.cocurrent_limit = concurrent_limit
         self.handler_root = handler_root
         self.config = config
-        self.lite_avatar_workers = []
-        for _ in range(concurrent_limit):
-            self.lite_avatar_workers.append(LiteAvatarWorker(handler_root, config))
-            time.sleep(5)
-    
-    def start_worker(self):
+        self.array_reader = array_reader
+        self.crash_count = 0
+        self.respawn_count = 0
+        self._lock = threading.Lock()
+        self._running = True
+        process_count = math.ceil(concurrent_limit / max(1, config.sessions_per_process))
+        self.lite_avatar_workers: List[LiteAvatarWorker] = [
+            LiteAvatarWorker(handler_root, config) for _ in range(process_count)]
+        self._wait_ready(config.worker_start_timeout)
+        self._last_metrics: Optional[Dict[str, int]] = None
+        self._monitor_thread = threading.Thread(target=self._monitor_loop, name="liteavatar_monitor", daemon=True)
+        self._monitor_thread.start()
+
+    def _wait_ready(self, timeout: float):
+        start_time = time.monotonic()
         for worker in self.lite_avatar_workers:
-            if worker.get_status() == WorkerStatus.IDLE:
-                worker.recruit()
-                worker.event_in_queue.put_nowait(Tts2FaceEvent.START)
-                return worker
+            worker.ready_event.wait(max(0.0, start_time + timeout - time.monotonic()))
+        with self._lock:
+            for worker in self.lite_avatar_workers:
+                worker.update_status()
+        logger.info(f"lite avatar workers started in {time.monotonic() - start_time:.1f}s: {self.get_metrics()}, "
+                    f"memory: {self.get_memory_metrics()}")
+
+    def start_worker(self) -> Optional[LiteAvatarSlot]:
+        with self._lock:
+            for worker in self.lite_avatar_workers:
+                worker.update_status()
+                if not worker.is_alive():
+                    continue
+                for slot in worker.slots:
+                    if slot.get_status() == WorkerStatus.IDLE:
+                        slot.recruit()
+                        return slot
+        logger.warning(f"no idle lite avatar worker: {self.get_metrics()}")
         return None
-    
+
+    def get_metrics(self) -> Dict[str, int]:
+        # 按会话位置统计状态；崩溃的 worker 会立即被替换，只统计累计次数
+        metrics = {status.name.lower(): 0 for status in WorkerStatus if status != WorkerStatus.CRASHED}
+        for worker in self.lite_avatar_workers:
+            for slot in worker.slots:
+                metrics[slot.get_status().name.lower()] += 1
+        metrics["crash_total"] = self.crash_count
+        metrics["respawn_total"] = self.respawn_count
+        return metrics
+
+    def get_memory_metrics(self) -> Dict[str, float]:
+        """
+        算法进程常驻内存，按进程承载的会话位置数均摊
+        """
+        rss_bytes = sum(worker.rss_bytes.value for worker in self.lite_avatar_workers)
+        session_count = sum(len(worker.slots) for worker in self.lite_avatar_workers)
+        return {
+            "process_count": len(self.lite_avatar_workers),
+            "rss_mb": round(rss_bytes / 2 ** 20, 1),
+            "rss_mb_per_session": round(rss_bytes / 2 ** 20 / max(1, session_count), 1),
+        }
+
+    def _check_worker(self, worker: LiteAvatarWorker) -> Optional[str]:
+        """
+        返回 worker 不健康的原因，健康时返回 None
+        """
+        if not worker.is_alive():
+            return "process exited"
+        if worker.is_starting():
+            if time.monotonic() - worker.spawn_time > self.config.worker_start_timeout:
+                return "start timeout"
+        elif worker.heartbeat_age() > self.config.heartbeat_timeout:
+            return f"no heartbeat for {worker.heartbeat_age():.0f}s"
+        return None
+
+    def _monitor_loop(self):
+        while self._running:
+            time.sleep(self.config.health_check_interval)
+            with self._lock:
+                if not self._running:
+                    break
+                for index, worker in enumerate(self.lite_avatar_workers):
+                    worker.update_status()
+                    reason = self._check_worker(worker)
+                    if reason is None:
+                        continue
+                    # 正在使用的会话无法恢复，会话仍持有旧的会话位置，结束时的 release 不再影响新 worker
+                    logger.error(f"lite avatar worker {index} unhealthy: {reason}, respawn")
+                    worker.mark_crashed()
+                    self.crash_count += 1
+                    self._destroy_worker(worker)
+                    self.lite_avatar_workers[index] = LiteAvatarWorker(self.handler_root, self.config)
+                    self.respawn_count += 1
+                metrics = self.get_metrics()
+            if metrics != self._last_metrics:
+                logger.info(f"lite avatar workers: {metrics}, memory: {self.get_memory_metrics()}")
+                self._last_metrics = metrics
+
+    def _destroy_worker(self, worker: LiteAvatarWorker):
+        worker.destroy()
+        if self.array_reader is not None:
+            self.array_reader.close_rings(worker.ring_names)
+
     def destroy(self):
         logger.info("destroy LiteAvatarWorkerManager")
-        for worker in self.lite_avatar_workers:
-            worker.destroy()
+        with self._lock:
+            self._running = False
+            for worker in self.lite_avatar_workers:
+                self._destroy_worker(worker)
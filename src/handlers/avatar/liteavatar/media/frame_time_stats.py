@@ -0,0 +1,52 @@
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+import numpy as np
+
+
+class FrameTimeStats:
+    """
+    记录相邻两帧视频输出的间隔，保留最近 window 个样本计算分位数与抖动；
+    间隔超过 late_factor 倍帧间隔的帧计为延迟帧
+    """
+
+    def __init__(self, fps: int, window: int = 1000, late_factor: float = 1.5):
+        self.frame_interval = 1 / fps
+        self.late_threshold = self.frame_interval * late_factor
+        self._window = window
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.late_count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._last_time: Optional[float] = None
+        self._samples: Deque[float] = deque(maxlen=self._window)
+
+    def record(self, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        if self._last_time is not None:
+            interval = now - self._last_time
+            self.count += 1
+            self.total += interval
+            self.max = max(self.max, interval)
+            if interval > self.late_threshold:
+                self.late_count += 1
+            self._samples.append(interval)
+        self._last_time = now
+
+    def summary(self) -> Dict[str, float]:
+        if self.count == 0:
+            return {"count": 0}
+        samples = np.array(self._samples)
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * 1e3, 3),
+            "p95_ms": round(float(np.percentile(samples, 95)) * 1e3, 3),
+            "p99_ms": round(float(np.percentile(samples, 99)) * 1e3, 3),
+            "max_ms": round(self.max * 1e3, 3),
+            "jitter_ms": round(float(np.std(samples)) * 1e3, 3),
+            "late_ratio": round(self.late_count / self.count, 4),
+        }
@@ -0,0 +1,49 @@
+import time
+from typing import Callable, List, Optional
+
+from loguru import logger
+import numpy as np
+
+from handlers.avatar.liteavatar.algo.base_algo_adapter import BaseAlgoAdapter
+
+
+class IdleFrameCache:
+    """
+    Fully composed idle frames, one per background frame. The idle signal is constant,
+    so the frame only depends on bg_frame_id; listening periods take frames from here
+    instead of running signal2img and mouth2full. Frames are read only and can be shared
+    by all processors using the same algo models.
+    """
+
+    def __init__(self, frames: List[np.ndarray]):
+        self._frames = frames
+
+    @staticmethod
+    def build(algo_adapter: BaseAlgoAdapter,
+              compose: Callable[[np.ndarray, int], np.ndarray]) -> Optional["IdleFrameCache"]:
+        """
+        compose turns a mouth image into the full output frame for a background frame,
+        return None if the algo adapter does not support idle images
+        """
+        frame_count = algo_adapter.get_idle_image_count()
+        if frame_count <= 0:
+            return None
+        start_time = time.time()
+        frames = []
+        for bg_frame_id in range(frame_count):
+            frame = compose(algo_adapter.render_idle_image(bg_frame_id), bg_frame_id)
+            frame.setflags(write=False)
+            frames.append(frame)
+        cache = IdleFrameCache(frames)
+        logger.info("build idle frame cache with {} frames, {:.1f}MB, cost {:.3f}s",
+                    frame_count, cache.nbytes / 2 ** 20, time.time() - start_time)
+        return cache
+
+    @property
+    def nbytes(self) -> int:
+        return sum(frame.nbytes for frame in self._frames)
+
+    def get(self, bg_frame_id: int) -> Optional[np.ndarray]:
+        if 0 <= bg_frame_id < len(self._frames):
+            return self._frames[bg_frame_id]
+        return None
@@ -2,9 +2,9 @@
 
 from typing import List
 
-import librosa
 from loguru import logger
 import numpy as np
+from engine_utils.audio_resampler import StreamingResampler, resample
 from handlers.avatar.liteavatar.model.algo_model import AudioSlice
 from handlers.avatar.liteavatar.model.audio_input import SpeechAudio
 
@@ -21,6 +21,10 @@ class SpeechAudioProcessor:
         self._enable_fast_mode = enable_fast_mode
 
         self._current_audio = SpeechAudio()
+        # 当前语音尚未切片的 int16 PCM，追加与取出切片都在同一块缓冲上进行，不再反复拼接 bytes
+        self._pending_audio = bytearray()
+        # 同一段语音的切片之间保留重采样状态；固定延迟输出，每个切片的算法音频长度与播放音频严格对应
+        self._resampler = StreamingResampler(input_sample_rate, output_sample_rate, trim_delay=False)
 
     def get_speech_audio_slice(self, speech_audio: SpeechAudio) \
             -> List[AudioSlice]:
@@ -33,13 +37,15 @@ class SpeechAudioProcessor:
             # new speech, extend this to audio slice duration,
             # so that algo can start immediately
             logger.info("generate first audio slice for speech {}", speech_audio.speech_id)
-            self._current_audio = speech_audio.model_copy()
+            self._current_audio = SpeechAudio(speech_id=speech_audio.speech_id,
+                                              end_of_speech=speech_audio.end_of_speech,
+                                              sample_rate=speech_audio.sample_rate)
+            self._pending_audio = bytearray(speech_audio.audio_data)
+            self._resampler.reset()
             if self._enable_fast_mode:
-                audio_data = self._current_audio.audio_data
-
                 target_length = int(2 * speech_audio.sample_rate * self._audio_slice_duration)
-                padding_length = target_length - len(audio_data)
-                audio_data = bytes(padding_length) + audio_data
+                padding_length = target_length - len(self._pending_audio)
+                audio_data = bytes(padding_length) + self._pending_audio
                 
                 padding_duration = padding_length / 2 / speech_audio.sample_rate
                 
@@ -50,31 +56,30 @@ class SpeechAudioProcessor:
                     end_of_speech=speech_audio.end_of_speech,
                     front_padding_duration=padding_duration
                 )
-                self._current_audio.audio_data = bytes()
+                self._pending_audio = bytearray()
                 return [audio_slice]
         else:
             self._extend_current_audio(speech_audio)
-        
+
         logger.info("input speech audio {}, end of speech {}, duration {:.3f}s, current audio length {}",
                     speech_audio.speech_id, speech_audio.end_of_speech, speech_audio.get_audio_duration(),
-                    len(self._current_audio.audio_data))
+                    len(self._pending_audio))
 
         output_audio_list = []
-        while self._current_audio.get_audio_duration() >= self._audio_slice_duration:
+        while len(self._pending_audio) / self._current_audio.sample_rate / 2 >= self._audio_slice_duration:
             play_audio_data_length = int(2 * self._input_sample_rate *
                                          self._audio_slice_duration)
-            play_audio_data = self._current_audio.audio_data[:play_audio_data_length]
-            self._current_audio.audio_data = self._current_audio.audio_data[play_audio_data_length:]
-            end_of_speech = len(self._current_audio.audio_data) == 0 and speech_audio.end_of_speech
+            play_audio_data = self._take_pending_audio(play_audio_data_length)
+            end_of_speech = len(self._pending_audio) == 0 and speech_audio.end_of_speech
             audio_slice = self._create_audio_slice(
                 speech_audio.speech_id,
                 play_audio_data,
                 self._input_sample_rate,
                 end_of_speech)
             output_audio_list.append(audio_slice)
-        if self._current_audio.end_of_speech and len(self._current_audio.audio_data) > 0:
+        if self._current_audio.end_of_speech and len(self._pending_audio) > 0:
             play_audio_data, end_padding_duration = self.extend_audio_to_duration(
-                self._current_audio.audio_data,
+                self._pending_audio,
                 self._input_sample_rate,
                 self._audio_slice_duration,
                 False
@@ -86,13 +91,23 @@ class SpeechAudioProcessor:
                 True,
                 end_padding_duration=end_padding_duration))
             self._current_audio = SpeechAudio()
+            self._pending_audio = bytearray()
         return output_audio_list
 
     def _extend_current_audio(self, speech_audio: SpeechAudio):
         assert self._current_audio.speech_id == speech_audio.speech_id
-        self._current_audio.audio_data += speech_audio.audio_data
+        self._pending_audio += speech_audio.audio_data
         self._current_audio.end_of_speech = speech_audio.end_of_speech
 
+    def _take_pending_audio(self, length: int) -> bytes:
+        """
+        从待切片缓冲头部取出 length 字节，只复制一次，剩余数据原地前移
+        """
+        with memoryview(self._pending_audio) as view:
+            audio_data = bytes(view[:length])
+        del self._pending_audio[:length]
+        return audio_data
+
     def _create_audio_slice(self,
                             speech_id: str,
                             play_audio_data: bytes,
@@ -100,9 +115,7 @@ class SpeechAudioProcessor:
                             end_of_speech: bool,
                             front_padding_duration: float = 0,
                             end_padding_duration: float = 0) -> AudioSlice:
-        algo_audio = self.resample_audio(play_audio_data,
-                                         self._input_sample_rate,
-                                         self._output_sample_rate)
+        algo_audio = self._resample_slice(play_audio_data)
         return AudioSlice(
             algo_audio_data=algo_audio,
             algo_audio_sample_rate=self._output_sample_rate,
@@ -129,6 +142,13 @@ class SpeechAudioProcessor:
             audio_data = bytes(audio_data) + bytes(padding_length)
         return audio_data, padding_length / 2 / sample_rate
 
+    def _resample_slice(self, audio_data: bytes) -> bytes:
+        if self._resampler.passthrough:
+            return audio_data
+        resampled = self._resampler.process(np.frombuffer(audio_data, np.int16))
+        np.clip(resampled, np.iinfo(np.int16).min, np.iinfo(np.int16).max, out=resampled)
+        return resampled.astype(np.int16).tobytes()
+
     @staticmethod
     def resample_audio(audio_data: bytes,
                        origin_sample_rate: int,
@@ -136,15 +156,5 @@ class SpeechAudioProcessor:
         if origin_sample_rate == target_sample_rate:
             return audio_data
 
-        origin_np_array = np.frombuffer(audio_data, np.short)
-        audio_float32 = origin_np_array.astype(np.float32) / np.iinfo(
-            np.int16).max
-        resampled_float: np.ndarray = librosa.resample(
-            audio_float32,
-            orig_sr=origin_sample_rate,
-            target_sr=target_sample_rate)
-        resampled_pcm = (resampled_float * np.iinfo(np.short).max).astype(
-            np.int16)
-        resample_data = bytearray(resampled_pcm.tobytes())
-
-        return resample_data
+        resampled = resample(np.frombuffer(audio_data, np.int16), origin_sample_rate, target_sample_rate)
+        return np.clip(resampled, np.iinfo(np.int16).min, np.iinfo(np.int16).max).astype(np.int16).tobytes()
@@ -3,6 +3,7 @@
 from enum import Enum
 from typing import Any, Optional, TypeVar
 import av
+import numpy as np
 from pydantic import BaseModel
 
 
@@ -18,6 +19,10 @@ class AvatarInitOption(BaseModel):
     debug: bool = False
     enable_fast_mode: bool = False
     use_gpu: bool = True
+    # pre-render fully composed idle frames for every background frame at init
+    enable_idle_frame_cache: bool = True
+    # max number of speech frames rendered and composed in one call
+    render_batch_size: int = 4
 
 
 class AudioSlice(BaseModel):
@@ -55,6 +60,8 @@ class MouthResult(BaseModel):
     mouth_image: Any
     audio_slice: Optional[AudioSlice] = None
     global_frame_id: int
+    # fully composed frame ready for output, mouth_image is None if set
+    full_image: Any = None
 
     model_config = {
         "arbitrary_types_allowed": True
@@ -74,7 +81,9 @@ class VideoResult(BaseModel):
 
 class AudioResult(BaseModel):
     speech_id: Any
-    audio_frame: bytes | av.AudioFrame
+    # [1, N] array; the dtype is chosen by the producer and passed through without conversion
+    audio_data: np.ndarray
+    sample_rate: int
 
     model_config = {
         "arbitrary_types_allowed": True
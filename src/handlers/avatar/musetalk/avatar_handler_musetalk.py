@@ -21,6 +21,7 @@ from handlers.avatar.liteavatar.liteavatar_worker import Tts2FaceEvent
 from handlers.avatar.musetalk.avatar_musetalk_processor import AvatarMuseTalkProcessor
 from handlers.avatar.musetalk.avatar_musetalk_algo import MuseAvatarV15
 from handlers.avatar.musetalk.avatar_musetalk_config import AvatarMuseTalkConfig
+from engine_utils.audio_format import to_float32
 from engine_utils.general_slicer import slice_data, SliceContext
 
 
@@ -401,8 +402,9 @@ class HandlerAvatarMusetalk(HandlerBase):
         if input_sample_rate != context.config.output_audio_sample_rate:
             logger.error(f"Input sample rate {input_sample_rate} != output sample rate {context.config.output_audio_sample_rate}")
             return
-        if audio_array is not None and audio_array.dtype != np.float32:
-            audio_array = audio_array.astype(np.float32)
+        if audio_array is not None:
+            # int16 input is scaled to [-1, 1]; float32 input is used as is without a copy
+            audio_array = to_float32(audio_array)
         if audio_array is None:
             audio_array = np.zeros([input_sample_rate], dtype=np.float32)
             logger.error(f"Audio data is None, fill with 1s silence, speech_id: {speech_id}")
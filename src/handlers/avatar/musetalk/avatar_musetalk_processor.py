@@ -7,12 +7,13 @@ from threading import Thread
 from typing import Optional
 
 import av
-import librosa
 import numpy as np
 import soundfile as sf
 import torch
 from loguru import logger
 
+from engine_utils.audio_format import as_channel_first, to_float32
+from engine_utils.audio_resampler import StreamingResampler
 from handlers.avatar.liteavatar.model.algo_model import AvatarStatus, AudioResult, VideoResult
 from handlers.avatar.liteavatar.model.audio_input import SpeechAudio
 from src.handlers.avatar.musetalk.avatar_musetalk_algo import MuseAvatarV15
@@ -26,6 +27,11 @@ class AvatarMuseTalkProcessor:
         self._config = config
         self._algo_audio_sample_rate = config.algo_audio_sample_rate  # Internal algorithm sample rate, fixed at 16000
         self._output_audio_sample_rate = config.output_audio_sample_rate
+        # Streaming resampler shared by the segments of one speech, so segment boundaries carry filter state.
+        # Fixed latency output keeps each segment's resampled length proportional to its input length.
+        self._resampler = StreamingResampler(self._output_audio_sample_rate, self._algo_audio_sample_rate,
+                                             trim_delay=False)
+        self._resampler_speech_id = None
         # Output queues
         self.audio_output_queue = None
         self.video_output_queue = None
@@ -207,7 +213,12 @@ class AvatarMuseTalkProcessor:
                 end_of_speech = item['end_of_speech']
                 fps = self._config.fps if hasattr(self._config, 'fps') else 25
                 # Resample to algorithm sample rate
-                segment = librosa.resample(audio_data, orig_sr=self._output_audio_sample_rate, target_sr=self._algo_audio_sample_rate)
+                if speech_id != self._resampler_speech_id:
+                    self._resampler.reset()
+                    self._resampler_speech_id = speech_id
+                segment = self._resampler.process(audio_data)
+                if end_of_speech:
+                    self._resampler_speech_id = None
                 target_len = self._algo_audio_sample_rate  # 1 second
                 if len(segment) > target_len:
                     logger.error(f"Segment too long: {len(segment)} > {target_len}, speech_id={speech_id}")
@@ -666,13 +677,11 @@ class AvatarMuseTalkProcessor:
             # Audio related
             audio_len = len(audio_segment) if audio_segment is not None else 0
             if audio_segment is not None and audio_len > 0:
-                audio_np = np.asarray(audio_segment, dtype=np.float32)
-                if audio_np.ndim == 1:
-                    audio_np = audio_np[np.newaxis, :]
-                audio_frame = av.AudioFrame.from_ndarray(audio_np, format="flt", layout="mono")
-                audio_frame.sample_rate = self._output_audio_sample_rate
+                # Canonical float32 [1, N] view, passed to the output queue without an AudioFrame round trip
+                audio_np = as_channel_first(to_float32(np.asarray(audio_segment)))
                 audio_result = AudioResult(
-                    audio_frame=audio_frame,
+                    audio_data=audio_np,
+                    sample_rate=self._output_audio_sample_rate,
                     speech_id=speech_id,
                     end_of_speech=end_of_speech
                 )
@@ -707,15 +716,7 @@ class AvatarMuseTalkProcessor:
 
     def _notify_audio(self, audio_result: AudioResult):
         if self.audio_output_queue is not None:
-            audio_frame = audio_result.audio_frame
-            audio_data = audio_frame.to_ndarray()
-            # Ensure float32 and shape [1, N]
-            if audio_data.dtype != np.float32:
-                audio_data = audio_data.astype(np.float32)
-            if audio_data.ndim == 1:
-                audio_data = audio_data[np.newaxis, ...]
-            elif audio_data.ndim == 2 and audio_data.shape[0] != 1:
-                audio_data = audio_data[:1, ...]
+            audio_data = audio_result.audio_data
             try:
                 self.audio_output_queue.put_nowait(audio_data)
             except Exception as e:
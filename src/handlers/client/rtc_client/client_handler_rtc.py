@@ -290,6 +290,14 @@ class ClientHandlerRtc(ClientHandlerBase):
         context = cast(ClientRtcContext, context)
         if context.client_session_delegate is None:
             return
+        if inputs.type == ChatDataType.HUMAN_TEXT and (
+                inputs.data.get_meta("human_text_speculative", False) or
+                inputs.data.get_meta("human_text_speculative_cancel", False)):
+            # 推测识别结果只用于提前请求 LLM，不展示给用户
+            return
+        if inputs.type == ChatDataType.AVATAR_TEXT and inputs.data.get_meta("avatar_text_presynthesize", False):
+            # 预合成的开场白只送给 TTS 缓存，不展示给用户
+            return
         data_queue = context.client_session_delegate.output_queues.get(inputs.type.channel_type)
         if data_queue is not None:
             data_queue.put_nowait(inputs)
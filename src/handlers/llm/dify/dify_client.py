@@ -0,0 +1,97 @@
+import json
+import re
+import threading
+from typing import Dict, Iterator, Optional, Set
+
+import requests
+from loguru import logger
+from requests.adapters import HTTPAdapter
+
+
+# Dify 的事件 JSON 以 "event" 字段开头，只需检查开头部分即可判断事件类型
+_event_name_pattern = re.compile(rb'"event"\s*:\s*"([^"]+)"')
+_event_name_search_size = 128
+
+
+class DifySSEDecoder:
+    """
+    增量 SSE 解码器：按网络到达的字节块切分事件，只对关心的事件做 JSON 解析，
+    workflow_started/node_finished 等体积较大的事件只匹配事件名后跳过
+    """
+
+    def __init__(self, events: Optional[Set[str]] = None):
+        self.events = events
+        self.done = False
+        self.event_count = 0
+        self.skipped_count = 0
+        self._buffer = bytearray()
+
+    def feed(self, data: bytes) -> Iterator[Dict]:
+        self._buffer += data
+        while not self.done:
+            end, separator_size = self._find_event_end()
+            if end < 0:
+                return
+            block = bytes(self._buffer[:end])
+            del self._buffer[:end + separator_size]
+            event = self._decode_block(block)
+            if event is not None:
+                yield event
+
+    def _find_event_end(self):
+        lf_end = self._buffer.find(b"\n\n")
+        crlf_end = self._buffer.find(b"\r\n\r\n")
+        if crlf_end >= 0 and (lf_end < 0 or crlf_end < lf_end):
+            return crlf_end, 4
+        return lf_end, 2
+
+    def _decode_block(self, block: bytes) -> Optional[Dict]:
+        data_lines = []
+        for line in block.splitlines():
+            if line.startswith(b"data:"):
+                data_lines.append(line[6:] if line.startswith(b"data: ") else line[5:])
+        if len(data_lines) == 0:
+            return None
+        payload = b"\n".join(data_lines)
+        if payload.strip() == b"[DONE]":
+            self.done = True
+            return None
+        self.event_count += 1
+        if self.events is not None:
+            match = _event_name_pattern.search(payload, 0, _event_name_search_size)
+            if match is not None and match.group(1).decode() not in self.events:
+                self.skipped_count += 1
+                return None
+        try:
+            return json.loads(payload)
+        except json.JSONDecodeError:
+            logger.warning(f"Failed to parse JSON: {payload[:200]}")
+            return None
+
+
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_dify_session(api_url: str, pool_size: int = 8) -> requests.Session:
+    """
+    同一 Dify 地址的所有会话共享一个 requests.Session，复用 keep-alive 连接
+    """
+    key = (api_url or "").rstrip("/")
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _sessions[key] = session
+        return session
+
+
+def close_dify_sessions():
+    with _sessions_lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+    for session in sessions:
+        session.close()
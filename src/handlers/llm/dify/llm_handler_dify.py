@@ -1,12 +1,11 @@
 # handlers/llm/dify/llm_handler_dify.py
 
+import hashlib
 import os
 import re
-import json
-import PIL
-import numpy as np
+import time
 import requests
-from typing import Dict, Optional, cast
+from typing import Dict, List, Optional, cast
 from loguru import logger
 from pydantic import BaseModel, Field
 from abc import ABC
@@ -17,6 +16,11 @@ from chat_engine.data_models.chat_data.chat_data_model import ChatData
 from chat_engine.data_models.chat_data_type import ChatDataType
 from chat_engine.contexts.session_context import SessionContext
 from chat_engine.data_models.runtime_data.data_bundle import DataBundle, DataBundleDefinition, DataBundleEntry
+from engine_utils.frame_sampler import FrameSampler, SampledFrame
+from handlers.llm.dify.dify_client import DifySSEDecoder, get_dify_session
+
+# 需要解析的流式事件，其余事件（workflow、node 等）只识别事件名后跳过
+_STREAMING_EVENTS = {"message", "agent_message", "message_end", "error"}
 
 # only support chatflow
 class DifyConfig(HandlerBaseConfigModel, BaseModel):
@@ -25,6 +29,11 @@ class DifyConfig(HandlerBaseConfigModel, BaseModel):
     enable_video_input: bool = Field(default=False)
     response_mode: str = Field(default="streaming")  # streaming or blocking
     timeout: int = Field(default=30)
+    # 同一 api_url 的会话共享连接池
+    pool_size: int = Field(default=8)
+    # 视频输入关键帧采样，画面无明显变化时复用已上传的文件
+    video_max_side: int = Field(default=768)
+    video_diff_threshold: float = Field(default=0.04)
 
 
 class DifyContext(HandlerContext):
@@ -37,9 +46,13 @@ class DifyContext(HandlerContext):
         self.timeout = None
         self.input_texts = ""
         self.output_texts = ""
-        self.current_image = None
         self.enable_video_input = False
         self.conversation_id = None  # Dify 特有的对话ID
+        self.session: Optional[requests.Session] = None
+        self.frame_sampler: Optional[FrameSampler] = None
+        # 已上传图片的内容哈希 -> Dify 文件 ID
+        self.uploaded_files: Dict[str, str] = {}
+        self.upload_bytes = 0
 
 
 class HandlerDify(HandlerBase, ABC):
@@ -89,40 +102,61 @@ class HandlerDify(HandlerBase, ABC):
         context.response_mode = handler_config.response_mode
         context.timeout = handler_config.timeout
         context.enable_video_input = handler_config.enable_video_input
+        context.session = get_dify_session(handler_config.api_url, handler_config.pool_size)
+        if context.enable_video_input:
+            context.frame_sampler = FrameSampler(
+                max_side=handler_config.video_max_side,
+                diff_threshold=handler_config.video_diff_threshold,
+            )
         return context
 
     def start_context(self, session_context, handler_context):
         pass
 
-    def _upload_image_to_dify(self, context: DifyContext, image_data):
+    def _upload_image_to_dify(self, context: DifyContext, frame: SampledFrame):
         """
-        上传图像到 Dify 并返回文件信息
+        上传图像到 Dify 并返回文件信息，相同内容的图片在本会话中只上传一次
         """
+        # 关键帧在后台已完成缩放和编码
+        img_bytes = frame.get_bytes()
+        content_hash = hashlib.sha1(img_bytes).hexdigest()
+        file_id = context.uploaded_files.get(content_hash)
+        if file_id is not None:
+            logger.debug(f"image {content_hash} already uploaded as {file_id}")
+            return file_id
+
         upload_url = f"{context.api_url}/files/upload"
         headers = {
             "Authorization": f"Bearer {context.api_key}"
         }
 
-        # 假设 image_data 是 PIL 图像或 numpy 数组，需先保存为临时文件
-        from io import BytesIO
-        buffered = BytesIO()
-
-        image = PIL.Image.fromarray(np.squeeze(image_data)[..., ::-1])
-        image.save(buffered, format="JPEG")  # 可根据需要调整格式
-        img_bytes = buffered.getvalue()
-
         files = {
             'file': ('image.jpg', img_bytes, 'image/jpeg'),
         }
 
-        response = requests.post(upload_url, headers=headers, files=files, data={'user': context.session_id})
+        response = context.session.post(upload_url, headers=headers, files=files, data={'user': context.session_id},
+                                        timeout=context.timeout)
         if response.status_code < 400:
             result = response.json()
-            return result.get("id")  # 返回文件 ID
+            file_id = result.get("id")  # 返回文件 ID
+            if file_id:
+                context.uploaded_files[content_hash] = file_id
+                context.upload_bytes += len(img_bytes)
+            return file_id
         else:
             logger.error(f"Failed to upload image:{response.status_code} {response.text}")
             return None
 
+    @staticmethod
+    def _collect_images(context: DifyContext) -> List[SampledFrame]:
+        sampler = context.frame_sampler
+        if sampler is None:
+            return []
+        frames = sampler.select(max_count=1)
+        if len(frames) == 0 and sampler.latest is not None:
+            frames = [sampler.latest]
+        return frames
+
     def _send_dify_request(self, context: DifyContext, chat_text: str, images=None):
         """
         发送请求到 Dify API
@@ -165,30 +199,28 @@ class HandlerDify(HandlerBase, ABC):
         logger.info(f"payload: {payload}")
         try:
             if context.response_mode == "streaming":
-                with requests.post(url, headers=headers, json=payload, stream=True, timeout=context.timeout) as response:
+                with context.session.post(url, headers=headers, json=payload, stream=True,
+                                          timeout=context.timeout) as response:
                     if response.status_code != 200:
                         error_text = response.text
                         logger.error(f"Dify API error: {response.status_code} - {error_text}")
                         yield f"Error: {response.status_code} - {error_text}"
                         return
 
-                    for line in response.iter_lines():
-                        if line:
-                            line_str = line.decode('utf-8')
-                            if line_str.startswith("data: "):
-                                data = line_str[6:]  # 移除 "data: " 前缀
-                                if data.strip() == "[DONE]":
-                                    break
-                                try:
-                                    json_data = json.loads(data)
-                                    if "answer" in json_data:
-                                        yield json_data["answer"]
-                                    elif "conversation_id" in json_data and json_data["conversation_id"]:
-                                        context.conversation_id = json_data["conversation_id"]
-                                except json.JSONDecodeError:
-                                    logger.warning(f"Failed to parse JSON: {data}")
+                    decoder = DifySSEDecoder(events=_STREAMING_EVENTS)
+                    for data in response.iter_content(chunk_size=None):
+                        for json_data in decoder.feed(data):
+                            if json_data.get("event") == "error":
+                                logger.error(f"Dify stream error: {json_data.get('message')}")
+                            if "conversation_id" in json_data and json_data["conversation_id"]:
+                                context.conversation_id = json_data["conversation_id"]
+                            if "answer" in json_data:
+                                yield json_data["answer"]
+                        if decoder.done:
+                            break
+                    logger.debug(f"Dify stream events {decoder.event_count}, skipped {decoder.skipped_count}")
             else:  # blocking mode
-                response = requests.post(url, headers=headers, json=payload, timeout=context.timeout)
+                response = context.session.post(url, headers=headers, json=payload, timeout=context.timeout)
                 if response.status_code != 200:
                     error_text = response.text
                     logger.error(f"Dify API error: {response.status_code} - {error_text}")
@@ -217,12 +249,16 @@ class HandlerDify(HandlerBase, ABC):
         context = cast(DifyContext, context)
         text = None
         if inputs.type == ChatDataType.CAMERA_VIDEO and context.enable_video_input:
-            context.current_image = inputs.data.get_main_data()
+            context.frame_sampler.push(inputs.data.get_main_data(), inputs.timestamp[0])
             return
         elif inputs.type == ChatDataType.HUMAN_TEXT:
             text = inputs.data.get_main_data()
         else:
             return
+        if inputs.data.get_meta("human_text_speculative", False) or \
+                inputs.data.get_meta("human_text_speculative_cancel", False):
+            # 推测识别结果暂不支持，忽略
+            return
 
         speech_id = inputs.data.get_meta("speech_id")
         if (speech_id is None):
@@ -244,11 +280,17 @@ class HandlerDify(HandlerBase, ABC):
 
         try:
             context.output_texts = ''
-            for output_text in self._send_dify_request(context, chat_text,
-                                                       [context.current_image] if context.current_image is not None else []):
+            context.upload_bytes = 0
+            request_start = time.monotonic()
+            first_token_received = False
+            for output_text in self._send_dify_request(context, chat_text, self._collect_images(context)):
                 if output_text:
+                    if not first_token_received:
+                        first_token_received = True
+                        logger.info(f"dify time to first token {round((time.monotonic() - request_start) * 1e3)} ms, "
+                                    f"uploaded {context.upload_bytes} bytes")
                     context.output_texts += output_text
-                    logger.info(output_text)
+                    logger.debug(output_text)
                     output = DataBundle(output_definition)
                     output.set_main_data(output_text)
                     output.add_meta("avatar_text_end", False)
@@ -263,8 +305,8 @@ class HandlerDify(HandlerBase, ABC):
             output.add_meta("speech_id", speech_id)
             yield output
 
+        logger.info(f'Dify output: {context.output_texts}')
         context.input_texts = ''
-        context.current_image = None
         logger.info('avatar text end')
         end_output = DataBundle(output_definition)
         end_output.set_main_data('')
@@ -1,12 +1,10 @@
 import importlib
 import os
-import queue
 import sys
 import time
 from abc import ABC
 from typing import Optional, cast, Dict, List
 
-import PIL.Image
 import librosa
 import numpy as np
 # noinspection PyPackageRequirements
@@ -23,6 +21,7 @@ from chat_engine.data_models.chat_data.chat_data_model import ChatData
 from chat_engine.data_models.chat_engine_config_data import ChatEngineConfigModel, HandlerBaseConfigModel
 from chat_engine.data_models.runtime_data.data_bundle import DataBundle, DataBundleDefinition, DataBundleEntry
 from engine_utils.directory_info import DirectoryInfo
+from engine_utils.frame_sampler import FrameSampler, SampledFrame
 from engine_utils.general_slicer import SliceContext, slice_data
 
 
@@ -32,6 +31,9 @@ class MiniCPMConfig(HandlerBaseConfigModel, BaseModel):
     assistant_prompt: str = Field(default="作为助手，你将使用这种声音风格说话。")
     enable_video_input: bool = Field(default=False)
     skip_video_frame: int = Field(default=-1)
+    # 关键帧采样：帧间差异超过阈值才保留，缩放到最长边 video_max_side
+    video_max_side: int = Field(default=448)
+    video_diff_threshold: float = Field(default=0.04)
 
 
 class MiniCPMContext(HandlerContext):
@@ -62,42 +64,37 @@ class MiniCPMContext(HandlerContext):
             slice_axis=0,
         )
 
-        self.video_frame_cache = queue.Queue(maxsize=50)
-        self.video_frame_head_cache: Optional[ChatData] = None
+        self.frame_sampler: Optional[FrameSampler] = None
 
-    def put_video_frame(self, frame):
+    def put_video_frame(self, frame: ChatData):
         if self.config is None or not self.config.enable_video_input:
             return
-        if self.video_frame_cache.full():
-            self.video_frame_head_cache = self.video_frame_cache.get_nowait()
-        self.video_frame_cache.put_nowait(frame)
-
-    def fetch_video_frames(self, start_time: int, end_time: int):
-        result = []
-        if self.config is None or not self.config.enable_video_input:
-            return result
-        while True:
-            if self.video_frame_head_cache is not None and self.video_frame_head_cache.timestamp[0] >= start_time:
-                result.append(self.video_frame_head_cache)
-            self.video_frame_head_cache = None
-            try:
-                self.video_frame_head_cache = self.video_frame_cache.get_nowait()
-            except queue.Empty:
-                break
-            if self.video_frame_head_cache.timestamp[0] >= end_time:
-                break
-        if len(result) == 0:
-            return result
-        frame_skip: Optional[int] = None
-        if self.config is not None:
-            frame_skip = self.config.skip_video_frame
-
-        if frame_skip is not None and frame_skip > 0:
-            return result[::frame_skip+1]
-        elif frame_skip == -1:
-            return result[-1:]
+        if self.frame_sampler is None:
+            self.frame_sampler = FrameSampler(
+                max_side=self.config.video_max_side,
+                diff_threshold=self.config.video_diff_threshold,
+                max_frames=50,
+                # 模型直接使用 PIL 图像，只需在后台缩放，不需要 JPEG 编码
+                pre_encode=False,
+            )
+        self.frame_sampler.push(frame.data.get_main_data(), frame.timestamp[0])
+
+    def fetch_video_frames(self, start_time: int, end_time: int) -> List[SampledFrame]:
+        if self.config is None or not self.config.enable_video_input or self.frame_sampler is None:
+            return []
+        frame_skip = self.config.skip_video_frame
+        if frame_skip == -1:
+            max_count = 1
+        elif frame_skip > 0:
+            frame_count = self.frame_sampler.count_between(start_time, end_time)
+            max_count = (frame_count + frame_skip) // (frame_skip + 1)
         else:
-            return result
+            max_count = None
+        # 画面静止时没有新的关键帧，沿用最近一帧，与改动前每段都带最新画面一致
+        result = self.frame_sampler.select_or_latest(max_count, start_time, end_time)
+        for frame in result:
+            self.frame_sampler.record_sent(frame)
+        return result
 
 
 class HandlerS2SMiniCPM(HandlerBase, ABC):
@@ -221,17 +218,14 @@ class HandlerS2SMiniCPM(HandlerBase, ABC):
         )
 
     @staticmethod
-    def _create_message(audio: Optional[np.ndarray], video_frames: Optional[List[ChatData]] = None):
+    def _create_message(audio: Optional[np.ndarray], video_frames: Optional[List[SampledFrame]] = None):
         if audio is None:
             return None
         contents = []
         if video_frames is not None and len(video_frames) > 0:
             contents.append("<unit>")
             for video_frame in video_frames:
-                frame_array = video_frame.data.get_main_data()
-                if frame_array is None:
-                    continue
-                image = PIL.Image.fromarray(np.squeeze(frame_array)[..., ::-1])
+                image = video_frame.get_image()
                 contents.append(image)
 
         contents.append(audio)
@@ -285,7 +279,7 @@ class HandlerS2SMiniCPM(HandlerBase, ABC):
                 segment_start_id = context.audio_prefill_slice_context.get_last_slice_start_index()
                 segment_end_id = segment_start_id + segment_size
                 video_frames = context.fetch_video_frames(segment_start_id, segment_end_id)
-                logger.info(f"Got {len(video_frames)} video frames with time {[x.timestamp[0] for x in video_frames]}")
+                logger.info(f"Got {len(video_frames)} video frames with time {[x.timestamp for x in video_frames]}")
                 msg = self._create_message(audio_segment, video_frames)
                 self._do_prefill(context, [msg], max_slice_nums=1)
                 if not context.prefilling:
@@ -309,10 +303,12 @@ class HandlerS2SMiniCPM(HandlerBase, ABC):
                      np.zeros(shape=(context.audio_prefill_slice_context.slice_size - remainder_audio.shape[0]))])
             end_segment_end_id = end_segment_start_id + segment_size
             video_frames = context.fetch_video_frames(end_segment_start_id, end_segment_end_id)
-            logger.info(f"Got {len(video_frames)} video frames with time {[x.timestamp[0] for x in video_frames]}")
+            logger.info(f"Got {len(video_frames)} video frames with time {[x.timestamp for x in video_frames]}")
             self._do_prefill(context, [self._create_message(remainder_audio, video_frames)], max_slice_nums=1)
 
         context.prefilling = False
+        if context.frame_sampler is not None:
+            context.frame_sampler.log_turn_stats("minicpm")
 
         logger.info(f"Start s2s inference for speech {speech_id}")
         t_start = time.monotonic()
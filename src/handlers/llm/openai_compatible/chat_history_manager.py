@@ -1,6 +1,7 @@
-from dataclasses import dataclass
+from collections import deque
+from dataclasses import dataclass, field
 import re
-from typing import Literal, Optional
+from typing import Deque, Dict, List, Literal, Optional
 
 
 from engine_utils.media_utils import ImageUtils
@@ -13,54 +14,154 @@ class HistoryMessage:
     timestamp: Optional[str] = None
 
 
+@dataclass
+class HistoryRecord:
+    message: Dict[str, str] = field(default_factory=dict)
+    token_count: int = 0
+
+
 name_dict = {
     "avatar": "assistant",
     "human": "user"
 }
 
+_filter_pattern = re.compile(r"[^a-zA-Z0-9\u4e00-\u9fff,.\~!?，。！？ ]")  # 匹配不在范围内的字符
+_cjk_pattern = re.compile(r"[\u4e00-\u9fff，。！？]")
+
+# 不同模型族的分词器对中文/其他字符的平均 token 消耗，按模型名前缀匹配
+_token_ratio_by_model = {
+    "qwen": (0.7, 0.25),
+    "gpt": (1.0, 0.25),
+    "gemini": (0.6, 0.25),
+    "deepseek": (0.6, 0.3),
+    "glm": (0.6, 0.25),
+}
+_default_token_ratio = (1.0, 0.3)
+# 每条消息的 role、分隔符等固定开销
+_message_token_overhead = 4
+
 
 def filter_text(text):
-    pattern = r"[^a-zA-Z0-9\u4e00-\u9fff,.\~!?，。！？ ]"  # 匹配不在范围内的字符
-    filtered_text = re.sub(pattern, "", text)
+    filtered_text = _filter_pattern.sub("", text)
     return filtered_text
 
 
+def estimate_tokens(text: str, model_name: Optional[str] = None) -> int:
+    """
+    不依赖分词器的 token 数估算，用于历史裁剪和成本统计
+    """
+    if not text:
+        return 0
+    cjk_ratio, other_ratio = _default_token_ratio
+    if model_name:
+        lower_name = model_name.lower()
+        for prefix, ratio in _token_ratio_by_model.items():
+            if lower_name.startswith(prefix):
+                cjk_ratio, other_ratio = ratio
+                break
+    cjk_count = len(_cjk_pattern.findall(text))
+    other_count = len(text) - cjk_count
+    return int(cjk_count * cjk_ratio + other_count * other_ratio + 0.5)
+
+
 class ChatHistory:
-    def __init__(self, history_length):
+    def __init__(self, history_length, max_history_tokens: Optional[int] = None, model_name: Optional[str] = None):
         self.max_history_length = history_length
-        self.message_history = []
+        self.max_history_tokens = max_history_tokens
+        self.model_name = model_name
+        self.message_history: Deque[HistoryMessage] = deque()
+        # 与 message_history 一一对应的预过滤、预序列化消息，避免每轮重复处理历史
+        self._records: Deque[HistoryRecord] = deque()
+        self._materialized: List[Dict[str, str]] = []
+        self._materialized_dirty = False
+        self.history_tokens = 0
+        self.last_prompt_tokens = 0
+        # 较早对话的滚动摘要，由调用方拼接到系统提示词中
+        self.summary_text = ''
+        self.summary_tokens = 0
+
+    def _pop_oldest(self):
+        self.message_history.popleft()
+        record = self._records.popleft()
+        self.history_tokens -= record.token_count
+        self._materialized_dirty = True
 
     def add_message(self, message: HistoryMessage):
-        history = self.message_history
-        history.append(message)
+        content = filter_text(message.content)
+        record = HistoryRecord(
+            message={
+                "role": name_dict[message.role],
+                "content": content,
+            },
+            token_count=estimate_tokens(content, self.model_name) + _message_token_overhead,
+        )
+        self.message_history.append(message)
+        self._records.append(record)
+        self.history_tokens += record.token_count
+        if not self._materialized_dirty:
+            self._materialized.append(record.message)
         # thread safe
-        while len(history) >= self.max_history_length:
-            history.pop(0)
+        while len(self.message_history) >= self.max_history_length:
+            self._pop_oldest()
+        if self.max_history_tokens is not None:
+            while len(self.message_history) > 1 and self.history_tokens > self.max_history_tokens:
+                self._pop_oldest()
+
+    def get_records(self) -> List[HistoryRecord]:
+        return list(self._records)
+
+    def apply_summary(self, summarized_records: List[HistoryRecord], summary_text: str) -> int:
+        """
+        用摘要替换已被摘要的最早若干条消息，返回节省的估算 token 数
+        摘要期间已被裁剪掉的消息会被跳过
+        """
+        summarized_ids = set(id(record) for record in summarized_records)
+        removed_tokens = 0
+        while len(self._records) > 0 and id(self._records[0]) in summarized_ids:
+            removed_tokens += self._records[0].token_count
+            self._pop_oldest()
+        old_summary_tokens = self.summary_tokens
+        self.summary_text = summary_text
+        self.summary_tokens = estimate_tokens(summary_text, self.model_name) + _message_token_overhead \
+            if summary_text else 0
+        return removed_tokens + old_summary_tokens - self.summary_tokens
+
+    def get_history_messages(self) -> List[Dict[str, str]]:
+        if self._materialized_dirty:
+            self._materialized = [record.message for record in self._records]
+            self._materialized_dirty = False
+        return self._materialized
+
+    def estimate_prompt_tokens(self, messages: List[Dict]) -> int:
+        """
+        估算一组消息的 prompt token 数，多模态消息只统计文本部分
+        """
+        token_count = 0
+        for message in messages:
+            content = message.get("content", "")
+            if isinstance(content, list):
+                content = "".join(part.get("text", "") for part in content if part.get("type") == "text")
+            token_count += estimate_tokens(content, self.model_name) + _message_token_overhead
+        return token_count
 
     def generate_next_messages(self, chat_text, images):
-        def history_to_message(history: HistoryMessage):
-            return {
-                "role": name_dict[history.role],
-                "content": filter_text(history.content),
-            }
-        history = self.message_history
-        messages = list(map(history_to_message, history))
+        chat_text = filter_text(chat_text)
         if images and len(images) > 0:
-            messages.append({
+            current_message = {
                 "role": "user",
                 "content": [
                     {
                         "type": "text",
-                        "text": filter_text(chat_text),
+                        "text": chat_text,
                     },
                 ] + (list(map(lambda x: {"type": "image_url", "image_url": {"url": ImageUtils.format_image(x)}}, images)))
-            })
-        else: 
-            messages.append({
+            }
+        else:
+            current_message = {
                 "role": "user",
-                "content": filter_text(chat_text),
-            })
-        return messages        
-    
-
-  
\ No newline at end of file
+                "content": chat_text,
+            }
+        messages = self.get_history_messages() + [current_message]
+        self.last_prompt_tokens = self.history_tokens + self.summary_tokens + \
+            estimate_tokens(chat_text, self.model_name) + _message_token_overhead
+        return messages
@@ -0,0 +1,304 @@
+import bisect
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from loguru import logger
+from openai import OpenAI
+
+
+# 首字延迟直方图的桶上界（毫秒），按对数间隔划分
+_TTFT_BUCKETS_MS = [50, 100, 150, 200, 300, 400, 500, 700, 1000, 1500, 2000, 3000, 5000, 8000, 12000, 20000]
+
+
+class TTFTHistogram:
+    """
+    固定分桶的首字延迟直方图，用于估算各端点的延迟分位数
+    """
+
+    def __init__(self, buckets_ms: Optional[List[float]] = None):
+        self.buckets_ms = list(buckets_ms or _TTFT_BUCKETS_MS)
+        self.counts = [0] * (len(self.buckets_ms) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+
+    def record(self, ttft_ms: float):
+        self.counts[bisect.bisect_left(self.buckets_ms, ttft_ms)] += 1
+        self.count += 1
+        self.total_ms += ttft_ms
+
+    def percentile(self, ratio: float) -> Optional[float]:
+        """
+        返回分位数所在桶的上界，没有样本时返回 None
+        """
+        if self.count == 0:
+            return None
+        target = max(1, int(self.count * ratio + 0.5))
+        accumulated = 0
+        for index, bucket_count in enumerate(self.counts):
+            accumulated += bucket_count
+            if accumulated >= target:
+                if index < len(self.buckets_ms):
+                    return float(self.buckets_ms[index])
+                return float(self.buckets_ms[-1]) * 2
+        return float(self.buckets_ms[-1]) * 2
+
+    def mean(self) -> Optional[float]:
+        return self.total_ms / self.count if self.count > 0 else None
+
+
+@dataclass
+class LLMEndpoint:
+    name: str
+    client: OpenAI
+    model_name: str
+    histogram: TTFTHistogram = field(default_factory=TTFTHistogram)
+    request_count: int = 0
+    win_count: int = 0
+    failure_count: int = 0
+    censored_count: int = 0
+    consecutive_failures: int = 0
+    cooldown_until: float = 0.0
+
+
+class _StreamAttempt:
+    """
+    在后台线程中读取一个端点的流式结果，先缓存到队列，胜出后再由调用方取出
+    """
+
+    _END = object()
+
+    def __init__(self, endpoint: LLMEndpoint, create_stream: Callable[[], Iterable], notify: threading.Event):
+        self.endpoint = endpoint
+        self.start_time = time.monotonic()
+        self.first_token_time: Optional[float] = None
+        self.error: Optional[Exception] = None
+        self.finished = False
+
+        self._create_stream = create_stream
+        self._notify = notify
+        self._stream = None
+        self._chunks: queue.Queue = queue.Queue()
+        self._cancel_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            self._stream = self._create_stream()
+            for chunk in self._stream:
+                if self._cancel_event.is_set():
+                    break
+                if self.first_token_time is None and chunk and chunk.choices and chunk.choices[0] \
+                        and chunk.choices[0].delta.content:
+                    self.first_token_time = time.monotonic()
+                    self._notify.set()
+                self._chunks.put(chunk)
+        except Exception as e:
+            if not self._cancel_event.is_set():
+                self.error = e
+                self._chunks.put(e)
+        finally:
+            self._close_stream()
+            self.finished = True
+            self._chunks.put(self._END)
+            self._notify.set()
+
+    def _close_stream(self):
+        stream = self._stream
+        if stream is not None and hasattr(stream, "close"):
+            try:
+                stream.close()
+            except Exception as e:
+                logger.debug(f"close stream of {self.endpoint.name} failed: {e}")
+
+    @property
+    def ttft_ms(self) -> Optional[float]:
+        if self.first_token_time is None:
+            return None
+        return (self.first_token_time - self.start_time) * 1e3
+
+    def cancel(self):
+        self._cancel_event.set()
+        self._close_stream()
+
+    def iter_chunks(self) -> Iterator:
+        while True:
+            chunk = self._chunks.get()
+            if chunk is self._END:
+                return
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+
+
+class EndpointRouter:
+    """
+    多个 OpenAI 兼容端点之间的请求路由：
+    - failover: 按顺序请求，出错或超过 first_token_timeout 仍无首字时切换到下一个端点
+    - hedge: 主端点在对冲延迟内没有首字时向下一个端点再发一个请求，先出首字的胜出，另一个被取消
+    对冲延迟取主端点首字延迟直方图的 hedge_percentile 分位数（限制在 [hedge_min_delay_ms, hedge_delay_ms]），
+    各端点都有足够样本后按首字延迟中位数排序，连续失败的端点暂时降级。
+    对冲中落败的端点没有首字延迟，记录其已等待的时间作为下界样本，否则总是落败的端点永远攒不够样本。
+    """
+
+    POLICY_FAILOVER = "failover"
+    POLICY_HEDGE = "hedge"
+
+    def __init__(self, endpoints: List[LLMEndpoint], policy: str = POLICY_FAILOVER,
+                 hedge_delay_ms: float = 800.0, hedge_min_delay_ms: float = 200.0, hedge_percentile: float = 0.9,
+                 first_token_timeout: float = 15.0, min_samples: int = 20,
+                 failure_threshold: int = 3, failure_cooldown: float = 30.0):
+        if len(endpoints) == 0:
+            raise ValueError("EndpointRouter requires at least one endpoint")
+        if policy not in (self.POLICY_FAILOVER, self.POLICY_HEDGE):
+            raise ValueError(f"Unsupported endpoint policy {policy}")
+        self.endpoints = endpoints
+        self.policy = policy
+        self.hedge_delay_ms = hedge_delay_ms
+        self.hedge_min_delay_ms = hedge_min_delay_ms
+        self.hedge_percentile = hedge_percentile
+        self.first_token_timeout = first_token_timeout
+        self.min_samples = min_samples
+        self.failure_threshold = failure_threshold
+        self.failure_cooldown = failure_cooldown
+        self.hedge_count = 0
+        self._lock = threading.Lock()
+
+    def rank_endpoints(self) -> List[LLMEndpoint]:
+        now = time.monotonic()
+        with self._lock:
+            healthy = [endpoint for endpoint in self.endpoints if endpoint.cooldown_until <= now]
+            cooling = [endpoint for endpoint in self.endpoints if endpoint.cooldown_until > now]
+            if len(healthy) > 1 and all(endpoint.histogram.count >= self.min_samples for endpoint in healthy):
+                healthy.sort(key=lambda endpoint: endpoint.histogram.percentile(0.5))
+        # 全部端点都在降级期时仍按原顺序尝试
+        return healthy + cooling
+
+    def get_hedge_delay(self, endpoint: LLMEndpoint) -> float:
+        with self._lock:
+            if endpoint.histogram.count < self.min_samples:
+                return self.hedge_delay_ms / 1e3
+            delay_ms = endpoint.histogram.percentile(self.hedge_percentile)
+        return min(max(delay_ms, self.hedge_min_delay_ms), self.hedge_delay_ms) / 1e3
+
+    def _record_success(self, attempt: _StreamAttempt):
+        with self._lock:
+            endpoint = attempt.endpoint
+            endpoint.win_count += 1
+            endpoint.consecutive_failures = 0
+            if attempt.ttft_ms is not None:
+                endpoint.histogram.record(attempt.ttft_ms)
+
+    def _record_censored(self, attempt: _StreamAttempt, winner: _StreamAttempt):
+        """
+        落败请求的首字延迟至少是它到胜出时刻已等待的时间；只在该时间不短于胜出者首字延迟时记录，
+        晚发出的请求等待时间太短，不能说明它更慢
+        """
+        if attempt.first_token_time is not None or winner.first_token_time is None:
+            return
+        waited_ms = (winner.first_token_time - attempt.start_time) * 1e3
+        if waited_ms < winner.ttft_ms:
+            return
+        with self._lock:
+            attempt.endpoint.censored_count += 1
+            attempt.endpoint.histogram.record(waited_ms)
+
+    def _record_failure(self, endpoint: LLMEndpoint, reason: str):
+        with self._lock:
+            endpoint.failure_count += 1
+            endpoint.consecutive_failures += 1
+            if endpoint.consecutive_failures >= self.failure_threshold:
+                endpoint.cooldown_until = time.monotonic() + self.failure_cooldown
+        logger.warning(f"llm endpoint {endpoint.name} failed: {reason}")
+
+    def _launch(self, endpoint: LLMEndpoint, create_stream: Callable[[LLMEndpoint], Iterable],
+                notify: threading.Event) -> _StreamAttempt:
+        with self._lock:
+            endpoint.request_count += 1
+        return _StreamAttempt(endpoint, lambda: create_stream(endpoint), notify)
+
+    def open_stream(self, create_stream: Callable[[LLMEndpoint], Iterable]) -> Iterator:
+        """
+        按路由策略发起流式请求，返回胜出端点的结果；首字之后的错误不再切换端点，直接抛出
+        """
+        pending = self.rank_endpoints()
+        notify = threading.Event()
+        active: List[_StreamAttempt] = []
+        winner: Optional[_StreamAttempt] = None
+        last_error: Optional[Exception] = None
+        hedge_time = None
+        try:
+            active.append(self._launch(pending.pop(0), create_stream, notify))
+            if self.policy == self.POLICY_HEDGE and len(pending) > 0:
+                hedge_time = active[0].start_time + self.get_hedge_delay(active[0].endpoint)
+            while winner is None:
+                notify.clear()
+                now = time.monotonic()
+                for attempt in list(active):
+                    if attempt.first_token_time is not None or (attempt.finished and attempt.error is None):
+                        winner = attempt
+                        break
+                    if attempt.finished:
+                        last_error = attempt.error
+                        self._record_failure(attempt.endpoint, str(attempt.error))
+                        active.remove(attempt)
+                    elif now - attempt.start_time >= self.first_token_timeout:
+                        last_error = TimeoutError(f"no first token from {attempt.endpoint.name} "
+                                                  f"in {self.first_token_timeout}s")
+                        attempt.cancel()
+                        self._record_failure(attempt.endpoint, str(last_error))
+                        active.remove(attempt)
+                if winner is not None:
+                    break
+                if len(active) == 0:
+                    if len(pending) == 0:
+                        raise last_error
+                    # 失败切换：当前端点出错或超时，立即请求下一个端点
+                    active.append(self._launch(pending.pop(0), create_stream, notify))
+                    continue
+                if hedge_time is not None and now >= hedge_time:
+                    hedge_time = None
+                    if len(pending) > 0:
+                        self.hedge_count += 1
+                        logger.info(f"no first token from {active[0].endpoint.name} after "
+                                    f"{round((now - active[0].start_time) * 1e3)} ms, "
+                                    f"hedge request to {pending[0].name}")
+                        active.append(self._launch(pending.pop(0), create_stream, notify))
+                wait_until = min(attempt.start_time + self.first_token_timeout for attempt in active)
+                if hedge_time is not None:
+                    wait_until = min(wait_until, hedge_time)
+                notify.wait(max(0.0, wait_until - time.monotonic()))
+            for attempt in active:
+                if attempt is not winner:
+                    attempt.cancel()
+                    self._record_censored(attempt, winner)
+            self._record_success(winner)
+            if winner.ttft_ms is not None:
+                logger.info(f"llm endpoint {winner.endpoint.name} won with ttft {round(winner.ttft_ms)} ms, "
+                            f"{len(active)} request(s) in flight")
+            try:
+                yield from winner.iter_chunks()
+            except Exception as e:
+                self._record_failure(winner.endpoint, f"stream interrupted: {e}")
+                raise
+        finally:
+            for attempt in active:
+                attempt.cancel()
+
+    def get_stats(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {
+                endpoint.name: {
+                    "requests": endpoint.request_count,
+                    "wins": endpoint.win_count,
+                    "failures": endpoint.failure_count,
+                    "censored": endpoint.censored_count,
+                    "ttft_p50": endpoint.histogram.percentile(0.5),
+                    "ttft_p90": endpoint.histogram.percentile(0.9),
+                    "ttft_p99": endpoint.histogram.percentile(0.99),
+                }
+                for endpoint in self.endpoints
+            }
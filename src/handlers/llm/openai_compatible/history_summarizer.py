@@ -0,0 +1,113 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+
+from loguru import logger
+from openai import OpenAI
+
+from handlers.llm.openai_compatible.chat_history_manager import ChatHistory, HistoryRecord
+
+
+DEFAULT_SUMMARY_PROMPT = (
+    "你是对话摘要助手。请把下面的历史对话（以及已有摘要）压缩成一段简洁的中文摘要，"
+    "保留用户的关键信息、情绪变化、提到的事件和尚未解决的问题，不要编造内容，不超过200字。"
+)
+
+
+@dataclass
+class _PendingSummary:
+    records: List[HistoryRecord]
+    summary_text: str
+    duration: float
+
+
+class HistorySummarizer:
+    """
+    后台对话摘要器：历史超过 token 预算时，用较便宜的模型异步把较早的对话压缩成滚动摘要，
+    摘要结果在下一轮开始前由 handler 线程换入，不阻塞当前回复。
+    """
+
+    def __init__(self, client: OpenAI, model_name: str, trigger_tokens: int, keep_recent_messages: int = 6,
+                 summary_prompt: Optional[str] = None, max_tokens: int = 300, request_timeout: float = 30.0):
+        self.client = client
+        self.model_name = model_name
+        self.trigger_tokens = trigger_tokens
+        self.keep_recent_messages = keep_recent_messages
+        self.summary_prompt = summary_prompt or DEFAULT_SUMMARY_PROMPT
+        self.max_tokens = max_tokens
+        self.request_timeout = request_timeout
+
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._pending: Optional[_PendingSummary] = None
+        self.summary_count = 0
+        self.saved_tokens_total = 0
+
+    def is_running(self) -> bool:
+        return self._worker is not None and self._worker.is_alive()
+
+    def maybe_start(self, history: ChatHistory) -> bool:
+        """
+        在 handler 线程中调用，历史超过预算且没有进行中的摘要任务时启动后台摘要
+        """
+        if history.history_tokens + history.summary_tokens <= self.trigger_tokens:
+            return False
+        if self.is_running() or self._pending is not None:
+            return False
+        records = history.get_records()
+        if len(records) <= self.keep_recent_messages:
+            return False
+        summarized_records = records[:len(records) - self.keep_recent_messages]
+        previous_summary = history.summary_text
+        self._worker = threading.Thread(target=self._summarize,
+                                        args=(summarized_records, previous_summary), daemon=True)
+        self._worker.start()
+        return True
+
+    def _summarize(self, records: List[HistoryRecord], previous_summary: str):
+        start_time = time.monotonic()
+        lines = []
+        if previous_summary:
+            lines.append(f"【已有摘要】：{previous_summary}")
+        for record in records:
+            speaker = "用户" if record.message["role"] == "user" else "助手"
+            lines.append(f"{speaker}：{record.message['content']}")
+        try:
+            completion = self.client.chat.completions.create(
+                model=self.model_name,
+                messages=[
+                    {"role": "system", "content": self.summary_prompt},
+                    {"role": "user", "content": "\n".join(lines)},
+                ],
+                max_tokens=self.max_tokens,
+                timeout=self.request_timeout,
+            )
+            summary_text = completion.choices[0].message.content or ""
+        except Exception as e:
+            logger.warning(f"history summary failed: {e}")
+            return
+        if len(summary_text.strip()) == 0:
+            return
+        with self._lock:
+            self._pending = _PendingSummary(records=records, summary_text=summary_text.strip(),
+                                            duration=time.monotonic() - start_time)
+
+    def apply_pending(self, history: ChatHistory) -> int:
+        """
+        在 handler 线程中、两轮对话之间调用，把已完成的摘要换入历史，返回节省的估算 token 数
+        """
+        with self._lock:
+            pending = self._pending
+            self._pending = None
+        if pending is None:
+            return 0
+        tokens_before = history.history_tokens + history.summary_tokens
+        saved_tokens = history.apply_summary(pending.records, pending.summary_text)
+        self.summary_count += 1
+        self.saved_tokens_total += saved_tokens
+        logger.info(f"history summary applied in {round(pending.duration * 1e3)} ms, "
+                    f"summarized {len(pending.records)} messages, "
+                    f"history tokens {tokens_before} -> {history.history_tokens + history.summary_tokens}, "
+                    f"saved total {self.saved_tokens_total}")
+        return saved_tokens
@@ -2,13 +2,14 @@
 
 import os
 import re
+import time
 import requests
 import json
-from typing import Dict, Optional, cast
+from typing import Dict, List, Optional, cast
 from loguru import logger
 from pydantic import BaseModel, Field
 from abc import ABC
-from openai import APIStatusError, OpenAI
+from openai import APIStatusError
 from chat_engine.contexts.handler_context import HandlerContext
 from chat_engine.data_models.chat_engine_config_data import ChatEngineConfigModel, HandlerBaseConfigModel
 from chat_engine.common.handler_base import HandlerBase, HandlerBaseInfo, HandlerDataInfo, HandlerDetail
@@ -16,11 +17,19 @@ from chat_engine.data_models.chat_data.chat_data_model import ChatData
 from chat_engine.data_models.chat_data_type import ChatDataType
 from chat_engine.contexts.session_context import SessionContext
 from chat_engine.data_models.runtime_data.data_bundle import DataBundle, DataBundleDefinition, DataBundleEntry
+from engine_utils.llm_client_pool import LLMClientPoolConfig, llm_client_pool
+from engine_utils.frame_sampler import FrameSampler
+from engine_utils.ttl_cache import TTLCache
 from handlers.llm.openai_compatible.chat_history_manager import ChatHistory, HistoryMessage
+from handlers.llm.openai_compatible.endpoint_router import EndpointRouter, LLMEndpoint
+from handlers.llm.openai_compatible.history_summarizer import HistorySummarizer
+from handlers.llm.openai_compatible.opening_prefetch import OpeningPrefetch
+from handlers.llm.openai_compatible.speculative_request import SpeculativeRequest
+from handlers.llm.openai_compatible.token_coalescer import DEFAULT_FLUSH_PUNCTUATION, TokenCoalescer
 
-# 全局缓存，避免重复请求
-_survey_data_cache = {}
-_user_info_cache = {}
+# 全局缓存，避免重复请求；容量、过期时间在 handler load 时按配置更新
+_survey_data_cache = TTLCache("survey_data_cache")
+_user_info_cache = TTLCache("user_info_cache")
 
 
 def parse_survey_data(data_list: list) -> str:
@@ -111,17 +120,10 @@ def parse_user_info(user_data: dict) -> str:
     return "\n".join(user_info_lines)
 
 
-def get_user_info(user_id: str, api_url: str) -> str:
+def fetch_user_info(user_id: str, api_url: str) -> Optional[str]:
     """
-    获取用户信息并返回解析结果
-    使用缓存避免重复请求
+    请求用户信息接口并返回解析结果，失败时返回 None
     """
-    # 检查缓存
-    cache_key = f"{user_id}_{api_url}"
-    if cache_key in _user_info_cache:
-        logger.debug(f"Using cached user info for user {user_id}")
-        return _user_info_cache[cache_key]
-    
     try:
         headers = {
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36',
@@ -135,29 +137,20 @@ def get_user_info(user_id: str, api_url: str) -> str:
         if result.get("resultCode") == 200 and "data" in result:
             user_data = result["data"]
             parsed_info = parse_user_info(user_data)
-            # 缓存结果
-            _user_info_cache[cache_key] = parsed_info
-            logger.info(f"Cached user info for user {user_id}")
+            logger.info(f"Fetched user info for user {user_id}")
             return parsed_info
         else:
             logger.warning(f"Failed to get user info: {result.get('resultMsg', 'Unknown error')}")
-            return ""
+            return None
     except Exception as e:
         logger.error(f"Error fetching user info: {e}")
-        return ""
+        return None
 
 
-def get_user_survey_data(user_id: str, api_url: str) -> str:
+def fetch_user_survey_data(user_id: str, api_url: str) -> Optional[str]:
     """
-    获取用户测评数据并返回简化的解析结果
-    使用缓存避免重复请求
+    请求用户测评数据接口并返回简化的解析结果，失败时返回 None
     """
-    # 检查缓存
-    cache_key = f"{user_id}_{api_url}"
-    if cache_key in _survey_data_cache:
-        logger.debug(f"Using cached survey data for user {user_id}")
-        return _survey_data_cache[cache_key]
-    
     try:
         headers = {'content-type': 'application/json'}
         data = {"userId": user_id}
@@ -169,16 +162,52 @@ def get_user_survey_data(user_id: str, api_url: str) -> str:
         if result.get("resultCode") == 200 and "data" in result:
             data_list = result["data"]
             parsed_data = parse_survey_data(data_list)
-            # 缓存结果
-            _survey_data_cache[cache_key] = parsed_data
-            logger.info(f"Cached survey data for user {user_id}")
+            logger.info(f"Fetched survey data for user {user_id}")
             return parsed_data
         else:
             logger.warning(f"Failed to get survey data: {result.get('resultMsg', 'Unknown error')}")
-            return ""
+            return None
     except Exception as e:
         logger.error(f"Error fetching user survey data: {e}")
-        return ""
+        return None
+
+
+def get_user_info(user_id: str, api_url: str, timeout: Optional[float] = None) -> str:
+    """
+    获取用户信息并返回解析结果
+    命中缓存时直接返回，未命中时最多等待 timeout 秒，超时后返回空字符串，请求在后台继续并写入缓存
+    """
+    return _user_info_cache.get((user_id, api_url), lambda: fetch_user_info(user_id, api_url),
+                                timeout=timeout, default="")
+
+
+def get_user_survey_data(user_id: str, api_url: str, timeout: Optional[float] = None) -> str:
+    """
+    获取用户测评数据并返回简化的解析结果
+    命中缓存时直接返回，未命中时最多等待 timeout 秒，超时后返回空字符串，请求在后台继续并写入缓存
+    """
+    return _survey_data_cache.get((user_id, api_url), lambda: fetch_user_survey_data(user_id, api_url),
+                                  timeout=timeout, default="")
+
+
+def prefetch_user_profile(user_id: str, user_info_api_url: str, survey_api_url: str):
+    """
+    后台预取用户信息和测评数据，不阻塞调用方
+    """
+    if not user_id:
+        return
+    _user_info_cache.prefetch((user_id, user_info_api_url),
+                              lambda: fetch_user_info(user_id, user_info_api_url))
+    _survey_data_cache.prefetch((user_id, survey_api_url),
+                                lambda: fetch_user_survey_data(user_id, survey_api_url))
+
+
+class LLMEndpointConfig(BaseModel):
+    # 备用端点，未填写的 api_key、model_name 沿用主端点配置
+    api_url: str = Field(default=None)
+    api_key: Optional[str] = Field(default=None)
+    model_name: Optional[str] = Field(default=None)
+    name: Optional[str] = Field(default=None)
 
 
 class LLMConfig(HandlerBaseConfigModel, BaseModel):
@@ -187,12 +216,71 @@ class LLMConfig(HandlerBaseConfigModel, BaseModel):
     api_key: str = Field(default=os.getenv("DASHSCOPE_API_KEY"))
     api_url: str = Field(default=None)
     enable_video_input: bool = Field(default=False)
+    # 视频输入关键帧采样：帧间差异超过阈值才保留，缩放到最长边 video_max_side 后在后台预编码
+    video_max_side: int = Field(default=768)
+    video_diff_threshold: float = Field(default=0.04)
+    video_min_interval_ms: float = Field(default=200.0)
+    video_max_frames_per_turn: int = Field(default=1)
     history_length: int = Field(default=20)
+    # 历史消息的估算 token 上限，超出时从最早的消息开始裁剪，为 None 时只按条数裁剪
+    max_history_tokens: Optional[int] = Field(default=4096)
+    # 后台对话摘要，历史估算 token 超过 summary_trigger_tokens 时把较早的对话压缩为摘要
+    # summary_trigger_tokens 应小于 max_history_tokens，否则消息会先被裁剪掉
+    enable_history_summary: bool = Field(default=False)
+    summary_model_name: Optional[str] = Field(default=None)
+    summary_api_url: Optional[str] = Field(default=None)
+    summary_api_key: Optional[str] = Field(default=None)
+    summary_trigger_tokens: int = Field(default=2048)
+    summary_keep_recent_messages: int = Field(default=6)
+    summary_max_tokens: int = Field(default=300)
+    # 收到 ASR 推测文本（VAD 短静音）时提前发起请求，结果缓存到最终文本确认一致后才输出
+    enable_speculative_request: bool = Field(default=False)
+    # 会话开始后在后台预先生成开场白（模板A），首轮对话直接输出，未完成时回退到实时生成
+    enable_opening_prefetch: bool = Field(default=False)
+    # 预生成开场白时代替用户首句的输入
+    opening_prefetch_user_text: str = Field(default="你好")
+    # 首轮对话时等待预生成结果的最长时间（秒），为 0 时不等待
+    opening_prefetch_wait: float = Field(default=0.0)
+    # 开场白生成后提前送给 TTS 合成并缓存，首轮对话可直接播放
+    opening_presynthesize: bool = Field(default=False)
+    # 流式输出合并：首段立即输出，之后遇到分句标点、累积 emit_flush_chars 个字符或间隔
+    # emit_flush_interval_ms 毫秒时输出，emit_flush_chars 为 0 时逐片段输出
+    emit_flush_chars: int = Field(default=16)
+    emit_flush_interval_ms: float = Field(default=200.0)
+    emit_flush_punctuation: str = Field(default=DEFAULT_FLUSH_PUNCTUATION)
+    # 备用端点列表，配置后主端点（api_url/model_name）与备用端点按 endpoint_policy 路由：
+    # failover 为出错或首字超时后切换，hedge 为主端点在对冲延迟内无首字时并发请求下一个端点
+    endpoints: Optional[List[LLMEndpointConfig]] = Field(default=None)
+    endpoint_policy: str = Field(default="failover")
+    hedge_delay_ms: float = Field(default=800.0)
+    hedge_min_delay_ms: float = Field(default=200.0)
+    first_token_timeout: float = Field(default=15.0)
     user_id: str = Field(default="4d8f3a08-e886-43ff-ba7f-93ca0a1b0f96")
     survey_api_url: str = Field(default="https://www.zhgk-mind.com/api/dwsurvey/anon/response/getUserResultInfo.do")
     user_info_api_url: str = Field(default="https://www.zhgk-mind.com/api/dwsurvey/anon/response/userInfo.do")
     # 支持多个提示词模板
     system_prompt_templates: Optional[Dict[str, str]] = Field(default=None)
+    # 共享连接池配置，同一 api_url 的所有会话复用 keep-alive 连接
+    max_connections: int = Field(default=8)
+    enable_http2: bool = Field(default=True)
+    prewarm_connections: int = Field(default=1)
+    connect_timeout: float = Field(default=5.0)
+    request_timeout: float = Field(default=60.0)
+    # 用户信息/测评数据缓存配置
+    profile_cache_size: int = Field(default=1024)
+    profile_cache_ttl: float = Field(default=300.0)
+    profile_cache_stale_ttl: float = Field(default=3600.0)
+    # 缓存未命中时在会话创建和首轮对话中最多等待的时间（秒）
+    profile_fetch_timeout: float = Field(default=2.0)
+
+    def get_client_pool_config(self) -> LLMClientPoolConfig:
+        return LLMClientPoolConfig(
+            max_connections=self.max_connections,
+            connect_timeout=self.connect_timeout,
+            request_timeout=self.request_timeout,
+            http2=self.enable_http2,
+            prewarm_connections=self.prewarm_connections,
+        )
 
 
 class LLMContext(HandlerContext):
@@ -207,7 +295,7 @@ class LLMContext(HandlerContext):
         self.client = None
         self.input_texts = ""
         self.output_texts = ""
-        self.current_image = None
+        self.frame_sampler: Optional[FrameSampler] = None
         self.history = None
         self.enable_video_input = False
         # 对话状态跟踪
@@ -215,11 +303,26 @@ class LLMContext(HandlerContext):
         self.system_prompt_templates = None
         self.handler_config = None  # 存储配置信息
         self.user_id = None  # 存储用户ID
+        self.request_timeout = None
+        # 会话级 token 统计，优先使用接口返回的 usage，缺失时使用估算值
+        self.turn_count = 0
+        self.prompt_tokens_total = 0
+        self.completion_tokens_total = 0
+        self.summarizer: Optional[HistorySummarizer] = None
+        self.enable_speculative_request = False
+        self.speculation: Optional[SpeculativeRequest] = None
+        self.speculative_hit_count = 0
+        self.speculative_miss_count = 0
+        self.speculative_wasted_tokens = 0
+        self.opening_prefetch: Optional[OpeningPrefetch] = None
+        self.pending_opening: Optional[str] = None
 
 
 class HandlerLLM(HandlerBase, ABC):
     def __init__(self):
         super().__init__()
+        self.handler_config: Optional[LLMConfig] = None
+        self.endpoint_router: Optional[EndpointRouter] = None
 
     def get_handler_info(self) -> HandlerBaseInfo:
         return HandlerBaseInfo(
@@ -254,6 +357,64 @@ class HandlerLLM(HandlerBase, ABC):
                 error_message = 'api_key is required in config/xxx.yaml, when use handler_llm'
                 logger.error(error_message)
                 raise ValueError(error_message)
+            self.handler_config = handler_config
+            llm_client_pool.acquire(handler_config.api_url, handler_config.api_key,
+                                    handler_config.get_client_pool_config())
+            llm_client_pool.prewarm(handler_config.api_url, handler_config.api_key)
+            if handler_config.enable_history_summary:
+                # 摘要端点与主端点不同时也由 handler 持有引用，destroy 时释放
+                llm_client_pool.acquire(*self._get_summary_endpoint(handler_config),
+                                        handler_config.get_client_pool_config())
+            if handler_config.endpoints:
+                self.endpoint_router = self._create_endpoint_router(handler_config)
+            for cache in (_user_info_cache, _survey_data_cache):
+                cache.max_size = handler_config.profile_cache_size
+                cache.ttl = handler_config.profile_cache_ttl
+                cache.stale_ttl = handler_config.profile_cache_stale_ttl
+            try:
+                # 用户ID写入存储时即开始预取用户数据，会话创建时大概率已命中缓存
+                from src.utils.user_id_storage import add_user_id_listener
+                add_user_id_listener(self._on_user_id_stored)
+            except Exception as e:
+                logger.warning(f"⚠️ 注册用户ID预取回调失败: {e}")
+
+    @staticmethod
+    def _get_summary_endpoint(handler_config: LLMConfig):
+        return (handler_config.summary_api_url or handler_config.api_url,
+                handler_config.summary_api_key or handler_config.api_key)
+
+    @staticmethod
+    def _create_endpoint_router(handler_config: LLMConfig) -> EndpointRouter:
+        pool_config = handler_config.get_client_pool_config()
+        endpoints = [LLMEndpoint(
+            name=handler_config.model_name,
+            client=llm_client_pool.get_client(handler_config.api_url, handler_config.api_key, pool_config),
+            model_name=handler_config.model_name,
+        )]
+        for index, endpoint_config in enumerate(handler_config.endpoints):
+            api_key = endpoint_config.api_key or handler_config.api_key
+            model_name = endpoint_config.model_name or handler_config.model_name
+            client = llm_client_pool.acquire(endpoint_config.api_url, api_key, pool_config)
+            llm_client_pool.prewarm(endpoint_config.api_url, api_key)
+            endpoints.append(LLMEndpoint(
+                name=endpoint_config.name or f"{model_name}#{index + 1}",
+                client=client,
+                model_name=model_name,
+            ))
+        logger.info(f"llm endpoint router: policy={handler_config.endpoint_policy} "
+                    f"endpoints={[endpoint.name for endpoint in endpoints]}")
+        return EndpointRouter(
+            endpoints=endpoints,
+            policy=handler_config.endpoint_policy,
+            hedge_delay_ms=handler_config.hedge_delay_ms,
+            hedge_min_delay_ms=handler_config.hedge_min_delay_ms,
+            first_token_timeout=handler_config.first_token_timeout,
+        )
+
+    def _on_user_id_stored(self, session_id: str, user_id: str):
+        if self.handler_config is None:
+            return
+        prefetch_user_profile(user_id, self.handler_config.user_info_api_url, self.handler_config.survey_api_url)
 
     def create_context(self, session_context, handler_config=None):
         if not isinstance(handler_config, LLMConfig):
@@ -304,9 +465,11 @@ class HandlerLLM(HandlerBase, ABC):
         # 将用户ID存储到context中
         context.user_id = user_id
         
-        # 获取用户信息和测评数据
-        user_info = get_user_info(user_id, handler_config.user_info_api_url)
-        survey_data = get_user_survey_data(user_id, handler_config.survey_api_url)
+        # 获取用户信息和测评数据，两个接口并行请求，未命中缓存时的等待时间有上限
+        prefetch_user_profile(user_id, handler_config.user_info_api_url, handler_config.survey_api_url)
+        user_info = get_user_info(user_id, handler_config.user_info_api_url, handler_config.profile_fetch_timeout)
+        survey_data = get_user_survey_data(user_id, handler_config.survey_api_url,
+                                           handler_config.profile_fetch_timeout)
         
         # 选择系统提示词模板
         if context.system_prompt_templates and "B" in context.system_prompt_templates:
@@ -349,12 +512,31 @@ class HandlerLLM(HandlerBase, ABC):
         context.api_key = handler_config.api_key
         context.api_url = handler_config.api_url
         context.enable_video_input = handler_config.enable_video_input
-        context.history = ChatHistory(history_length=handler_config.history_length)
-        context.client = OpenAI(
-            # 若没有配置环境变量，请用百炼API Key将下行替换为：api_key="sk-xxx",
-            api_key=context.api_key,
-            base_url=context.api_url,
-        )
+        if context.enable_video_input:
+            context.frame_sampler = FrameSampler(
+                max_side=handler_config.video_max_side,
+                diff_threshold=handler_config.video_diff_threshold,
+                min_interval_ms=handler_config.video_min_interval_ms,
+            )
+        context.history = ChatHistory(history_length=handler_config.history_length,
+                                      max_history_tokens=handler_config.max_history_tokens,
+                                      model_name=handler_config.model_name)
+        context.request_timeout = handler_config.request_timeout
+        context.enable_speculative_request = handler_config.enable_speculative_request
+        # 同一端点的会话共享连接池中的客户端，避免每个会话重新握手
+        context.client = llm_client_pool.get_client(context.api_url, context.api_key,
+                                                    handler_config.get_client_pool_config())
+        if handler_config.enable_history_summary:
+            summary_api_url, summary_api_key = self._get_summary_endpoint(handler_config)
+            context.summarizer = HistorySummarizer(
+                client=llm_client_pool.get_client(summary_api_url, summary_api_key,
+                                                  handler_config.get_client_pool_config()),
+                model_name=handler_config.summary_model_name or handler_config.model_name,
+                trigger_tokens=handler_config.summary_trigger_tokens,
+                keep_recent_messages=handler_config.summary_keep_recent_messages,
+                max_tokens=handler_config.summary_max_tokens,
+                request_timeout=handler_config.request_timeout,
+            )
         return context
     
     def update_system_prompt_for_conversation(self, context: LLMContext, handler_config=None, template="B"):
@@ -369,16 +551,28 @@ class HandlerLLM(HandlerBase, ABC):
         template_name = "开场白模式" if template == "A" else "对话模式"
         logger.info(f"正在切换到{template_name}（模板{template}）")
         
+        context.system_prompt = self.build_system_prompt_for_conversation(context, handler_config, template)
+        
+        # 更新对话状态
+        context.is_first_interaction = False
+        logger.info(f"已成功切换到{template_name}（模板{template}）")
+    
+    def build_system_prompt_for_conversation(self, context: LLMContext, handler_config=None, template="B"):
+        """
+        按指定模板和用户信息、测评数据构建系统提示词，不修改 context，可在后台线程中调用
+        """
         # 从配置中获取API URL和用户ID
         if handler_config:
             default_user_id = handler_config.user_id
             user_info_api_url = handler_config.user_info_api_url
             survey_api_url = handler_config.survey_api_url
+            fetch_timeout = handler_config.profile_fetch_timeout
         else:
             # 使用默认值
             default_user_id = "4d8f3a08-e886-43ff-ba7f-93ca0a1b0f96"
             user_info_api_url = "https://www.zhgk-mind.com/api/dwsurvey/anon/response/userInfo.do"
             survey_api_url = "https://www.zhgk-mind.com/api/dwsurvey/anon/response/getUserResultInfo.do"
+            fetch_timeout = None
         
         # 详细排查用户ID获取逻辑
         # logger.info(f"🔍 用户ID排查开始:")
@@ -419,9 +613,10 @@ class HandlerLLM(HandlerBase, ABC):
         
         # 获取用户信息和测评数据
         logger.info(f"📞 开始获取用户信息，用户ID: {user_id}")
-        user_info = get_user_info(user_id, user_info_api_url)
+        prefetch_user_profile(user_id, user_info_api_url, survey_api_url)
+        user_info = get_user_info(user_id, user_info_api_url, fetch_timeout)
         logger.info(f"📊 开始获取用户测评数据，用户ID: {user_id}")
-        survey_data = get_user_survey_data(user_id, survey_api_url)
+        survey_data = get_user_survey_data(user_id, survey_api_url, fetch_timeout)
         
         # 使用指定模板
         base_prompt = context.system_prompt_templates[template]
@@ -436,14 +631,29 @@ class HandlerLLM(HandlerBase, ABC):
             enhanced_parts.append(f"【用户测评数据】：\n{survey_data}")
         
         enhanced_system_prompt = "\n\n".join(enhanced_parts)
-        context.system_prompt = {'role': 'system', 'content': enhanced_system_prompt}
-        
-        # 更新对话状态
-        context.is_first_interaction = False
-        logger.info(f"已成功切换到{template_name}（模板{template}）")
+        return {'role': 'system', 'content': enhanced_system_prompt}
     
     def start_context(self, session_context, handler_context):
-        pass
+        context = cast(LLMContext, handler_context)
+        handler_config = context.handler_config
+        if handler_config is None or not handler_config.enable_opening_prefetch:
+            return
+        if not context.system_prompt_templates or "A" not in context.system_prompt_templates:
+            logger.warning("未配置开场白模板A，跳过开场白预生成")
+            return
+
+        def build_messages():
+            system_prompt = self.build_system_prompt_for_conversation(context, handler_config, template="A")
+            return [system_prompt, {"role": "user", "content": handler_config.opening_prefetch_user_text}]
+
+        on_ready = None
+        if handler_config.opening_presynthesize:
+            on_ready = lambda prefetch: self._presynthesize_opening(context, prefetch)
+        context.opening_prefetch = OpeningPrefetch(
+            build_messages=build_messages,
+            create_completion=lambda messages: self._create_opening_completion(context, messages),
+            on_ready=on_ready,
+        )
 
     def handle(self, context: HandlerContext, inputs: ChatData,
                output_definitions: Dict[ChatDataType, HandlerDataInfo]):
@@ -453,14 +663,17 @@ class HandlerLLM(HandlerBase, ABC):
         # 如果是首次交互，在第一次处理用户输入前切换到开场白模式
         template_switched = False
         if context.is_first_interaction and inputs.type == ChatDataType.HUMAN_TEXT:
-            logger.info("首次用户输入，切换到开场白模式（模板A）")
-            # 使用存储的配置信息
-            self.update_system_prompt_for_conversation(context, context.handler_config, template="A")
-            template_switched = True
+            if self._take_prefetched_opening(context):
+                logger.info("首次用户输入，使用预生成的开场白（模板A）")
+            else:
+                logger.info("首次用户输入，切换到开场白模式（模板A）")
+                # 使用存储的配置信息
+                self.update_system_prompt_for_conversation(context, context.handler_config, template="A")
+                template_switched = True
         
         text = None
         if inputs.type == ChatDataType.CAMERA_VIDEO and context.enable_video_input:
-            context.current_image = inputs.data.get_main_data()
+            context.frame_sampler.push(inputs.data.get_main_data(), inputs.timestamp[0])
             return
         elif inputs.type == ChatDataType.HUMAN_TEXT:
             text = inputs.data.get_main_data()
@@ -470,6 +683,14 @@ class HandlerLLM(HandlerBase, ABC):
         if (speech_id is None):
             speech_id = context.session_id
 
+        if inputs.data.get_meta("human_text_speculative_cancel", False):
+            self._discard_speculation(context)
+            return
+        if inputs.data.get_meta("human_text_speculative", False):
+            if context.enable_speculative_request and text is not None:
+                self._start_speculation(context, text)
+            return
+
         if text is not None:
             context.input_texts += text
 
@@ -480,42 +701,73 @@ class HandlerLLM(HandlerBase, ABC):
         chat_text = context.input_texts
         chat_text = re.sub(r"<\|.*?\|>", "", chat_text)
         if len(chat_text) < 1:
+            self._discard_speculation(context)
             return
         logger.info(f'llm input {context.model_name} {chat_text} ')
-        current_content = context.history.generate_next_messages(chat_text, 
-                                                                 [context.current_image] if context.current_image is not None else [])
-        logger.debug(f'llm input {context.model_name} {current_content} ')
+
+        if context.pending_opening is not None:
+            self._discard_speculation(context)
+            yield from self._emit_prefetched_opening(context, chat_text, speech_id, output_definition)
+            return
+
+        completion = None
+        speculation = context.speculation
+        context.speculation = None
+        if speculation is not None:
+            if speculation.matches(chat_text):
+                context.speculative_hit_count += 1
+                logger.info(f"speculative llm request hit, started "
+                            f"{round((time.monotonic() - speculation.start_time) * 1e3)} ms before end of speech")
+                completion = speculation.iter_chunks()
+            else:
+                self._discard_speculation(context, speculation)
+        if completion is None:
+            current_content = self._prepare_messages(context, chat_text)
+            logger.debug(f'llm input {context.model_name} {current_content} ')
         
         # 如果模板已切换，记录新的系统提示词
         if template_switched:
             logger.info(f"使用更新后的系统提示词（模板A）: {context.system_prompt['content'][:100]}...")
         
         try:
-            completion = context.client.chat.completions.create(
-                model=context.model_name,  # 此处以qwen-plus为例，可按需更换模型名称。模型列表：https://help.aliyun.com/zh/model-studio/getting-started/models
-                messages=[
-                    context.system_prompt,
-                ] + current_content,
-                stream=True,
-                stream_options={"include_usage": True}
-            )
-            context.current_image = None
+            request_start = time.monotonic()
+            first_token_received = False
+            if completion is None:
+                completion = self._create_completion(context, current_content)
             context.input_texts = ''
             context.output_texts = ''
+            usage = None
+            coalescer = self._create_coalescer(context)
             for chunk in completion:
+                if chunk and getattr(chunk, "usage", None):
+                    usage = chunk.usage
                 if (chunk and chunk.choices and chunk.choices[0] and chunk.choices[0].delta.content):
                     output_text = chunk.choices[0].delta.content
+                    if not first_token_received:
+                        first_token_received = True
+                        logger.info(f"llm time to first token {round((time.monotonic() - request_start) * 1e3)} ms")
                     context.output_texts += output_text
-                    logger.info(output_text)
-                    output = DataBundle(output_definition)
-                    output.set_main_data(output_text)
-                    output.add_meta("avatar_text_end", False)
-                    output.add_meta("speech_id", speech_id)
-                    yield output
+                    emit_text = coalescer.push(output_text)
+                    if emit_text is not None:
+                        logger.debug(emit_text)
+                        yield self._create_text_output(output_definition, emit_text, speech_id)
+            emit_text = coalescer.flush()
+            if emit_text is not None:
+                logger.debug(emit_text)
+                yield self._create_text_output(output_definition, emit_text, speech_id)
+            logger.info(f"llm output {context.output_texts}, "
+                        f"{coalescer.push_count} chunks emitted as {coalescer.emit_count} messages")
             context.history.add_message(HistoryMessage(role="human", content=chat_text))
             context.history.add_message(HistoryMessage(role="avatar", content=context.output_texts))
+            self._update_token_stats(context, usage)
+            if context.frame_sampler is not None:
+                context.frame_sampler.log_turn_stats("llm")
+            if context.summarizer is not None:
+                context.summarizer.maybe_start(context.history)
         except Exception as e:
             logger.error(e)
+            # 端点全部失败时路由抛出超时或连接错误，同样返回错误文本并结束本轮
+            response = str(e)
             if (isinstance(e, APIStatusError)):
                 response = e.body
                 if isinstance(response, dict) and "message" in response:
@@ -535,6 +787,204 @@ class HandlerLLM(HandlerBase, ABC):
         end_output.add_meta("speech_id", speech_id)
         yield end_output
 
+    def _prepare_messages(self, context: LLMContext, chat_text: str):
+        if context.summarizer is not None:
+            # 两轮之间换入已完成的摘要，摘要本身在后台生成，不阻塞回复
+            context.summarizer.apply_pending(context.history)
+        current_content = context.history.generate_next_messages(
+            chat_text, self._collect_images(context))
+        return [self._build_system_message(context)] + current_content
+
+    def _create_completion(self, context: LLMContext, messages):
+        if self.endpoint_router is not None:
+            return self.endpoint_router.open_stream(
+                lambda endpoint: endpoint.client.chat.completions.create(
+                    model=endpoint.model_name,
+                    messages=messages,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                    timeout=context.request_timeout,
+                ))
+        return context.client.chat.completions.create(
+            model=context.model_name,  # 此处以qwen-plus为例，可按需更换模型名称。模型列表：https://help.aliyun.com/zh/model-studio/getting-started/models
+            messages=messages,
+            stream=True,
+            stream_options={"include_usage": True},
+            timeout=context.request_timeout,
+        )
+
+    def _start_speculation(self, context: LLMContext, text: str):
+        self._discard_speculation(context)
+        if context.pending_opening is not None:
+            # 首轮直接输出预生成的开场白，无需推测请求
+            return
+        chat_text = re.sub(r"<\|.*?\|>", "", context.input_texts + text)
+        if len(chat_text) < 1:
+            return
+        messages = self._prepare_messages(context, chat_text)
+        logger.info(f'speculative llm input {context.model_name} {chat_text}')
+        context.speculation = SpeculativeRequest(
+            text=chat_text,
+            create_stream=lambda: self._create_completion(context, messages),
+            model_name=context.model_name,
+        )
+
+    @staticmethod
+    def _discard_speculation(context: LLMContext, speculation: Optional[SpeculativeRequest] = None):
+        if speculation is None:
+            speculation = context.speculation
+            context.speculation = None
+        if speculation is None:
+            return
+        wasted_tokens = speculation.cancel()
+        context.speculative_miss_count += 1
+        context.speculative_wasted_tokens += wasted_tokens
+        logger.info(f"speculative llm request discarded, wasted {wasted_tokens} tokens, "
+                    f"hit={context.speculative_hit_count} miss={context.speculative_miss_count} "
+                    f"wasted_total={context.speculative_wasted_tokens}")
+
+    @staticmethod
+    def _collect_images(context: LLMContext):
+        sampler = context.frame_sampler
+        if sampler is None:
+            return []
+        # 画面没有明显变化时沿用上一关键帧，编码结果已缓存
+        frames = sampler.select_or_latest(context.handler_config.video_max_frames_per_turn)
+        images = []
+        for frame in frames:
+            data_url = frame.get_data_url()
+            sampler.record_sent(frame, data_url)
+            images.append(data_url)
+        return images
+
+    @staticmethod
+    def _create_coalescer(context: LLMContext) -> TokenCoalescer:
+        handler_config = context.handler_config
+        return TokenCoalescer(
+            flush_chars=handler_config.emit_flush_chars,
+            flush_interval_ms=handler_config.emit_flush_interval_ms,
+            punctuation=handler_config.emit_flush_punctuation,
+        )
+
+    @staticmethod
+    def _create_text_output(output_definition, text: str, speech_id):
+        output = DataBundle(output_definition)
+        output.set_main_data(text)
+        output.add_meta("avatar_text_end", False)
+        output.add_meta("speech_id", speech_id)
+        return output
+
+    @staticmethod
+    def _create_opening_completion(context: LLMContext, messages) -> str:
+        completion = context.client.chat.completions.create(
+            model=context.model_name,
+            messages=messages,
+            timeout=context.request_timeout,
+        )
+        return completion.choices[0].message.content
+
+    @staticmethod
+    def _take_prefetched_opening(context: LLMContext) -> bool:
+        prefetch = context.opening_prefetch
+        if prefetch is None:
+            return False
+        context.opening_prefetch = None
+        if not prefetch.wait(context.handler_config.opening_prefetch_wait):
+            prefetch.cancel()
+            logger.info("opening line prefetch not ready, fall back to live generation")
+            return False
+        context.system_prompt = prefetch.system_prompt
+        context.is_first_interaction = False
+        context.pending_opening = prefetch.text
+        return True
+
+    @staticmethod
+    def _presynthesize_opening(context: LLMContext, prefetch: OpeningPrefetch):
+        # 开场白全文提前送给 TTS，TTS 只合成并缓存，不输出音频；客户端也不展示该文本
+        definition = DataBundleDefinition()
+        definition.add_entry(DataBundleEntry.create_text_entry("avatar_text"))
+        output = DataBundle(definition)
+        output.set_main_data(prefetch.text)
+        output.add_meta("avatar_text_presynthesize", True)
+        output.add_meta("avatar_text_end", True)
+        output.add_meta("speech_id", context.session_id)
+        context.submit_data(output)
+
+    def _emit_prefetched_opening(self, context: LLMContext, chat_text: str, speech_id, output_definition):
+        opening_text = context.pending_opening
+        context.pending_opening = None
+        logger.info(f"use prefetched opening line: {opening_text}")
+        output = DataBundle(output_definition)
+        output.set_main_data(opening_text)
+        output.add_meta("avatar_text_end", False)
+        output.add_meta("avatar_text_presynthesized", context.handler_config.opening_presynthesize)
+        output.add_meta("speech_id", speech_id)
+        yield output
+        context.history.add_message(HistoryMessage(role="human", content=chat_text))
+        context.history.add_message(HistoryMessage(role="avatar", content=opening_text))
+        context.input_texts = ''
+        context.output_texts = ''
+        logger.info('avatar text end')
+        end_output = DataBundle(output_definition)
+        end_output.set_main_data('')
+        end_output.add_meta("avatar_text_end", True)
+        end_output.add_meta("speech_id", speech_id)
+        yield end_output
+
+    @staticmethod
+    def _build_system_message(context: LLMContext):
+        if not context.history.summary_text:
+            return context.system_prompt
+        return {
+            'role': 'system',
+            'content': f"{context.system_prompt['content']}\n\n【此前对话摘要】：\n{context.history.summary_text}"
+        }
+
+    @staticmethod
+    def _update_token_stats(context: LLMContext, usage):
+        if usage is not None and usage.prompt_tokens:
+            prompt_tokens = usage.prompt_tokens
+            completion_tokens = usage.completion_tokens or 0
+        else:
+            prompt_tokens = context.history.last_prompt_tokens + \
+                context.history.estimate_prompt_tokens([context.system_prompt])
+            completion_tokens = context.history.estimate_prompt_tokens(
+                [{"role": "assistant", "content": context.output_texts}])
+        summary_info = ""
+        if context.summarizer is not None:
+            summary_info = f" summaries={context.summarizer.summary_count} " \
+                           f"summary_saved={context.summarizer.saved_tokens_total}"
+        context.turn_count += 1
+        context.prompt_tokens_total += prompt_tokens
+        context.completion_tokens_total += completion_tokens
+        logger.info(f"llm tokens session={context.session_id} turn={context.turn_count} "
+                    f"prompt={prompt_tokens} completion={completion_tokens} "
+                    f"history={context.history.history_tokens} "
+                    f"total_prompt={context.prompt_tokens_total} total_completion={context.completion_tokens_total}"
+                    f"{summary_info}")
+
     def destroy_context(self, context: HandlerContext):
-        pass
+        context = cast(LLMContext, context)
+        if context.speculation is not None:
+            context.speculation.cancel()
+            context.speculation = None
+        if context.opening_prefetch is not None:
+            context.opening_prefetch.cancel()
+            context.opening_prefetch = None
+
+    def destroy(self):
+        try:
+            from src.utils.user_id_storage import remove_user_id_listener
+            remove_user_id_listener(self._on_user_id_stored)
+        except Exception as e:
+            logger.warning(f"⚠️ 移除用户ID预取回调失败: {e}")
+        if self.handler_config is not None:
+            llm_client_pool.release(self.handler_config.api_url, self.handler_config.api_key)
+            if self.handler_config.enable_history_summary:
+                llm_client_pool.release(*self._get_summary_endpoint(self.handler_config))
+            for endpoint_config in self.handler_config.endpoints or []:
+                llm_client_pool.release(endpoint_config.api_url,
+                                        endpoint_config.api_key or self.handler_config.api_key)
+        if self.endpoint_router is not None:
+            logger.info(f"llm endpoint router stats: {self.endpoint_router.get_stats()}")
 
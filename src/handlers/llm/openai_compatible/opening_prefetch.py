@@ -0,0 +1,67 @@
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from loguru import logger
+
+
+class OpeningPrefetch:
+    """
+    会话创建后在后台预先生成开场白（模板A），首轮对话直接使用生成结果，
+    未完成或失败时由调用方回退到实时生成。
+    """
+
+    def __init__(self, build_messages: Callable[[], Optional[List[Dict]]],
+                 create_completion: Callable[[List[Dict]], str],
+                 on_ready: Optional[Callable[["OpeningPrefetch"], None]] = None):
+        self.start_time = time.monotonic()
+        self.duration: Optional[float] = None
+        self.system_prompt: Optional[Dict] = None
+        self.text = ''
+        self.error: Optional[Exception] = None
+
+        self._build_messages = build_messages
+        self._create_completion = create_completion
+        self._on_ready = on_ready
+        self._done_event = threading.Event()
+        self._cancel_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            messages = self._build_messages()
+            if not messages or self._cancel_event.is_set():
+                return
+            text = self._create_completion(messages)
+            if self._cancel_event.is_set():
+                return
+            self.system_prompt = messages[0]
+            self.text = (text or '').strip()
+            self.duration = time.monotonic() - self.start_time
+            logger.info(f"opening line prefetched in {round(self.duration * 1e3)} ms: {self.text}")
+        except Exception as e:
+            self.error = e
+            logger.warning(f"opening line prefetch failed: {e}")
+        finally:
+            self._done_event.set()
+        if self.is_ready() and self._on_ready is not None and not self._cancel_event.is_set():
+            try:
+                self._on_ready(self)
+            except Exception as e:
+                logger.warning(f"opening line ready callback failed: {e}")
+
+    def is_ready(self) -> bool:
+        return self._done_event.is_set() and self.error is None and len(self.text) > 0 \
+            and self.system_prompt is not None
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        最多等待 timeout 秒，返回开场白是否可用
+        """
+        if timeout is not None and timeout > 0:
+            self._done_event.wait(timeout)
+        return self.is_ready()
+
+    def cancel(self):
+        self._cancel_event.set()
@@ -0,0 +1,98 @@
+import queue
+import re
+import threading
+import time
+from typing import Callable, Iterable, Iterator, Optional
+
+from loguru import logger
+
+from handlers.llm.openai_compatible.chat_history_manager import estimate_tokens, filter_text
+
+
+_normalize_pattern = re.compile(r"[\s,.\~!?，。！？]")
+
+
+def normalize_speculative_text(text: str) -> str:
+    """
+    推测文本与最终识别文本的比较只关心内容，忽略标点和空白差异
+    """
+    text = re.sub(r"<\|.*?\|>", "", text)
+    return _normalize_pattern.sub("", filter_text(text)).lower()
+
+
+class SpeculativeRequest:
+    """
+    在用户可能说完时提前发起的 LLM 流式请求，结果先缓存在队列中，
+    只有最终识别文本与推测文本一致时才被取出转发，否则取消并丢弃。
+    """
+
+    _END = object()
+
+    def __init__(self, text: str, create_stream: Callable[[], Iterable], model_name: Optional[str] = None):
+        self.text = text
+        self.normalized_text = normalize_speculative_text(text)
+        self.model_name = model_name
+        self.start_time = time.monotonic()
+        self.first_token_time: Optional[float] = None
+        self.received_text = ''
+        self.usage = None
+
+        self._create_stream = create_stream
+        self._stream = None
+        self._chunks: queue.Queue = queue.Queue()
+        self._cancel_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            self._stream = self._create_stream()
+            for chunk in self._stream:
+                if self._cancel_event.is_set():
+                    break
+                if chunk and getattr(chunk, "usage", None):
+                    self.usage = chunk.usage
+                if chunk and chunk.choices and chunk.choices[0] and chunk.choices[0].delta.content:
+                    if self.first_token_time is None:
+                        self.first_token_time = time.monotonic()
+                    self.received_text += chunk.choices[0].delta.content
+                self._chunks.put(chunk)
+        except Exception as e:
+            if not self._cancel_event.is_set():
+                self._chunks.put(e)
+        finally:
+            self._close_stream()
+            self._chunks.put(self._END)
+
+    def _close_stream(self):
+        stream = self._stream
+        if stream is not None and hasattr(stream, "close"):
+            try:
+                stream.close()
+            except Exception as e:
+                logger.debug(f"close speculative stream failed: {e}")
+
+    def matches(self, text: str) -> bool:
+        return len(self.normalized_text) > 0 and self.normalized_text == normalize_speculative_text(text)
+
+    def cancel(self) -> int:
+        """
+        取消推测请求，返回已浪费的生成 token 数（估算）
+        """
+        self._cancel_event.set()
+        self._close_stream()
+        if self.usage is not None and self.usage.completion_tokens:
+            return self.usage.completion_tokens
+        return estimate_tokens(self.received_text, self.model_name)
+
+    def iter_chunks(self) -> Iterator:
+        """
+        推测命中后取出已缓存和后续到达的流式结果，请求异常会在此处重新抛出
+        """
+        while True:
+            chunk = self._chunks.get()
+            if chunk is self._END:
+                return
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
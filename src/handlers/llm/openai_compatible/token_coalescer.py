@@ -0,0 +1,64 @@
+import time
+from typing import Optional
+
+
+DEFAULT_FLUSH_PUNCTUATION = ",.~!?;:，。！？；：、\n"
+
+
+class TokenCoalescer:
+    """
+    合并 LLM 流式输出的小片段，减少下游消息数量：
+    - 第一段立即输出，不增加首字延迟
+    - 遇到分句标点时输出到最后一个标点为止
+    - 累积字符数达到 flush_chars 或距上次输出超过 flush_interval_ms 时全部输出
+    flush_chars 为 0 时不合并，每个片段直接输出
+    """
+
+    def __init__(self, flush_chars: int = 16, flush_interval_ms: float = 200,
+                 punctuation: str = DEFAULT_FLUSH_PUNCTUATION):
+        self.flush_chars = flush_chars
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.punctuation = set(punctuation)
+        self._buffer = ''
+        self._first_emitted = False
+        self._last_flush_time = time.monotonic()
+        self.push_count = 0
+        self.emit_count = 0
+
+    def _emit(self, text: str, now: float) -> str:
+        self._last_flush_time = now
+        self.emit_count += 1
+        return text
+
+    def push(self, text: str, now: Optional[float] = None) -> Optional[str]:
+        """
+        放入一个流式片段，返回需要立即输出的文本，没有则返回 None
+        """
+        if not text:
+            return None
+        if now is None:
+            now = time.monotonic()
+        self.push_count += 1
+        self._buffer += text
+        if not self._first_emitted or self.flush_chars <= 0:
+            self._first_emitted = True
+            return self.flush(now)
+        if len(self._buffer) >= self.flush_chars or now - self._last_flush_time >= self.flush_interval:
+            return self.flush(now)
+        # 缓冲中已有的文本不含标点（否则已经输出），只需检查新片段
+        for index in range(len(self._buffer) - 1, len(self._buffer) - len(text) - 1, -1):
+            if self._buffer[index] in self.punctuation:
+                emit_text = self._buffer[:index + 1]
+                self._buffer = self._buffer[index + 1:]
+                return self._emit(emit_text, now)
+        return None
+
+    def flush(self, now: Optional[float] = None) -> Optional[str]:
+        """
+        输出缓冲中剩余的全部文本
+        """
+        if len(self._buffer) == 0:
+            return None
+        emit_text = self._buffer
+        self._buffer = ''
+        return self._emit(emit_text, time.monotonic() if now is None else now)
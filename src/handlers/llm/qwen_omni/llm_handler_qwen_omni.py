@@ -1,5 +1,4 @@
 import base64
-import io
 import os
 import queue
 import threading
@@ -9,7 +8,6 @@ from typing import Optional, cast, Dict, List
 
 import dashscope
 import numpy as np
-from PIL import Image
 from dashscope.audio.qwen_omni import *
 from loguru import logger
 from pydantic import BaseModel, Field
@@ -21,6 +19,7 @@ from chat_engine.contexts.session_context import SessionContext
 from chat_engine.data_models.chat_data.chat_data_model import ChatData
 from chat_engine.data_models.chat_engine_config_data import ChatEngineConfigModel, HandlerBaseConfigModel
 from chat_engine.data_models.runtime_data.data_bundle import DataBundle, DataBundleDefinition, DataBundleEntry
+from engine_utils.frame_sampler import FrameSampler
 
 
 class QwenOmniConfig(HandlerBaseConfigModel, BaseModel):
@@ -35,6 +34,8 @@ class QwenOmniConfig(HandlerBaseConfigModel, BaseModel):
     enable_input_transcription: bool = Field(default=False)  # Control input audio transcription
     transcription_model: str = Field(default="gummy-realtime-v1")  # Model for audio transcription
     video_frame_interval_ms: int = Field(default=1000, ge=500)  # Video frame sending interval in milliseconds
+    video_max_side: int = Field(default=768)  # Frames are downsized so that the longer side fits this size
+    video_diff_threshold: float = Field(default=0.04)  # Minimum normalized inter-frame difference of a keyframe
 
 
 
@@ -73,6 +74,8 @@ class QwenOmniContext(HandlerContext):
         
         # ==================== Video Processing ====================
         self._last_video_sent_ms: float = 0.0
+        self.frame_sampler: Optional[FrameSampler] = None
+        self.video_sent_in_turn: bool = False
         
         # ==================== Auto-Reconnection ====================
         self.reconnect_enabled: bool = True  # Enable/disable auto-reconnection
@@ -553,6 +556,11 @@ class HandlerSeq2SeqQwenOmni(HandlerBase, ABC):
             
         context = QwenOmniContext(session_context.session_info.session_id)
         context.config = handler_config
+        if handler_config.enable_video_input:
+            context.frame_sampler = FrameSampler(
+                max_side=handler_config.video_max_side,
+                diff_threshold=handler_config.video_diff_threshold,
+            )
         
         context.callback = QwenOmniCallback(context)
     
@@ -898,6 +906,9 @@ class HandlerSeq2SeqQwenOmni(HandlerBase, ABC):
                 # Keep is_processing as False if response creation failed
             # End this turn, reset audio start marker
             context.current_turn_audio_started = False
+            context.video_sent_in_turn = False
+            if context.frame_sampler is not None:
+                context.frame_sampler.log_turn_stats("qwen omni")
     
     def _save_debug_audio(self, context: QwenOmniContext, speech_id: str):
         """
@@ -952,42 +963,6 @@ class HandlerSeq2SeqQwenOmni(HandlerBase, ABC):
             context.debug_audio_buffer.clear()
 
 
-    def _process_video_frame(self, video_frame: np.ndarray) -> Optional[str]:
-        """
-        Process video frame to base64 JPEG string.
-        
-        Converts BGR format (default camera output) to RGB format
-        for proper color processing.
-        """
-        try:
-            # Remove batch dimension and ensure 3D array
-            frame_array = np.squeeze(video_frame)
-            
-            # Validate frame format (H, W, 3)
-            if frame_array.ndim != 3 or frame_array.shape[-1] != 3:
-                return None
-            
-            # Convert to uint8 if needed (assume float[0,1] range)
-            if frame_array.dtype != np.uint8:
-                frame_array = (np.clip(frame_array, 0.0, 1.0) * 255.0).astype(np.uint8)
-            
-            # Convert BGR to RGB (camera default format to RGB)
-            # OpenCV uses BGR format, PIL uses RGB format
-            frame_array_rgb = frame_array[:, :, ::-1]  # Reverse the color channels
-            
-            # Convert to JPEG and encode as base64
-            image = Image.fromarray(frame_array_rgb, mode='RGB')
-            buffer = io.BytesIO()
-            image.save(buffer, format='JPEG', quality=75, optimize=True)
-            
-            return base64.b64encode(buffer.getvalue()).decode('ascii')
-            
-        except Exception as e:
-            logger.opt(exception=True).error(f"Error processing video frame: {e}")
-            return None
-        
-
-        
     def _handle_video_input(self, context: QwenOmniContext, inputs: ChatData):
         """
         Process video input and send directly if conditions are met.
@@ -1006,6 +981,9 @@ class HandlerSeq2SeqQwenOmni(HandlerBase, ABC):
             logger.debug("Skipping video: audio not started yet (audio-first constraint)")
             return
         
+        # Keyframes are selected by inter-frame difference, downsized and encoded in background
+        context.frame_sampler.push(video_frame, inputs.timestamp[0])
+        
         # Throttle video sending based on FPS interval
         current_time_ms = time.time() * 1000.0
         time_since_last_sent = current_time_ms - context._last_video_sent_ms
@@ -1013,18 +991,22 @@ class HandlerSeq2SeqQwenOmni(HandlerBase, ABC):
             logger.debug(f"Skipping video: throttling (last sent {time_since_last_sent:.0f}ms ago)")
             return
         
-        # Process and send the video frame directly
-        processed_b64 = self._process_video_frame(video_frame)
-        if processed_b64:
-            try:
-                context.conversation.append_video(processed_b64)
-                context._last_video_sent_ms = current_time_ms
-                logger.debug(f"📹 Sent video frame directly from handle_video_input")
-                
-            except Exception as e:
-                logger.opt(exception=True).error(f"Error sending video frame: {e}")
-        else:
-            logger.debug("Failed to process video frame, skipping send")
+        # Send the newest keyframe; an unchanged scene is sent once per turn
+        frames = context.frame_sampler.select(max_count=1)
+        if len(frames) == 0:
+            if context.video_sent_in_turn or context.frame_sampler.latest is None:
+                return
+            frames = [context.frame_sampler.latest]
+        try:
+            processed_b64 = frames[-1].get_base64()
+            context.conversation.append_video(processed_b64)
+            context.frame_sampler.record_sent(frames[-1], processed_b64)
+            context._last_video_sent_ms = current_time_ms
+            context.video_sent_in_turn = True
+            logger.debug(f"📹 Sent video frame directly from handle_video_input")
+            
+        except Exception as e:
+            logger.opt(exception=True).error(f"Error sending video frame: {e}")
 
 
 
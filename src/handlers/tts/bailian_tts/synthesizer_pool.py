@@ -0,0 +1,59 @@
+import threading
+from typing import Optional
+
+from dashscope.audio.tts_v2 import AudioFormat, ResultCallback, SpeechSynthesizer, SpeechSynthesizerObjectPool
+from loguru import logger
+
+
+# SpeechSynthesizerObjectPool 为单例，且每次构造都会重新建立全部连接，因此只在这里创建一次
+_pool: Optional[SpeechSynthesizerObjectPool] = None
+_pool_url: Optional[str] = None
+_pool_lock = threading.Lock()
+
+
+def init_synthesizer_pool(size: int, url: Optional[str] = None):
+    """
+    预先建立 size 个 websocket 连接，空闲连接由 SDK 定期重连，避免服务端空闲超时断开后首句再建连
+    """
+    global _pool, _pool_url
+    if size <= 0:
+        return
+    with _pool_lock:
+        if _pool is None:
+            _pool = SpeechSynthesizerObjectPool(max_size=size, url=url)
+            _pool_url = url
+            logger.info(f"bailian tts synthesizer pool started with {size} connections")
+
+
+def shutdown_synthesizer_pool():
+    global _pool
+    with _pool_lock:
+        pool = _pool
+        _pool = None
+    if pool is not None:
+        pool.shutdown()
+
+
+def borrow_synthesizer(model: str, voice: str, audio_format: AudioFormat,
+                       callback: Optional[ResultCallback] = None, url: Optional[str] = None) -> SpeechSynthesizer:
+    """
+    从连接池取一个已连接的合成器，连接池未启用或已耗尽时新建（首次调用时建立连接）
+    """
+    pool = _pool
+    if pool is not None and url == _pool_url:
+        return pool.borrow_synthesizer(model=model, voice=voice, format=audio_format, callback=callback)
+    return SpeechSynthesizer(model=model, voice=voice, format=audio_format, callback=callback, url=url)
+
+
+def release_synthesizer(synthesizer: SpeechSynthesizer, reusable: bool = True):
+    """
+    任务正常结束的合成器放回连接池继续复用，出错或连接池已满时关闭连接
+    """
+    pool = _pool
+    # return_synthesizer 放回成功时返回 None，池已满时返回 False
+    if reusable and pool is not None and pool.return_synthesizer(synthesizer) is not False:
+        return
+    try:
+        synthesizer.close()
+    except Exception as e:
+        logger.debug(f"close synthesizer failed: {e}")
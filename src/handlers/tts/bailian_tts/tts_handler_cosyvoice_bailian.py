@@ -15,21 +15,35 @@ from chat_engine.data_models.chat_data.chat_data_model import ChatData
 from chat_engine.data_models.chat_data_type import ChatDataType
 from chat_engine.contexts.session_context import SessionContext
 from chat_engine.data_models.runtime_data.data_bundle import DataBundle, DataBundleDefinition, DataBundleEntry
+from engine_utils.audio_format import to_float32
 from engine_utils.directory_info import DirectoryInfo
-from dashscope.audio.tts_v2 import SpeechSynthesizer, ResultCallback, AudioFormat
+from engine_utils.filler_audio import FillerAudioSupport, FillerConfig, FillerContextMixin
+from engine_utils.tts_cache import TTSCache, get_tts_cache
+from dashscope.audio.tts_v2 import ResultCallback, AudioFormat
+from handlers.tts.bailian_tts.synthesizer_pool import borrow_synthesizer, init_synthesizer_pool, \
+    release_synthesizer, shutdown_synthesizer_pool
 import dashscope
 
 
-class TTSConfig(HandlerBaseConfigModel, BaseModel):
+class TTSConfig(HandlerBaseConfigModel, FillerConfig, BaseModel):
     ref_audio_path: str = Field(default=None)
     ref_audio_text: str = Field(default=None)
     voice: str = Field(default=None)
     sample_rate: int = Field(default=24000)
     api_key: str = Field(default=os.getenv("DASHSCOPE_API_KEY"))
     model_name: str = Field(default="cosyvoice-1")
+    # 预先建立并保持的 websocket 连接数，每轮合成复用已连接的合成器，为 0 时每轮新建连接
+    synthesizer_pool_size: int = Field(default=4)
+    # 为空时使用 dashscope 默认地址
+    ws_url: Optional[str] = Field(default=None)
+    # 预合成结果缓存；流式合成的文本由服务端切分，不经过缓存
+    enable_cache: bool = Field(default=True)
+    cache_memory_mb: int = Field(default=64)
+    cache_disk_mb: int = Field(default=512)
+    cache_dir: Optional[str] = Field(default=None)
 
 
-class TTSContext(HandlerContext):
+class TTSContext(FillerContextMixin, HandlerContext):
     def __init__(self, session_id: str):
         super().__init__(session_id)
         self.config = None
@@ -38,6 +52,9 @@ class TTSContext(HandlerContext):
         self.dump_audio = False
         self.audio_dump_file = None
         self.synthesizer = None
+        # 预合成的整段文本音频（PCM 16bit），使用后移除
+        self.presynthesized_audio: Dict[str, bytes] = {}
+        self.presynthesized_playing = False
 
 
 class HandlerTTS(HandlerBase, ABC):
@@ -51,6 +68,9 @@ class HandlerTTS(HandlerBase, ABC):
         self.sample_rate = None
         self.model_name = None
         self.api_key = None
+        self.cache: Optional[TTSCache] = None
+        self.ws_url = None
+        self.filler: Optional[FillerAudioSupport] = None
 
     def get_handler_info(self) -> HandlerBaseInfo:
         return HandlerBaseInfo(
@@ -66,6 +86,8 @@ class HandlerTTS(HandlerBase, ABC):
                 type=ChatDataType.AVATAR_TEXT,
             )
         }
+        if self.filler is not None:
+            self.filler.add_inputs(inputs)
         outputs = {
             ChatDataType.AVATAR_AUDIO: HandlerDataInfo(
                 type=ChatDataType.AVATAR_AUDIO,
@@ -83,11 +105,20 @@ class HandlerTTS(HandlerBase, ABC):
         self.ref_audio_path = config.ref_audio_path
         self.ref_audio_text = config.ref_audio_text
         self.model_name = config.model_name
+        if config.enable_cache:
+            self.cache = get_tts_cache(config.cache_memory_mb, config.cache_disk_mb, config.cache_dir)
         if 'DASHSCOPE_API_KEY' in os.environ:
             # load API-key from environment variable DASHSCOPE_API_KEY
             dashscope.api_key = os.environ['DASHSCOPE_API_KEY']
         else:
             dashscope.api_key = config.api_key  # set API-key manually
+        self.ws_url = config.ws_url
+        try:
+            init_synthesizer_pool(config.synthesizer_pool_size, config.ws_url)
+        except Exception as e:
+            logger.warning(f"init synthesizer pool failed, create connection per turn: {e}")
+        self.filler = FillerAudioSupport.create(
+            config, self.sample_rate, lambda text: to_float32(self.synthesize_pcm(text)), "bailian")
 
     def create_context(self, session_context, handler_config=None):
         if not isinstance(handler_config, TTSConfig):
@@ -102,6 +133,9 @@ class HandlerTTS(HandlerBase, ABC):
 
     def start_context(self, session_context, context: HandlerContext):
         context = cast(TTSContext, context)
+        if self.filler is not None:
+            self.filler.start_context(context, self.get_handler_detail(
+                session_context, context).outputs.get(ChatDataType.AVATAR_AUDIO).definition)
 
     def filter_text(self, text):
         pattern = r"[^a-zA-Z0-9\u4e00-\u9fff,.\~!?，。！？ ]"  # 匹配不在范围内的字符
@@ -112,6 +146,8 @@ class HandlerTTS(HandlerBase, ABC):
                output_definitions: Dict[ChatDataType, HandlerDataInfo]):
         output_definition = output_definitions.get(ChatDataType.AVATAR_AUDIO).definition
         context = cast(TTSContext, context)
+        if FillerAudioSupport.handle(context, inputs):
+            return
         if inputs.type == ChatDataType.AVATAR_TEXT:
             text = inputs.data.get_main_data()
         else:
@@ -123,29 +159,130 @@ class HandlerTTS(HandlerBase, ABC):
         if text is not None:
             text = re.sub(r"<\|.*?\|>", "", text)
 
+        if inputs.data.get_meta("avatar_text_presynthesize", False):
+            self.presynthesize(context, text)
+            return
+
         text_end = inputs.data.get_meta("avatar_text_end", False)
         try:
-            if not text_end:
-                if context.synthesizer is None:
-                    callback = CosyvoiceCallBack(
-                        context=context, output_definition=output_definition, speech_id=speech_id)
-                    context.synthesizer = SpeechSynthesizer(
-                        model=self.model_name, voice=self.voice, callback=callback, format=AudioFormat.PCM_24000HZ_MONO_16BIT)
+            if not text_end and context.synthesizer is None and text in context.presynthesized_audio:
+                logger.info(f'use presynthesized audio {text}')
+                self.submit_pcm(context, context.presynthesized_audio.pop(text), output_definition, speech_id)
+                context.presynthesized_playing = True
+                return
+            if text_end and context.presynthesized_playing and context.synthesizer is None and not text:
+                context.presynthesized_playing = False
+                self.submit_speech_end(context, output_definition, speech_id)
+                return
+            context.presynthesized_playing = False
+            if context.synthesizer is None:
+                if not text:
+                    if text_end:
+                        self.submit_speech_end(context, output_definition, speech_id)
+                    return
+                self.start_synthesis(context, text, output_definition, speech_id)
+            elif text:
                 logger.info(f'streaming_call {text}')
                 context.synthesizer.streaming_call(text)
-            else:
-                logger.info(f'streaming_call last {text}')
-                context.synthesizer.streaming_call(text)
+            if text_end:
+                logger.info(f'streaming_complete')
                 context.synthesizer.streaming_complete()
+                release_synthesizer(context.synthesizer)
                 context.synthesizer = None
-                context.input_text = ''
         except Exception as e:
             logger.error(e)
+            if context.synthesizer is not None:
+                release_synthesizer(context.synthesizer, reusable=False)
             context.synthesizer = None
 
+    def start_synthesis(self, context: TTSContext, text: str, output_definition, speech_id):
+        """
+        取一个已连接的合成器开始本轮合成，连接失效时换新连接重试一次
+        """
+        callback = CosyvoiceCallBack(context=context, output_definition=output_definition, speech_id=speech_id)
+        for attempt in range(2):
+            context.synthesizer = borrow_synthesizer(self.model_name, self.voice, AudioFormat.PCM_24000HZ_MONO_16BIT,
+                                                     callback=callback, url=self.ws_url)
+            try:
+                logger.info(f'streaming_call {text}')
+                context.synthesizer.streaming_call(text)
+                return
+            except Exception as e:
+                release_synthesizer(context.synthesizer, reusable=False)
+                context.synthesizer = None
+                if attempt > 0:
+                    raise
+                logger.warning(f"start synthesis failed, retry with a new connection: {e}")
+
+    @staticmethod
+    def submit_speech_end(context: TTSContext, output_definition, speech_id):
+        output = DataBundle(output_definition)
+        output.set_main_data(np.zeros(shape=(1, 240), dtype=np.float32))
+        output.add_meta("avatar_speech_end", True)
+        output.add_meta("speech_id", speech_id)
+        context.submit_data(output)
+        logger.info(f"speech end")
+
+    def presynthesize(self, context: TTSContext, text: str):
+        """
+        预先合成整段文本并缓存，之后收到相同文本时直接输出
+        """
+        if not text or text in context.presynthesized_audio:
+            return
+        start_time = time.monotonic()
+        try:
+            audio = self.synthesize_pcm(text)
+        except Exception as e:
+            logger.warning(f"presynthesize {text} failed: {e}")
+            return
+        if audio:
+            context.presynthesized_audio[text] = audio
+            logger.info(f"presynthesized {text} in {round((time.monotonic() - start_time) * 1e3)} ms")
+
+    def synthesize_pcm(self, text: str) -> bytes:
+        """
+        整段合成，返回 24kHz 16bit PCM，结果经过缓存
+        """
+        cache_key = None
+        if self.cache is not None:
+            cache_key = TTSCache.make_key("bailian", f"{self.model_name}|{self.voice}", 24000, text)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached.tobytes()
+        synthesizer = borrow_synthesizer(self.model_name, self.voice, AudioFormat.PCM_24000HZ_MONO_16BIT,
+                                         url=self.ws_url)
+        try:
+            audio = synthesizer.call(text)
+        except Exception:
+            release_synthesizer(synthesizer, reusable=False)
+            raise
+        release_synthesizer(synthesizer)
+        if audio and cache_key is not None:
+            self.cache.put(cache_key, np.frombuffer(audio, dtype=np.int16))
+        return audio or b''
+
+    @staticmethod
+    def submit_pcm(context: TTSContext, data: bytes, output_definition, speech_id):
+        output_audio = to_float32(data)[np.newaxis, ...]
+        output = DataBundle(output_definition)
+        output.set_main_data(output_audio)
+        output.add_meta("avatar_speech_end", False)
+        output.add_meta("speech_id", speech_id)
+        context.submit_data(output)
+
     def destroy_context(self, context: HandlerContext):
         context = cast(TTSContext, context)
         logger.info('destroy context')
+        if self.cache is not None:
+            self.cache.log_stats("bailian")
+        if self.filler is not None:
+            self.filler.destroy_context(context)
+        if context.synthesizer is not None:
+            release_synthesizer(context.synthesizer, reusable=False)
+            context.synthesizer = None
+
+    def destroy(self):
+        shutdown_synthesizer_pool()
 
 
 class CosyvoiceCallBack(ResultCallback):
@@ -154,7 +291,9 @@ class CosyvoiceCallBack(ResultCallback):
         self.context = context
         self.output_definition = output_definition
         self.speech_id = speech_id
-        self.temp_bytes = b''
+        self.temp_bytes = bytearray()
+        self.start_time = time.monotonic()
+        self.first_audio_time = None
 
     def on_open(self) -> None:
         logger.info('连接成功')
@@ -165,29 +304,29 @@ class CosyvoiceCallBack(ResultCallback):
         pass
 
     def on_data(self, data: bytes) -> None:
+        if self.first_audio_time is None:
+            self.first_audio_time = time.monotonic()
+            logger.info(f"bailian tts first audio in {round((self.first_audio_time - self.start_time) * 1e3)} ms")
         self.temp_bytes += data
         if len(self.temp_bytes) > 24000:
             # 实现接收合成二进制音频结果的逻辑
-            output_audio = np.array(np.frombuffer(self.temp_bytes, dtype=np.int16)).astype(
-                np.float32)/32767  # librosa.load(io.BytesIO(self.temp_bytes), sr=None)[0]
-            output_audio = output_audio[np.newaxis, ...]
+            output_audio = to_float32(self.temp_bytes)[np.newaxis, ...]
             output = DataBundle(self.output_definition)
             output.set_main_data(output_audio)
             output.add_meta("avatar_speech_end", False)
             output.add_meta("speech_id", self.speech_id)
             self.context.submit_data(output)
-            self.temp_bytes = b''
+            self.temp_bytes = bytearray()
 
     def on_complete(self) -> None:
         if len(self.temp_bytes) > 0:
-            output_audio = np.array(np.frombuffer(self.temp_bytes, dtype=np.int16)).astype(np.float32)/32767
-            output_audio = output_audio[np.newaxis, ...]
+            output_audio = to_float32(self.temp_bytes)[np.newaxis, ...]
             output = DataBundle(self.output_definition)
             output.set_main_data(output_audio)
             output.add_meta("avatar_speech_end", False)
             output.add_meta("speech_id", self.speech_id)
             self.context.submit_data(output)
-            self.temp_bytes = b''
+            self.temp_bytes = bytearray()
         output = DataBundle(self.output_definition)
         output.set_main_data(np.zeros(shape=(1, 240), dtype=np.float32))
         output.add_meta("avatar_speech_end", True)
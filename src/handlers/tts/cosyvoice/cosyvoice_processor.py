@@ -5,13 +5,16 @@ import torch.multiprocessing as mp
 
 import os
 import sys
+import time
 
-import librosa
 from loguru import logger
 import numpy as np
 import requests
 
+from engine_utils.audio_format import to_float32
+from engine_utils.audio_resampler import StreamingResampler
 from engine_utils.directory_info import DirectoryInfo
+from handlers.tts.cosyvoice.synthesis_scheduler import SynthesisRequest, SynthesisScheduler
 
 
 # @dataclass
@@ -38,6 +41,7 @@ class TTSCosyVoiceProcessor(spawn_context.Process):
         self.ref_audio_buffer = None
         self.sample_rate = config.sample_rate
         self.api_key = config.api_key
+        self.max_concurrent_sentences = config.max_concurrent_sentences
 
         self.input_queue = input_queue
         self.output_queue = output_queue
@@ -89,82 +93,69 @@ class TTSCosyVoiceProcessor(spawn_context.Process):
         elif self.api_key is not None:
             raise TypeError('api_key not support yet')
         logger.info('tts processor started')
+        scheduler = SynthesisScheduler(self._synthesize, self._emit_output, self.sample_rate,
+                                       max_active=self.max_concurrent_sentences)
         while True:
-            try:
-                logger.debug('wait for tts task in')
-                input = self.input_queue.get(timeout=5)
-                logger.debug(f'get tts task in {input}')
-            except Exception:
-                continue
-            input_text = input['text']
-            key = input['key']
-            session_id = input['session_id']
-            if (len(input_text) < 1):
-                # ignore
-                logger.info('ignore empty input_text')
-            elif self.model is None and self.api_url is not None:
-                # if you start cosyvoice tts server through CosyVoice/runtime/python/fastapi/server.py
-                response = requests.get(self.api_url, data={
-                    'tts_text': input_text,
-                    'spk_id': self.spk_id
-                }, stream=True)
-                if response.status_code != 200:
-                    logger.info(f"Request failed with status code {response.status_code}")
-                    continue
-                tts_audio = b''
-                for r in response.iter_content(chunk_size=16000):
-                    tts_audio = r
-                    tts_speech = np.array(np.frombuffer(tts_audio, dtype=np.int16)).astype(np.float32)/32767
-                    logger.debug(f'audio response {tts_speech.shape}')
+            # 空闲时阻塞等待新任务，合成中只取已到达的任务
+            scheduler.pull(self.input_queue, self._to_request)
+            if scheduler.has_work():
+                scheduler.step()
 
-                    output_audio = librosa.resample(tts_speech, orig_sr=22050, target_sr=self.sample_rate)
-                    logger.debug(f'audio response resample {output_audio.shape}')
-                    out_audio = output_audio[np.newaxis, ...]
-                    output = {
-                        'key': key,
-                        'tts_speech': out_audio,
-                        'session_id': session_id
-                    }
-                    self.output_queue.put(output)
-            # if self.api_key is not None:
-            #     self.model.streaming_call(input_text)
+    @staticmethod
+    def _to_request(input) -> SynthesisRequest:
+        logger.debug(f'get tts task in {input}')
+        return SynthesisRequest(key=input['key'], session_id=input['session_id'], text=input['text'])
 
-            #     for tts_audio in self.callback_instance.get_data_generator():
-            #         tts_speech = np.array(np.frombuffer(tts_audio, dtype=np.int16)).astype(np.float32)/32767
-            #         logger.info('audio response', tts_speech.shape)
+    def _emit_output(self, request: SynthesisRequest, tts_speech):
+        self.output_queue.put({
+            'key': request.key,
+            'tts_speech': tts_speech,
+            'session_id': request.session_id,
+            'send_time': time.time()
+        })
 
-            #         output_audio = librosa.resample(tts_speech, orig_sr=self.sample_rate, target_sr=24000)
-            #         out_audio = output_audio[np.newaxis, ...]
-            #         yield out_audio
-            else:
-                response = None
-                if self.model:
-                    if self.ref_audio_buffer is not None:
-                        response = self.model.inference_zero_shot(
-                            input_text, self.ref_audio_text, self.ref_audio_buffer, stream=True)
-                    elif self.spk_id:
-                        response = self.model.inference_sft(input_text, self.spk_id, stream=True)
-                    else:
-                        logger.error('cosyvoice need a ref_audio or spk_id')
-                        return
+    def _synthesize(self, request: SynthesisRequest):
+        """
+        流式合成一个句子，逐块返回 (1, N) 的音频
+        """
+        input_text = request.text
+        if (len(input_text) < 1):
+            # ignore
+            logger.info('ignore empty input_text')
+        elif self.model is None and self.api_url is not None:
+            # if you start cosyvoice tts server through CosyVoice/runtime/python/fastapi/server.py
+            response = requests.get(self.api_url, data={
+                'tts_text': input_text,
+                'spk_id': self.spk_id
+            }, stream=True)
+            if response.status_code != 200:
+                logger.info(f"Request failed with status code {response.status_code}")
+                return
+            # 整句共用一个重采样器，分块之间保留滤波器状态
+            resampler = StreamingResampler(22050, self.sample_rate)
+            for r in response.iter_content(chunk_size=16000):
+                tts_speech = to_float32(r)
+                logger.debug(f'audio response {tts_speech.shape}')
 
-                for tts_speech in response:
-                    tts_audio = tts_speech['tts_speech'].numpy()
-                    logger.debug(f'tts sample rate {self.model.sample_rate}')
-                    tts_audio = tts_audio  # librosa.resample(tts_audio, orig_sr=self.model.sample_rate, target_sr=24000)
-                    # tts_audio = torchaudio.transforms.Resample(orig_freq=22050, new_freq=24000)(tts_audio)
-                    if self.dump_audio:
-                        dump_audio = tts_audio
-                        self.audio_dump_file.write(dump_audio.tobytes())
-                    output = {
-                        'key': key,
-                        'tts_speech': tts_audio,
-                        'session_id': session_id
-                    }
-                    self.output_queue.put(output)
-            output = {
-                'key': key,
-                'tts_speech': None,
-                'session_id': session_id
-            }
-            self.output_queue.put(output)
+                output_audio = resampler.process(tts_speech)
+                logger.debug(f'audio response resample {output_audio.shape}')
+                if len(output_audio) > 0:
+                    yield output_audio[np.newaxis, ...]
+            output_audio = resampler.flush()
+            if len(output_audio) > 0:
+                yield output_audio[np.newaxis, ...]
+        elif self.model:
+            if self.ref_audio_buffer is not None:
+                response = self.model.inference_zero_shot(
+                    input_text, self.ref_audio_text, self.ref_audio_buffer, stream=True)
+            elif self.spk_id:
+                response = self.model.inference_sft(input_text, self.spk_id, stream=True)
+            else:
+                logger.error('cosyvoice need a ref_audio or spk_id')
+                return
+            for tts_speech in response:
+                tts_audio = tts_speech['tts_speech'].numpy()
+                logger.debug(f'tts sample rate {self.model.sample_rate}')
+                if self.dump_audio:
+                    self.audio_dump_file.write(tts_audio.tobytes())
+                yield tts_audio
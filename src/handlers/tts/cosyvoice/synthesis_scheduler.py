@@ -0,0 +1,183 @@
+import queue
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Iterator, List, Optional
+
+import numpy as np
+from loguru import logger
+
+
+@dataclass
+class SynthesisRequest:
+    key: Any
+    session_id: str
+    text: str
+    submit_time: float = field(default_factory=time.monotonic)
+
+
+class _ActiveStream:
+    def __init__(self, request: SynthesisRequest, iterator: Iterator[np.ndarray]):
+        self.request = request
+        self.iterator = iterator
+        self.start_time = time.monotonic()
+        self.samples = 0
+
+
+class SynthesisScheduler:
+    """
+    合成进程内的跨会话调度器：
+    - 多个会话的句子同时处于合成中（最多 max_active 个），每轮依次从每个句子的流式结果中取一个分块，
+      分块立即按 key 返回，新会话的首个分块不必等前面的长回答全部合成完
+    - 每个会话同时最多 max_per_session 个句子在合成，等待中的句子按会话轮询放入，避免一个长回答占满合成
+    - 统计合成音频时长与忙碌时间之比（合成秒数/墙钟秒数）
+    """
+
+    def __init__(self, start_stream: Callable[[SynthesisRequest], Iterator[np.ndarray]],
+                 emit: Callable[[SynthesisRequest, Optional[np.ndarray]], None], sample_rate: int,
+                 max_active: int = 4, max_per_session: int = 1, report_interval: float = 30.0):
+        self.start_stream = start_stream
+        self.emit = emit
+        self.sample_rate = sample_rate
+        self.max_active = max(1, max_active)
+        self.max_per_session = max(1, max_per_session)
+        self.report_interval = report_interval
+        self.synthesized_seconds = 0.0
+        self.busy_time = 0.0
+        self.completed_count = 0
+        self._waiting: "OrderedDict[str, Deque[SynthesisRequest]]" = OrderedDict()
+        self._waiting_count = 0
+        self._active: List[_ActiveStream] = []
+        self._report_seconds = 0.0
+        self._report_busy_time = 0.0
+        self._last_report_time = time.monotonic()
+
+    @property
+    def capacity(self) -> int:
+        """
+        空闲的合成槽位数；等待中的句子不占槽位，否则一个会话积压的句子会让其他会话的句子堵在共享输入队列里
+        """
+        return self.max_active - len(self._active)
+
+    def has_work(self) -> bool:
+        return len(self._active) > 0 or self._waiting_count > 0
+
+    def submit(self, request: SynthesisRequest):
+        self._waiting.setdefault(request.session_id, deque()).append(request)
+        self._waiting_count += 1
+
+    def pull(self, input_queue, to_request: Callable[[Any], SynthesisRequest], timeout: float = 5.0) -> int:
+        """
+        从共享输入队列取任务放入各会话的等待队列，由 _admit 按会话轮询放入合成：
+        - 已取到的句子足够占满槽位时停止，其余留给其他合成进程
+        - 同一会话的后续句子受 max_per_session 限制暂时不能开始，仍继续取以便发现排在后面的新会话，
+          但这样暂时不能开始的句子最多持有 max_active 个
+        没有任何任务时阻塞等待 timeout 秒，返回取出的任务数
+        """
+        pulled = 0
+        while True:
+            startable = self._startable_count()
+            if len(self._active) + startable >= self.max_active or \
+                    self._waiting_count - startable >= self.max_active:
+                break
+            try:
+                if self.has_work():
+                    item = input_queue.get_nowait()
+                else:
+                    item = input_queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            self.submit(to_request(item))
+            pulled += 1
+        return pulled
+
+    def _startable_count(self) -> int:
+        """
+        等待中的句子里，按 max_per_session 限制下一轮可以开始合成的句子数
+        """
+        return sum(min(len(requests), max(0, self.max_per_session - self._active_count(session_id)))
+                   for session_id, requests in self._waiting.items())
+
+    def _active_count(self, session_id: str) -> int:
+        return sum(1 for stream in self._active if stream.request.session_id == session_id)
+
+    def _admit(self):
+        admitted = True
+        while admitted and len(self._active) < self.max_active and self._waiting_count > 0:
+            admitted = False
+            for session_id in list(self._waiting.keys()):
+                if len(self._active) >= self.max_active:
+                    break
+                if self._active_count(session_id) >= self.max_per_session:
+                    continue
+                requests = self._waiting.pop(session_id)
+                request = requests.popleft()
+                self._waiting_count -= 1
+                if len(requests) > 0:
+                    # 放到轮询顺序的末尾
+                    self._waiting[session_id] = requests
+                self._start(request)
+                admitted = True
+
+    def _start(self, request: SynthesisRequest):
+        try:
+            iterator = iter(self.start_stream(request))
+        except Exception as e:
+            logger.error(f"start synthesis {request.text} failed: {e}")
+            self.emit(request, None)
+            return
+        self._active.append(_ActiveStream(request, iterator))
+
+    def _finish(self, stream: _ActiveStream):
+        self._active.remove(stream)
+        self.completed_count += 1
+        self.emit(stream.request, None)
+        logger.debug(f"synthesized {stream.request.text} {stream.samples / self.sample_rate:.2f}s audio in "
+                     f"{time.monotonic() - stream.start_time:.2f}s, waited "
+                     f"{stream.start_time - stream.request.submit_time:.2f}s")
+
+    def step(self) -> int:
+        """
+        放入等待中的句子，并从每个合成中的句子各取一个分块，返回本轮输出的分块数
+        """
+        start_time = time.monotonic()
+        self._admit()
+        emitted = 0
+        for stream in list(self._active):
+            try:
+                chunk = next(stream.iterator)
+            except StopIteration:
+                self._finish(stream)
+                continue
+            except Exception as e:
+                logger.error(f"synthesis {stream.request.text} failed: {e}")
+                self._finish(stream)
+                continue
+            if chunk is None:
+                continue
+            samples = chunk.shape[-1]
+            stream.samples += samples
+            self.synthesized_seconds += samples / self.sample_rate
+            self._report_seconds += samples / self.sample_rate
+            self.emit(stream.request, chunk)
+            emitted += 1
+        elapsed = time.monotonic() - start_time
+        self.busy_time += elapsed
+        self._report_busy_time += elapsed
+        self._report()
+        return emitted
+
+    def get_throughput(self) -> float:
+        return self.synthesized_seconds / self.busy_time if self.busy_time > 0 else 0.0
+
+    def _report(self):
+        now = time.monotonic()
+        if now - self._last_report_time < self.report_interval:
+            return
+        if self._report_busy_time > 0:
+            logger.info(f"tts throughput {self._report_seconds / self._report_busy_time:.2f} synthesized s/s "
+                        f"over {self._report_busy_time:.1f}s busy, active {len(self._active)}, "
+                        f"waiting {self._waiting_count}, completed {self.completed_count}")
+        self._last_report_time = now
+        self._report_seconds = 0.0
+        self._report_busy_time = 0.0
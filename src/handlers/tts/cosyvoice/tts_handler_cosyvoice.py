@@ -1,6 +1,4 @@
-from collections import deque
 from dataclasses import dataclass, field
-from torch.multiprocessing import Manager, Queue
 import os
 import queue
 import re
@@ -20,12 +18,16 @@ from chat_engine.data_models.chat_data.chat_data_model import ChatData
 from chat_engine.data_models.chat_data_type import ChatDataType
 from chat_engine.contexts.session_context import SessionContext
 from chat_engine.data_models.runtime_data.data_bundle import DataBundle, DataBundleDefinition, DataBundleEntry
-from handlers.tts.cosyvoice.cosyvoice_processor import TTSCosyVoiceProcessor
+from handlers.tts.cosyvoice.cosyvoice_processor import TTSCosyVoiceProcessor, spawn_context
+from handlers.tts.cosyvoice.tts_task_router import TTSTaskRouter
 import modelscope
 
 from engine_utils.directory_info import DirectoryInfo
+from engine_utils.filler_audio import FillerAudioSupport, FillerConfig, FillerContextMixin
+from engine_utils.sentence_segmenter import StreamingSentenceSegmenter
+from engine_utils.tts_cache import TTSCache, get_tts_cache, iter_audio_chunks
 
-class TTSConfig(HandlerBaseConfigModel, BaseModel):
+class TTSConfig(HandlerBaseConfigModel, FillerConfig, BaseModel):
     model_name: str = Field(default=None)
     api_key: str = Field(default=None)  # Field(default=os.getenv("DASHSCOPE_API_KEY"))
     api_url: str = Field(default=None)
@@ -34,6 +36,22 @@ class TTSConfig(HandlerBaseConfigModel, BaseModel):
     spk_id: str = Field(default=None)
     sample_rate: int = Field(default=24000)
     process_num: int = Field(default=1)
+    # 每个合成进程同时合成的句子数，来自不同会话的句子轮流输出分块
+    max_concurrent_sentences: int = Field(default=4)
+    # 流式分句参数：第一段尽早切分以降低首包延迟，之后的分段逐渐变长
+    segment_first_min_chars: int = Field(default=4)
+    segment_first_max_chars: int = Field(default=20)
+    segment_min_chars: int = Field(default=8)
+    segment_max_chars: int = Field(default=80)
+    # 合成结果缓存，重复的句子直接输出缓存的音频；cache_disk_mb 为 0 时只使用内存
+    enable_cache: bool = Field(default=True)
+    cache_memory_mb: int = Field(default=64)
+    cache_disk_mb: int = Field(default=512)
+    cache_dir: Optional[str] = Field(default=None)
+
+
+# 填充语音在合成进程中使用的会话 id
+FILLER_SESSION_ID = "__filler__"
 
 
 @dataclass
@@ -42,19 +60,24 @@ class HandlerTask:
     result_queue: queue.Queue = field(default_factory=queue.Queue)
     speech_id: str = field(default=None)
     speech_end: bool = field(default=False)
+    # 未命中缓存的句子在合成完成后写入缓存
+    cache_key: Optional[str] = field(default=None)
+    audio_chunks: list = field(default_factory=list)
 
 
-class TTSContext(HandlerContext):
+class TTSContext(FillerContextMixin, HandlerContext):
     def __init__(self, session_id: str):
         super().__init__(session_id)
         self.config = None
         self.local_session_id = 0
-        self.input_text = ''
+        self.segmenter: Optional[StreamingSentenceSegmenter] = None
         self.dump_audio = False
         self.audio_dump_file = None
 
-        self.task_queue: deque[HandlerTask]
+        # 按顺序输出的任务，None 表示会话结束
+        self.task_queue: queue.Queue = queue.Queue()
         self.task_consumer_thread = None
+        self.closed = False
 
 
 class HandlerTTS(HandlerBase, ABC):
@@ -70,12 +93,16 @@ class HandlerTTS(HandlerBase, ABC):
         self.model = None
         self.ref_audio_buffer = None
         self.sample_rate = None
-        self.mp = Manager()
-        self.tts_input_queue = self.mp.Queue()
-        self.tts_output_queue = self.mp.Queue()
+        # 直接使用管道队列与合成进程通信，不经过 Manager 服务进程转发
+        self.tts_input_queue = spawn_context.Queue()
+        self.tts_output_queue = spawn_context.Queue()
         self.multi_process = []
         self.consume_thread = None
-        self.task_queue_map = {}
+        self.task_router = TTSTaskRouter()
+        self.segmenter_params = {}
+        self.cache: Optional[TTSCache] = None
+        self.cache_voice = None
+        self.filler: Optional[FillerAudioSupport] = None
         if torch.cuda.is_available():
             self.device = torch.device("cuda:0")
         elif torch.backends.mps.is_available():
@@ -97,6 +124,8 @@ class HandlerTTS(HandlerBase, ABC):
                 type=ChatDataType.AVATAR_TEXT,
             )
         }
+        if self.filler is not None:
+            self.filler.add_inputs(inputs)
         outputs = {
             ChatDataType.AVATAR_AUDIO: HandlerDataInfo(
                 type=ChatDataType.AVATAR_AUDIO,
@@ -112,7 +141,19 @@ class HandlerTTS(HandlerBase, ABC):
             if not os.path.isabs(handler_config.model_name) and handler_config.model_name is not None:
                 modelscope.snapshot_download(handler_config.model_name)
 
-            self.sample_rate = handler_config.sample_rate      
+            self.sample_rate = handler_config.sample_rate
+            self.segmenter_params = dict(
+                first_min_chars=handler_config.segment_first_min_chars,
+                first_max_chars=handler_config.segment_first_max_chars,
+                min_chars=handler_config.segment_min_chars,
+                max_chars=handler_config.segment_max_chars,
+            )
+            if handler_config.enable_cache:
+                self.cache = get_tts_cache(handler_config.cache_memory_mb, handler_config.cache_disk_mb,
+                                           handler_config.cache_dir)
+                self.cache_voice = "|".join(str(value) for value in (
+                    handler_config.model_name, handler_config.api_url, handler_config.spk_id,
+                    handler_config.ref_audio_path, handler_config.ref_audio_text))
             for i in range(handler_config.process_num):
                 process = TTSCosyVoiceProcessor(self.handler_root, handler_config,
                                                 self.tts_input_queue, self.tts_output_queue)
@@ -120,28 +161,56 @@ class HandlerTTS(HandlerBase, ABC):
                 self.multi_process.append(process)
             self.tts_output_queue.get()
 
-        def consumer(task_queue_map: dict[str, deque], tts_output_queue: Queue):
+        cache = self.cache
+
+        def consumer(task_router: TTSTaskRouter, tts_output_queue):
             while True:
-                logger.debug(f"tts output {len(task_queue_map.keys()), tts_output_queue.qsize()}")
-                output = None
                 try:
                     output = tts_output_queue.get(timeout=1)
-                except Exception as e:
-                    logger.debug(e)
+                except queue.Empty:
                     continue
-                logger.debug(f'output {output}')
-                key = output['key']
-                audio = output['tts_speech']
-                session_id = output['session_id']
-                taskDeque = task_queue_map.get(session_id)
-                if taskDeque is None:
+                task = task_router.dispatch(output)
+                if task is None:
                     continue
-                for task in taskDeque:
-                    if task is not None and task.id == key:
-                        task.result_queue.put(audio)
-                        break
-        self.consume_thread = threading.Thread(target=consumer, args=[self.task_queue_map, self.tts_output_queue])
+                audio = output['tts_speech']
+                task.result_queue.put(audio)
+                if task.cache_key is not None and cache is not None:
+                    if audio is not None:
+                        task.audio_chunks.append(audio)
+                    elif len(task.audio_chunks) > 0:
+                        cache.put(task.cache_key, np.concatenate(task.audio_chunks, axis=-1))
+                        task.audio_chunks = []
+        self.consume_thread = threading.Thread(target=consumer, args=[self.task_router, self.tts_output_queue])
         self.consume_thread.start()
+
+        self.filler = FillerAudioSupport.create(handler_config, self.sample_rate, self.synthesize, "cosyvoice")
+
+    def synthesize(self, text: str, timeout: float = 30) -> Optional[np.ndarray]:
+        """
+        经合成进程整段合成一句并写入缓存，用于准备填充语音
+        """
+        cache_key = None
+        if self.cache is not None:
+            cache_key = TTSCache.make_key("cosyvoice", self.cache_voice, self.sample_rate, text)
+            audio = self.cache.get(cache_key)
+            if audio is not None:
+                return audio
+        task = HandlerTask(cache_key=cache_key)
+        self.task_router.register(FILLER_SESSION_ID, task.id, task)
+        self.tts_input_queue.put({
+            "text": text,
+            "key": task.id,
+            "session_id": FILLER_SESSION_ID
+        })
+        chunks = []
+        while True:
+            audio = task.result_queue.get(timeout=timeout)
+            if audio is None:
+                break
+            chunks.append(audio)
+        if len(chunks) == 0:
+            return None
+        return np.concatenate(chunks, axis=-1)
         
     @staticmethod
     def _create_message(text: str):
@@ -154,8 +223,7 @@ class HandlerTTS(HandlerBase, ABC):
         if not isinstance(handler_config, TTSConfig):
             handler_config = TTSConfig()
         context = TTSContext(session_context.session_info.session_id)
-        context.input_text = ''
-        context.task_queue = deque()
+        context.segmenter = StreamingSentenceSegmenter(**self.segmenter_params)
         if context.dump_audio:
             dump_file_path = os.path.join(DirectoryInfo.get_project_dir(), 'temp',
                                             f"dump_avatar_audio_{context.session_id}_{time.localtime().tm_hour}_{time.localtime().tm_min}.pcm")
@@ -166,99 +234,107 @@ class HandlerTTS(HandlerBase, ABC):
         context = cast(TTSContext, context)
         output_definition = self.get_handler_detail(session_context, context).outputs.get(ChatDataType.AVATAR_AUDIO).definition
 
-        def task_consumer(task_inner_queue: deque, callback: callable):
+        def task_consumer(task_inner_queue: queue.Queue, callback: callable):
             while True:
-                if len(task_inner_queue) == 0:
-                    time.sleep(0.03)
-                    continue
-                task = task_inner_queue[0]
-                task = cast(HandlerTask, task)
+                task = task_inner_queue.get()
                 if task is None:
                     break
-                logger.debug(f'get task audio {len(task_inner_queue), task.result_queue.qsize()}')
-                try:
-                    audio = task.result_queue.get(timeout=1)
-                    if audio is not None:
-                        output = DataBundle(output_definition)
-                        output.set_main_data(audio)
-                        output.add_meta("avatar_speech_end", False if not task.speech_end else True)
-                        output.add_meta("speech_id", task.speech_id)
-                        callback(output)
-                        if context.dump_audio:
-                            dump_audio = audio
-                            context.audio_dump_file.write(dump_audio.tobytes())
-                    else:
-                        task_inner_queue.popleft()
-                except Exception as e:
-                    logger.debug(e)
-  
+                task = cast(HandlerTask, task)
+                while not context.closed:
+                    try:
+                        audio = task.result_queue.get(timeout=1)
+                    except queue.Empty:
+                        continue
+                    if audio is None:
+                        break
+                    output = DataBundle(output_definition)
+                    output.set_main_data(audio)
+                    output.add_meta("avatar_speech_end", False if not task.speech_end else True)
+                    output.add_meta("speech_id", task.speech_id)
+                    callback(output)
+                    if context.dump_audio:
+                        dump_audio = audio
+                        context.audio_dump_file.write(dump_audio.tobytes())
+
         context.task_consume_thread = threading.Thread(target=task_consumer, args=[context.task_queue, context.submit_data])
         context.task_consume_thread.start()
-        self.task_queue_map[context.session_id] = context.task_queue
+
+        if self.filler is not None:
+            self.filler.start_context(context, output_definition)
 
     def filter_text(self, text):
         pattern = r"[^a-zA-Z0-9\u4e00-\u9fff,.\~!?，。！？ ]"  # 匹配不在范围内的字符
         filtered_text = re.sub(pattern, "", text)
         return filtered_text
 
+    def _submit_sentence(self, context: TTSContext, speech_id, text: str):
+        cache_key = None
+        if self.cache is not None:
+            cache_key = TTSCache.make_key("cosyvoice", self.cache_voice, self.sample_rate, text)
+            audio = self.cache.get(cache_key)
+            if audio is not None:
+                logger.debug(f"tts cache hit {text}")
+                task = HandlerTask(speech_id=speech_id)
+                for chunk in iter_audio_chunks(audio, self.sample_rate // 5):
+                    task.result_queue.put(chunk)
+                task.result_queue.put(None)
+                context.task_queue.put(task)
+                return
+        task = HandlerTask(speech_id=speech_id, cache_key=cache_key)
+        self.task_router.register(context.session_id, task.id, task)
+        tts_info = {
+            "text": text,
+            "key": task.id,
+            "session_id": context.session_id
+        }
+        context.task_queue.put(task)
+        self.tts_input_queue.put(tts_info)
+
     def handle(self, context: HandlerContext, inputs: ChatData,
                output_definitions: Dict[ChatDataType, HandlerDataInfo]):
         #output_definition = output_definitions.get(ChatDataType.AVATAR_AUDIO).definition
         context = cast(TTSContext, context)
+        if FillerAudioSupport.handle(context, inputs):
+            return
         if inputs.type == ChatDataType.AVATAR_TEXT:
             text = inputs.data.get_main_data()
         else:
             return
+        if inputs.data.get_meta("avatar_text_presynthesize", False):
+            # 本地模型合成开销在 GPU 上，不做预合成，首轮按正常流程合成
+            return
         speech_id = inputs.data.get_meta("speech_id")
         if (speech_id is None):
             speech_id = context.session_id
 
         if text is not None:
             text = re.sub(r"<\|.*?\|>", "", text)
-            context.input_text += self.filter_text(text)
+            for sentence in context.segmenter.push(self.filter_text(text)):
+                if len(sentence.strip()) < 1:
+                    continue
+                logger.info('current sentence' + sentence)
+                self._submit_sentence(context, speech_id, sentence + '。')
 
         text_end = inputs.data.get_meta("avatar_text_end", False)
-        if not text_end:
-            sentences = re.split(r'(?<=[,.~!?，。！？])', context.input_text)
-            if len(sentences) > 1:  # 至少有一个完整句子
-                complete_sentences = sentences[:-1]  # 完整句子
-                context.input_text = sentences[-1]  # 剩余的未完成部分
-
-                # 对完整句子进行处理
-                for sentence in complete_sentences:
-                    if len(sentence.strip()) < 1:
-                        continue
-                    logger.info('current sentence' + sentence)
-                    task = HandlerTask(speech_id=speech_id)
-                    tts_info = {
-                        "text": sentence + '。',
-                        "key": task.id,
-                        "session_id": context.session_id
-                    
-                    }
-                    self.tts_input_queue.put(tts_info)
-                    context.task_queue.append(task)
-        else:
-            logger.info('last sentence' + context.input_text)
-            if context.input_text is not None and len(context.input_text.strip()) > 0:
-                task = HandlerTask(speech_id=speech_id)
-                tts_info = {
-                    "text": context.input_text,
-                    "key": task.id,
-                    "session_id": context.session_id
-                }
-                self.tts_input_queue.put(tts_info)
-                context.task_queue.append(task)
-            context.input_text = ''
+        if text_end:
+            remaining = context.segmenter.flush()
+            logger.info(f'last sentence {remaining}')
+            if remaining is not None and len(remaining.strip()) > 0:
+                self._submit_sentence(context, speech_id, remaining)
             end_task = HandlerTask(speech_id=speech_id, speech_end=True)
             end_task.result_queue.put(np.zeros(shape=(1, 240), dtype=np.float32))
             end_task.result_queue.put(None)
             logger.info(f"speech end {end_task}")
-            context.task_queue.append(end_task)
+            context.task_queue.put(end_task)
 
     def destroy_context(self, context: HandlerContext):
         context = cast(TTSContext, context)
         logger.info('destroy context')
-        del self.task_queue_map[context.session_id]
-        context.task_queue.clear()
-        context.task_queue.append(None)
+        if self.cache is not None:
+            self.cache.log_stats("cosyvoice")
+        if self.filler is not None:
+            self.filler.destroy_context(context)
+        logger.info(f"cosyvoice output hop latency {self.task_router.hop_stats.summary()}")
+        self.task_router.remove_session(context.session_id)
+        context.closed = True
+        context.task_queue.put(None)
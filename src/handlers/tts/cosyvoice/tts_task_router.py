@@ -0,0 +1,81 @@
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, Optional, Set
+
+import numpy as np
+
+
+class HopLatencyStats:
+    """
+    记录合成进程输出到 handler 收到之间的耗时，保留最近 window 个样本用于计算分位数
+    """
+
+    def __init__(self, window: int = 1000):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        seconds = max(0.0, seconds)
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self._samples.append(seconds)
+
+    def summary(self) -> Dict[str, float]:
+        if self.count == 0:
+            return {"count": 0}
+        samples = np.array(self._samples)
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * 1e3, 3),
+            "p50_ms": round(float(np.percentile(samples, 50)) * 1e3, 3),
+            "p95_ms": round(float(np.percentile(samples, 95)) * 1e3, 3),
+            "max_ms": round(self.max * 1e3, 3),
+        }
+
+
+class TTSTaskRouter:
+    """
+    按任务 key 把合成进程的输出直接分发到对应任务，不再逐个会话、逐个任务查找；
+    收到结束标记（tts_speech 为 None）后任务自动注销
+    """
+
+    def __init__(self):
+        self.hop_stats = HopLatencyStats()
+        self.dropped_count = 0
+        self._tasks: Dict[Any, Any] = {}
+        self._session_keys: Dict[str, Set[Any]] = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def register(self, session_id: str, key, task):
+        with self._lock:
+            self._tasks[key] = (session_id, task)
+            self._session_keys[session_id].add(key)
+
+    def remove_session(self, session_id: str):
+        with self._lock:
+            for key in self._session_keys.pop(session_id, set()):
+                self._tasks.pop(key, None)
+
+    def dispatch(self, output: Dict) -> Optional[Any]:
+        """
+        返回输出所属的任务，未注册的 key（预热输出、已销毁会话）返回 None
+        """
+        send_time = output.get("send_time")
+        if send_time is not None:
+            self.hop_stats.record(time.time() - send_time)
+        key = output["key"]
+        with self._lock:
+            if output["tts_speech"] is None:
+                entry = self._tasks.pop(key, None)
+                if entry is not None:
+                    self._session_keys[entry[0]].discard(key)
+            else:
+                entry = self._tasks.get(key)
+        if entry is None:
+            self.dropped_count += 1
+            return None
+        return entry[1]
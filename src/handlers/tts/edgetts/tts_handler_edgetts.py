@@ -1,10 +1,8 @@
-import io
 import edge_tts
 import os
 import re
 import time
 from typing import Dict, Optional, cast
-import librosa
 import numpy as np
 from loguru import logger
 from pydantic import BaseModel, Field
@@ -16,23 +14,47 @@ from chat_engine.data_models.chat_data.chat_data_model import ChatData
 from chat_engine.data_models.chat_data_type import ChatDataType
 from chat_engine.contexts.session_context import SessionContext
 from chat_engine.data_models.runtime_data.data_bundle import DataBundle, DataBundleDefinition, DataBundleEntry
+from engine_utils.audio_stream_decoder import StreamingAudioDecoder
 from engine_utils.directory_info import DirectoryInfo
+from engine_utils.filler_audio import FillerAudioSupport, FillerConfig, FillerContextMixin
+from engine_utils.sentence_segmenter import StreamingSentenceSegmenter
+from engine_utils.synthesis_pipeline import SentenceSynthesisPipeline, SynthesisJob
+from engine_utils.tts_cache import TTSCache, get_tts_cache, iter_audio_chunks
 
-class TTSConfig(HandlerBaseConfigModel, BaseModel):
+class TTSConfig(HandlerBaseConfigModel, FillerConfig, BaseModel):
     ref_audio_path: str = Field(default=None)
     ref_audio_text: str = Field(default=None)
     voice: str = Field(default=None)
     sample_rate: int = Field(default=24000)
+    # 流式分句参数：第一段尽早切分以降低首包延迟，之后的分段逐渐变长
+    segment_first_min_chars: int = Field(default=4)
+    segment_first_max_chars: int = Field(default=20)
+    segment_min_chars: int = Field(default=8)
+    segment_max_chars: int = Field(default=80)
+    # 同时合成的句子数，输出仍按句子顺序
+    synthesis_parallelism: int = Field(default=3)
+    # 合成音频边下载边解码，按该时长分块输出
+    audio_chunk_ms: int = Field(default=160)
+    # 合成结果缓存，重复的句子直接输出缓存的音频；cache_disk_mb 为 0 时只使用内存
+    enable_cache: bool = Field(default=True)
+    cache_memory_mb: int = Field(default=64)
+    cache_disk_mb: int = Field(default=512)
+    cache_dir: Optional[str] = Field(default=None)
 
 
-class TTSContext(HandlerContext):
+class TTSContext(FillerContextMixin, HandlerContext):
     def __init__(self, session_id: str):
         super().__init__(session_id)
         self.config = None
         self.local_session_id = 0
-        self.input_text = ''
+        self.segmenter: Optional[StreamingSentenceSegmenter] = None
+        self.pipeline: Optional[SentenceSynthesisPipeline] = None
+        self.output_definition = None
+        self.current_speech_id = None
         self.dump_audio = False
         self.audio_dump_file = None
+        # 预合成的句子音频，按句子文本索引，使用后移除
+        self.presynthesized_audio: Dict[str, np.ndarray] = {}
 
 
 class HandlerTTS(HandlerBase, ABC):
@@ -44,7 +66,11 @@ class HandlerTTS(HandlerBase, ABC):
         self.voice = None
         self.ref_audio_buffer = None
         self.sample_rate = None
-      
+        self.segmenter_params = {}
+        self.synthesis_parallelism = 3
+        self.audio_chunk_ms = 160
+        self.cache: Optional[TTSCache] = None
+        self.filler: Optional[FillerAudioSupport] = None
 
     def get_handler_info(self) -> HandlerBaseInfo:
         return HandlerBaseInfo(
@@ -60,6 +86,8 @@ class HandlerTTS(HandlerBase, ABC):
                 type=ChatDataType.AVATAR_TEXT,
             )
         }
+        if self.filler is not None:
+            self.filler.add_inputs(inputs)
         outputs = {
             ChatDataType.AVATAR_AUDIO: HandlerDataInfo(
                 type=ChatDataType.AVATAR_AUDIO,
@@ -76,13 +104,32 @@ class HandlerTTS(HandlerBase, ABC):
        self.sample_rate = config.sample_rate
        self.ref_audio_path = config.ref_audio_path
        self.ref_audio_text = config.ref_audio_text
+       self.synthesis_parallelism = config.synthesis_parallelism
+       self.audio_chunk_ms = config.audio_chunk_ms
+       if config.enable_cache:
+           self.cache = get_tts_cache(config.cache_memory_mb, config.cache_disk_mb, config.cache_dir)
+       self.segmenter_params = dict(
+           first_min_chars=config.segment_first_min_chars,
+           first_max_chars=config.segment_first_max_chars,
+           min_chars=config.segment_min_chars,
+           max_chars=config.segment_max_chars,
+       )
+       self.filler = FillerAudioSupport.create(config, self.sample_rate, self.synthesize, "edgetts")
 
+    def create_segmenter(self) -> StreamingSentenceSegmenter:
+        return StreamingSentenceSegmenter(**self.segmenter_params)
 
     def create_context(self, session_context, handler_config=None):
         if not isinstance(handler_config, TTSConfig):
             handler_config = TTSConfig()
         context = TTSContext(session_context.session_info.session_id)
-        context.input_text = ''
+        context.segmenter = self.create_segmenter()
+        context.pipeline = SentenceSynthesisPipeline(
+            synthesize=self._synthesize_job,
+            emit=lambda job, audio: self._emit_audio(context, job, audio),
+            sample_rate=self.sample_rate,
+            max_parallel=self.synthesis_parallelism,
+            name=f"edgetts_{context.session_id}")
         if context.dump_audio:
             dump_file_path = os.path.join(DirectoryInfo.get_project_dir(), 'temp',
                                             f"dump_avatar_audio_{context.session_id}_{time.localtime().tm_hour}_{time.localtime().tm_min}.pcm")
@@ -92,82 +139,149 @@ class HandlerTTS(HandlerBase, ABC):
     def start_context(self, session_context, context: HandlerContext):
         context = cast(TTSContext, context)
         edge_tts.Communicate(text="测试音频启动", voice=self.voice)
+        if self.filler is not None:
+            self.filler.start_context(context, self.get_handler_detail(
+                session_context, context).outputs.get(ChatDataType.AVATAR_AUDIO).definition)
 
     def filter_text(self, text):
         pattern = r"[^a-zA-Z0-9\u4e00-\u9fff,.\~!?，。！？ ]"  # 匹配不在范围内的字符
         filtered_text = re.sub(pattern, "", text)
         return filtered_text
 
+    def stream_synthesize(self, text: str, job: Optional[SynthesisJob] = None):
+        """
+        边接收 MP3 数据边解码，逐块返回 (1, N) 的 float32 音频
+        """
+        communicate = edge_tts.Communicate(text, self.voice)
+        decoder = StreamingAudioDecoder(self.sample_rate, chunk_ms=self.audio_chunk_ms)
+        for chunk in communicate.stream_sync():
+            if job is not None and job.cancelled:
+                return
+            if chunk['type'] == 'audio':
+                yield from decoder.feed(chunk['data'])
+        yield from decoder.flush()
+
+    def _cache_key(self, text: str) -> str:
+        return TTSCache.make_key("edgetts", self.voice, self.sample_rate, text)
+
+    def cached_synthesize(self, text: str, job: Optional[SynthesisJob] = None):
+        """
+        先查缓存，命中时按相同分块直接输出；未命中时流式合成，完整合成后写入缓存
+        """
+        if self.cache is None:
+            yield from self.stream_synthesize(text, job)
+            return
+        key = self._cache_key(text)
+        audio = self.cache.get(key)
+        if audio is not None:
+            logger.debug(f"tts cache hit {text}")
+            yield from iter_audio_chunks(audio, int(self.sample_rate * self.audio_chunk_ms / 1000))
+            return
+        chunks = []
+        for chunk in self.stream_synthesize(text, job):
+            chunks.append(chunk)
+            yield chunk
+        if len(chunks) > 0 and (job is None or not job.cancelled):
+            self.cache.put(key, np.concatenate(chunks, axis=-1))
+
+    def synthesize(self, text: str) -> np.ndarray:
+        chunks = list(self.cached_synthesize(text))
+        if len(chunks) == 0:
+            return np.zeros(shape=(1, 0), dtype=np.float32)
+        return np.concatenate(chunks, axis=-1)
+
+    def _synthesize_job(self, job: SynthesisJob):
+        return self.cached_synthesize(job.text, job)
+
+    @staticmethod
+    def _emit_audio(context: TTSContext, job: SynthesisJob, audio: np.ndarray):
+        output = DataBundle(context.output_definition)
+        output.set_main_data(audio)
+        output.add_meta("avatar_speech_end", job.speech_end)
+        output.add_meta("speech_id", job.speech_id)
+        context.submit_data(output)
+        if job.speech_end:
+            logger.info(f"speech end")
+
+    def interrupt(self, context: TTSContext):
+        """
+        丢弃尚未输出的句子和未切分的文本
+        """
+        context.segmenter.reset()
+        context.pipeline.cancel()
+
+    def presynthesize(self, context: TTSContext, text: str):
+        """
+        预先合成整段文本，按与流式输入相同的规则切句后缓存，之后收到相同句子时直接输出
+        """
+        text = self.filter_text(re.sub(r"<\|.*?\|>", "", text))
+        start_time = time.monotonic()
+        for sentence in self.create_segmenter().split(text):
+            if len(sentence.strip()) < 1 or sentence in context.presynthesized_audio:
+                continue
+            try:
+                context.presynthesized_audio[sentence] = self.synthesize(sentence)
+            except Exception as e:
+                logger.warning(f"presynthesize sentence {sentence} failed: {e}")
+        logger.info(f"presynthesized {len(context.presynthesized_audio)} sentences in "
+                    f"{round((time.monotonic() - start_time) * 1e3)} ms")
+
     def handle(self, context: HandlerContext, inputs: ChatData,
                output_definitions: Dict[ChatDataType, HandlerDataInfo]):
         output_definition = output_definitions.get(ChatDataType.AVATAR_AUDIO).definition
         context = cast(TTSContext, context)
+        if FillerAudioSupport.handle(context, inputs):
+            return
         if inputs.type == ChatDataType.AVATAR_TEXT:
             text = inputs.data.get_main_data()
         else:
             return
+        if inputs.data.get_meta("avatar_text_presynthesize", False):
+            self.presynthesize(context, text)
+            return
         speech_id = inputs.data.get_meta("speech_id")
         if (speech_id is None):
             speech_id = context.session_id
 
+        context.output_definition = output_definition
+        if speech_id != context.current_speech_id:
+            if context.pipeline.has_pending():
+                logger.info(f"new speech {speech_id} interrupts {context.current_speech_id}")
+                self.interrupt(context)
+            context.current_speech_id = speech_id
+
+        sentences = []
         if text is not None:
             text = re.sub(r"<\|.*?\|>", "", text)
-            context.input_text += self.filter_text(text)
+            sentences = context.segmenter.push(self.filter_text(text))
 
         text_end = inputs.data.get_meta("avatar_text_end", False)
-        if not text_end:
-            sentences = re.split(r'(?<=[,.~!?，。！？])', context.input_text)
-            if len(sentences) > 1:  # 至少有一个完整句子
-                complete_sentences = sentences[:-1]  # 完整句子
-                context.input_text = sentences[-1]  # 剩余的未完成部分
-
-                # 对完整句子进行处理
-                for sentence in complete_sentences:
-                    if len(sentence.strip()) < 1:
-                        continue
-                    logger.info('current sentence' + sentence)
-                    
-                    communicate = edge_tts.Communicate(sentence, self.voice)
-                    data = b''
-
-                    for chunk in communicate.stream_sync():
-                        if chunk['type'] == 'audio':
-                            # tts_audio = chunk['data']
-                            data += chunk['data']
-                    
-                    output_audio = librosa.load(io.BytesIO(data), sr=None)[0]
-                    output_audio = output_audio[np.newaxis, ...]
-                    output = DataBundle(output_definition)
-                    output.set_main_data(output_audio)
-                    output.add_meta("avatar_speech_end", False)
-                    output.add_meta("speech_id", speech_id)
-                    context.submit_data(output)
-        else:
-            logger.info('last sentence' + context.input_text)
-            if context.input_text is not None and len(context.input_text.strip()) > 0:
-                    communicate = edge_tts.Communicate(context.input_text, self.voice)
-                    data = b''
-
-                    for chunk in communicate.stream_sync():
-                        if chunk['type'] == 'audio':
-                            # tts_audio = chunk['data']
-                            data += chunk['data']
-                    output_audio = librosa.load(io.BytesIO(data), sr=None)[0]
-                    output_audio = output_audio[np.newaxis, ...]
-                    output = DataBundle(output_definition)
-                    output.set_main_data(output_audio)
-                    output.add_meta("avatar_speech_end", False)
-                    output.add_meta("speech_id", speech_id)
-                    context.submit_data(output)
-            context.input_text = ''
-            output = DataBundle(output_definition)
-            output.set_main_data(np.zeros(shape=(1, 240), dtype=np.float32))
-            output.add_meta("avatar_speech_end", True)
-            output.add_meta("speech_id", speech_id)
-            context.submit_data(output)
-            logger.info(f"speech end")
+        if text_end:
+            remaining = context.segmenter.flush()
+            logger.info(f'last sentence {remaining}')
+            if remaining is not None:
+                sentences.append(remaining)
+
+        for sentence in sentences:
+            if len(sentence.strip()) < 1:
+                continue
+            logger.info('current sentence' + sentence)
+            output_audio = context.presynthesized_audio.pop(sentence, None)
+            if output_audio is not None:
+                context.pipeline.submit_audio(output_audio, speech_id)
+            else:
+                context.pipeline.submit(sentence, speech_id)
+
+        if text_end:
+            context.pipeline.submit_audio(np.zeros(shape=(1, 240), dtype=np.float32), speech_id, speech_end=True)
 
     def destroy_context(self, context: HandlerContext):
         context = cast(TTSContext, context)
         logger.info('destroy context')
+        if context.pipeline is not None:
+            context.pipeline.shutdown()
+        if self.filler is not None:
+            self.filler.destroy_context(context)
+        if self.cache is not None:
+            self.cache.log_stats("edgetts")
 
@@ -24,6 +24,8 @@ class SileroVADConfigModel(HandlerBaseConfigModel, BaseModel):
     end_delay: int = Field(default=5000)
     buffer_look_back: int = Field(default=1024)
     speech_padding: int = Field(default=512)
+    # 静音超过该长度（采样点数，需小于 end_delay）时发出 human_speech_pause，下游可据此提前推测请求，0 表示关闭
+    speculative_delay: int = Field(default=0)
 
 
 class SpeakingStatus(enum.Enum):
@@ -52,11 +54,13 @@ class HumanAudioVADContext(HandlerContext):
         self.slice_context: Optional[SliceContext] = None
 
         self.speech_id: int = 0
+        self.speech_paused: bool = False
 
     def reset(self):
         self.audio_history.clear()
         self.speech_length = 0
         self.silence_length = 0
+        self.speech_paused = False
         self.slice_context.flush()
 
     def _update_status_on_pre_start(self, clip: np.ndarray, _timestamp: Optional[int] = None):
@@ -105,7 +109,17 @@ class HumanAudioVADContext(HandlerContext):
                 logger.info(f"VAD start to start got timestamp {timestamp}")
             return output_audio,  extra_args
         else:
-            return clip, {"head_sample_id": timestamp}
+            extra_args = {"head_sample_id": timestamp}
+            if 0 < self.config.speculative_delay < self.config.end_delay:
+                if not self.speech_paused and self.silence_length >= self.config.speculative_delay:
+                    self.speech_paused = True
+                    extra_args["human_speech_pause"] = True
+                    logger.info("Pause of human speech")
+                elif self.speech_paused and self.silence_length == 0:
+                    self.speech_paused = False
+                    extra_args["human_speech_resume"] = True
+                    logger.info("Resume of human speech")
+            return clip, extra_args
 
     def _update_status_on_end(self, _clip: np.ndarray, _timestamp: Optional[int] = None):
         if self.speech_length > 0:
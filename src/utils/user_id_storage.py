@@ -4,7 +4,7 @@
 用于在同一台服务器上的前端和后端之间传递用户ID
 """
 
-from typing import Dict, Optional
+from typing import Callable, Dict, List, Optional
 import threading
 import time
 from loguru import logger
@@ -14,6 +14,7 @@ class UserIDStorage:
     
     def __init__(self):
         self._storage: Dict[str, str] = {}  # session_id -> user_id
+        self._listeners: List[Callable[[str, str], None]] = []
         self._lock = threading.Lock()
         self._cleanup_interval = 300  # 5分钟清理一次
         self._last_cleanup = time.time()
@@ -22,7 +23,25 @@ class UserIDStorage:
         """设置用户ID"""
         with self._lock:
             self._storage[session_id] = user_id
+            listeners = list(self._listeners)
             # logger.info(f"存储用户ID: session_id={session_id}, user_id={user_id}")
+        for listener in listeners:
+            try:
+                listener(session_id, user_id)
+            except Exception as e:
+                logger.warning(f"用户ID回调执行失败: {e}")
+
+    def add_listener(self, listener: Callable[[str, str], None]):
+        """添加用户ID写入回调，回调参数为 (session_id, user_id)，应尽快返回"""
+        with self._lock:
+            if listener not in self._listeners:
+                self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[str, str], None]):
+        """移除用户ID写入回调"""
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
     
     def get_user_id(self, session_id: str) -> Optional[str]:
         """获取用户ID"""
@@ -66,3 +85,11 @@ def get_user_id(session_id: str) -> Optional[str]:
 def remove_user_id(session_id: str):
     """移除用户ID的便捷函数"""
     user_id_storage.remove_user_id(session_id)
+
+def add_user_id_listener(listener: Callable[[str, str], None]):
+    """添加用户ID写入回调的便捷函数"""
+    user_id_storage.add_listener(listener)
+
+def remove_user_id_listener(listener: Callable[[str, str], None]):
+    """移除用户ID写入回调的便捷函数"""
+    user_id_storage.remove_listener(listener)
@@ -0,0 +1,71 @@
+
+import os
+import sys
+import time
+
+from loguru import logger
+from handlers.avatar.liteavatar.avatar_output_handler import AvatarOutputHandler
+from handlers.avatar.liteavatar.avatar_processor_factory import AvatarAlgoType, AvatarProcessorFactory
+from handlers.avatar.liteavatar.model.algo_model import AvatarInitOption
+from handlers.avatar.liteavatar.model.audio_input import SpeechAudio
+from engine_utils.directory_info import DirectoryInfo
+from engine_utils.media_utils import AudioUtils
+
+
+class NullOutputHandler(AvatarOutputHandler):
+
+    def on_start(self, init_option):
+        pass
+
+    def on_stop(self):
+        pass
+
+    def on_audio(self, audio_result):
+        pass
+
+    def on_video(self, video_result):
+        pass
+
+    def on_avatar_status_change(self, speech_id, avatar_status):
+        pass
+
+
+class RenderBenchmark:
+    """
+    run the same speech through the render pipeline with different render batch sizes,
+    report frames per cpu second of the render thread and frame delivery jitter
+    """
+
+    def __init__(self):
+        logger.remove()
+        logger.add(sys.stdout, level="WARNING")
+
+    def run(self, batch_sizes=(1, 4, 8)):
+        test_input_file_path = os.path.join(
+            DirectoryInfo.get_project_dir(), "resource", "audio", "ymr_48k.wav"
+        )
+        audio_bytes, sample_rate = AudioUtils.read_wav_to_bytes(test_input_file_path)
+        duration = len(audio_bytes) / 2 / sample_rate
+        handler_root = os.path.join(DirectoryInfo.get_project_dir(), "src", "handlers", "avatar", "liteavatar")
+        for batch_size in batch_sizes:
+            processor = AvatarProcessorFactory.create_avatar_processor(
+                handler_root,
+                AvatarAlgoType.TTS2FACE_CPU,
+                AvatarInitOption(audio_sample_rate=sample_rate, video_frame_rate=25,
+                                 render_batch_size=batch_size, enable_idle_frame_cache=False))
+            processor.register_output_handler(NullOutputHandler())
+            processor.start()
+            time.sleep(1)
+            processor.add_audio(SpeechAudio(
+                audio_data=audio_bytes,
+                speech_id="1",
+                end_of_speech=True,
+                sample_rate=sample_rate))
+            time.sleep(duration + 2)
+            print(f"render_batch_size {batch_size}: render {processor.get_render_summary()}, "
+                  f"frame time {processor.get_frame_time_summary()}")
+            processor.stop()
+
+
+if __name__ == "__main__":
+    RenderBenchmark().run()
@@ -2,8 +2,9 @@ from fractions import Fraction
 import os
 import av
 from loguru import logger
+import numpy as np
 from handlers.avatar.liteavatar.avatar_output_handler import AvatarOutputHandler
-from handlers.avatar.liteavatar.model import AudioResult, AvatarInitOption, VideoResult
+from handlers.avatar.liteavatar.model.algo_model import AudioResult, AvatarInitOption, AvatarStatus, VideoResult
 from engine_utils.directory_info import DirectoryInfo
 
 
@@ -16,16 +17,22 @@ class SampleOutputHandler(AvatarOutputHandler):
         self.video_stream = None
         self.audio_stream = None
         self._last_audio_pts = -1
+        self._next_audio_pts = 0
         self._init_option: AvatarInitOption = None
 
     def on_audio(self, audio_result: AudioResult):
-        logger.info("receive audio result {:.3f}",
-                    audio_result.audio_frame.pts * audio_result.audio_frame.time_base)
-        audio_frame = audio_result.audio_frame
+        audio_data = audio_result.audio_data
+        audio_format = "flt" if audio_data.dtype == np.float32 else "s16"
+        audio_frame = av.AudioFrame.from_ndarray(
+            np.ascontiguousarray(audio_data.reshape(1, -1)), format=audio_format, layout="mono")
+        audio_frame.sample_rate = audio_result.sample_rate
+        audio_frame.time_base = Fraction(1, audio_result.sample_rate)
+        audio_frame.pts = self._next_audio_pts
+        self._next_audio_pts += audio_data.shape[-1]
+        logger.info("receive audio result {:.3f}", float(audio_frame.pts * audio_frame.time_base))
         if self.audio_stream is None:
             self.audio_stream = self.output_container.add_stream(
                 'aac', rate=self._init_option.audio_sample_rate)
-            self.audio_stream.channels = 1
             self.audio_stream.layout = "mono"
             self.audio_stream.time_base = Fraction(1, self._init_option.audio_sample_rate)
 
@@ -40,7 +47,7 @@ class SampleOutputHandler(AvatarOutputHandler):
 
     def on_video(self, video_result: VideoResult):
         logger.info("receive image result {:.3f} with status {}",
-                    video_result.video_frame.pts * video_result.video_frame.time_base,
+                    float(video_result.video_frame.pts * video_result.video_frame.time_base),
                     video_result.avatar_status)
         video_frame = video_result.video_frame
         if self.video_stream is None:
@@ -60,6 +67,9 @@ class SampleOutputHandler(AvatarOutputHandler):
         logger.info("sample handler start {}", init_option)
         self._init_option = init_option
 
+    def on_avatar_status_change(self, speech_id, avatar_status: AvatarStatus):
+        logger.info("avatar status of speech {} changed to {}", speech_id, avatar_status)
+
     def on_stop(self):
         logger.info("sample handler stop")
         for packet in self.video_stream.encode():
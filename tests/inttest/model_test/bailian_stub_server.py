@@ -0,0 +1,149 @@
+import base64
+import hashlib
+import json
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+
+_WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+class BailianStubServer:
+    """
+    Minimal websocket server speaking the dashscope tts_v2 task protocol for local latency tests.
+    run-task -> task-started, every continue-task -> `audio_bytes` of silent PCM after `first_audio_delay`,
+    finish-task -> task-finished.
+    `connect_delay` is paid once per new connection to emulate TCP/TLS/websocket handshake cost,
+    connections idle for `idle_timeout` seconds are closed by the server.
+    """
+
+    def __init__(self, connect_delay: float = 0.0, first_audio_delay: float = 0.0, audio_bytes: int = 4800,
+                 idle_timeout: float = 0.0):
+        self.connect_delay = connect_delay
+        self.first_audio_delay = first_audio_delay
+        self.audio_bytes = audio_bytes
+        self.idle_timeout = idle_timeout
+        self.connection_count = 0
+        self.task_count = 0
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"ws://{host}:{port}/api-ws/v1/inference/"
+
+    def _create_handler(self):
+        stub = self
+
+        class _Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                stub.connection_count += 1
+                if not self._handshake():
+                    return
+                if stub.idle_timeout > 0:
+                    self.request.settimeout(stub.idle_timeout)
+                try:
+                    while True:
+                        opcode, payload = self._read_frame()
+                        if opcode is None or opcode == 0x8:
+                            break
+                        if opcode == 0x9:
+                            self._send_frame(0xA, payload)
+                        elif opcode == 0x1:
+                            self._on_command(json.loads(payload))
+                except (socket.timeout, ConnectionError, OSError):
+                    pass
+                try:
+                    self._send_frame(0x8, struct.pack("!H", 1000))
+                except OSError:
+                    pass
+
+            def _handshake(self) -> bool:
+                data = b""
+                while b"\r\n\r\n" not in data:
+                    chunk = self.request.recv(4096)
+                    if not chunk:
+                        return False
+                    data += chunk
+                key = ""
+                for line in data.decode("latin-1").split("\r\n"):
+                    if line.lower().startswith("sec-websocket-key:"):
+                        key = line.split(":", 1)[1].strip()
+                if stub.connect_delay > 0:
+                    time.sleep(stub.connect_delay)
+                accept = base64.b64encode(hashlib.sha1((key + _WS_GUID).encode()).digest()).decode()
+                self.request.sendall((
+                    "HTTP/1.1 101 Switching Protocols\r\n"
+                    "Upgrade: websocket\r\n"
+                    "Connection: Upgrade\r\n"
+                    f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+                return True
+
+            def _recv_exact(self, size: int) -> bytes:
+                data = b""
+                while len(data) < size:
+                    chunk = self.request.recv(size - len(data))
+                    if not chunk:
+                        raise ConnectionError("connection closed")
+                    data += chunk
+                return data
+
+            def _read_frame(self):
+                header = self._recv_exact(2)
+                opcode = header[0] & 0x0F
+                length = header[1] & 0x7F
+                if length == 126:
+                    length = struct.unpack("!H", self._recv_exact(2))[0]
+                elif length == 127:
+                    length = struct.unpack("!Q", self._recv_exact(8))[0]
+                mask = self._recv_exact(4) if header[1] & 0x80 else None
+                payload = self._recv_exact(length)
+                if mask is not None:
+                    payload = bytes(byte ^ mask[index % 4] for index, byte in enumerate(payload))
+                return opcode, payload
+
+            def _send_frame(self, opcode: int, payload: bytes):
+                length = len(payload)
+                if length < 126:
+                    header = struct.pack("!BB", 0x80 | opcode, length)
+                elif length < 65536:
+                    header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+                else:
+                    header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+                self.request.sendall(header + payload)
+
+            def _send_event(self, event: str, task_id: str):
+                message = {"header": {"event": event, "task_id": task_id}, "payload": {}}
+                self._send_frame(0x1, json.dumps(message).encode())
+
+            def _on_command(self, command):
+                action = command["header"]["action"]
+                task_id = command["header"]["task_id"]
+                if action == "run-task":
+                    stub.task_count += 1
+                    self._send_event("task-started", task_id)
+                elif action == "continue-task":
+                    if stub.first_audio_delay > 0:
+                        time.sleep(stub.first_audio_delay)
+                    self._send_frame(0x2, b"\x00" * stub.audio_bytes)
+                elif action == "finish-task":
+                    self._send_event("task-finished", task_id)
+
+        return _Handler
+
+    def start(self):
+        self._server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), self._create_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,94 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class DifyStubServer:
+    """
+    Minimal Dify chatflow server: /files/upload returns a file id, /chat-messages streams
+    workflow/node events with large payloads followed by message events and message_end.
+    """
+
+    def __init__(self, reply: str = "你好，我是Dify测试回复。", first_token_delay: float = 0.0,
+                 node_payload_size: int = 20000):
+        self.reply = reply
+        self.first_token_delay = first_token_delay
+        self.node_payload_size = node_payload_size
+        self.connection_count = 0
+        self.upload_count = 0
+        self.upload_bytes = 0
+        self.chat_bodies = []
+        self._server = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/v1"
+
+    def _create_handler(self):
+        stub = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                stub.connection_count += 1
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length)
+                if self.path.endswith("/files/upload"):
+                    stub.upload_count += 1
+                    stub.upload_bytes += length
+                    self._send_json({"id": f"file-{stub.upload_count}"})
+                    return
+                stub.chat_bodies.append(json.loads(body))
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    self._write_event({"event": "workflow_started", "data": {"inputs": {}}})
+                    self._write_event({"event": "node_finished",
+                                       "data": {"outputs": {"text": "x" * stub.node_payload_size}}})
+                    time.sleep(stub.first_token_delay)
+                    for token in stub.reply:
+                        self._write_event({"event": "message", "conversation_id": "conv-1", "answer": token})
+                    self._write_event({"event": "message_end", "conversation_id": "conv-1"})
+                    self.wfile.write(b"0\r\n\r\n")
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def _send_json(self, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _write_event(self, payload):
+                data = f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode()
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+        return _Handler
+
+    def start(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._create_handler())
+        self._server.daemon_threads = True
+        self._server.handle_error = lambda request, client_address: None
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,110 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class OpenAIStubServer:
+    """
+    Minimal OpenAI-compatible chat completion server for local latency tests.
+    It streams `reply` token by token, waiting `first_token_delay` seconds before the first chunk.
+    `connect_delay` is paid once per new connection to emulate TCP/TLS handshake cost.
+    """
+
+    def __init__(self, reply: str = "你好，我是测试回复。", first_token_delay: float = 0.0,
+                 token_interval: float = 0.0, fail: bool = False, connect_delay: float = 0.0):
+        self.reply = reply
+        self.connect_delay = connect_delay
+        self.first_token_delay = first_token_delay
+        self.token_interval = token_interval
+        self.fail = fail
+        self.request_count = 0
+        self.connection_count = 0
+        self.received_bodies = []
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/v1"
+
+    def _create_handler(self):
+        stub = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                stub.connection_count += 1
+                if stub.connect_delay > 0:
+                    time.sleep(stub.connect_delay)
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                body = json.dumps({"object": "list", "data": []}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                stub.received_bodies.append(json.loads(self.rfile.read(length) or b"{}"))
+                stub.request_count += 1
+                if stub.fail:
+                    body = json.dumps({"error": {"message": "stub failure"}}).encode()
+                    self.send_response(500)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                time.sleep(stub.first_token_delay)
+                try:
+                    for token in stub.reply:
+                        self._write_event({
+                            "id": "stub", "object": "chat.completion.chunk", "created": int(time.time()),
+                            "model": "stub", "choices": [{"index": 0, "delta": {"content": token},
+                                                          "finish_reason": None}]
+                        })
+                        if stub.token_interval > 0:
+                            time.sleep(stub.token_interval)
+                    # [DONE] 与结束块一起发送，客户端在 [DONE] 后关闭响应时连接仍可回到 keep-alive 池
+                    done = b"data: [DONE]\n\n"
+                    self.wfile.write(f"{len(done):x}\r\n".encode() + done + b"\r\n0\r\n\r\n")
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def _write_event(self, payload):
+                self._write_chunk(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode())
+
+            def _write_chunk(self, data: bytes):
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+        return _Handler
+
+    def start(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._create_handler())
+        self._server.daemon_threads = True
+        # 客户端取消请求（对冲、超时切换）时连接会被重置，不打印异常堆栈
+        self._server.handle_error = lambda request, client_address: None
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
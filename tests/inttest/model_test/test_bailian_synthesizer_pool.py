@@ -0,0 +1,97 @@
+import os
+import sys
+import threading
+import time
+import unittest
+
+import dashscope
+from dashscope.audio.tts_v2 import AudioFormat, ResultCallback, SpeechSynthesizer
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "..", "src"))
+sys.path.append(os.path.dirname(__file__))
+
+from handlers.tts.bailian_tts.synthesizer_pool import borrow_synthesizer, init_synthesizer_pool, \
+    release_synthesizer, shutdown_synthesizer_pool  # noqa: E402
+from bailian_stub_server import BailianStubServer  # noqa: E402
+
+
+_FORMAT = AudioFormat.PCM_24000HZ_MONO_16BIT
+
+
+class _Callback(ResultCallback):
+    def __init__(self):
+        super().__init__()
+        self.first_audio = threading.Event()
+        self.audio_bytes = 0
+
+    def on_data(self, data: bytes) -> None:
+        self.audio_bytes += len(data)
+        self.first_audio.set()
+
+
+def measure_first_audio(synthesizer_factory, release) -> float:
+    # 与 handler 一致：取合成器，流式送入一句文本，等到首个音频包
+    callback = _Callback()
+    start = time.monotonic()
+    synthesizer = synthesizer_factory(callback)
+    synthesizer.streaming_call("你好，我是测试回复。")
+    if not callback.first_audio.wait(5):
+        raise TimeoutError("no audio received")
+    first_audio = time.monotonic() - start
+    synthesizer.streaming_complete()
+    release(synthesizer)
+    return first_audio
+
+
+class TestBailianSynthesizerPool(unittest.TestCase):
+    def setUp(self):
+        dashscope.api_key = "stub"
+        self.server = BailianStubServer(connect_delay=0.1, first_audio_delay=0.02).start()
+
+    def tearDown(self):
+        shutdown_synthesizer_pool()
+        self.server.stop()
+
+    def test_first_audio_latency(self):
+        turn_num = 5
+
+        def create(callback):
+            return SpeechSynthesizer(model="cosyvoice-v1", voice="longxiaochun", format=_FORMAT,
+                                     callback=callback, url=self.server.url)
+
+        fresh_latency = [measure_first_audio(create, lambda synthesizer: None) for _ in range(turn_num)]
+
+        init_synthesizer_pool(2, self.server.url)
+        connection_count = self.server.connection_count
+
+        def borrow(callback):
+            return borrow_synthesizer("cosyvoice-v1", "longxiaochun", _FORMAT, callback=callback,
+                                      url=self.server.url)
+
+        pooled_latency = [measure_first_audio(borrow, release_synthesizer) for _ in range(turn_num)]
+
+        fresh_avg = sum(fresh_latency) / turn_num
+        pooled_avg = sum(pooled_latency) / turn_num
+        print(f"first audio latency: new connection {fresh_avg * 1e3:.1f} ms, "
+              f"pooled connection {pooled_avg * 1e3:.1f} ms")
+        # 每轮都复用池中已连接的合成器，不再建立新连接
+        self.assertEqual(self.server.connection_count, connection_count)
+        self.assertLess(pooled_avg, fresh_avg - 0.05)
+
+    def test_reconnect_after_idle_timeout(self):
+        self.server.idle_timeout = 0.5
+        init_synthesizer_pool(1, self.server.url)
+        # 服务端关闭空闲连接后，取出的合成器仍可正常合成（池内重连或新建连接）
+        time.sleep(1.0)
+        callback = _Callback()
+        synthesizer = borrow_synthesizer("cosyvoice-v1", "longxiaochun", _FORMAT, callback=callback,
+                                         url=self.server.url)
+        synthesizer.streaming_call("你好。")
+        synthesizer.streaming_complete()
+        release_synthesizer(synthesizer)
+        self.assertGreater(callback.audio_bytes, 0)
+        self.assertGreater(self.server.connection_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import json
+import os
+import sys
+import time
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "..", "src"))
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+sys.path.append(os.path.dirname(__file__))
+
+from handlers.llm.dify.dify_client import DifySSEDecoder, get_dify_session  # noqa: E402
+from handlers.llm.dify.llm_handler_dify import DifyConfig, HandlerDify  # noqa: E402
+from dify_stub_server import DifyStubServer  # noqa: E402
+
+
+class TestDifySSEDecoder(unittest.TestCase):
+    def test_split_chunks(self):
+        events = [{"event": "node_finished", "data": {"outputs": "x" * 100}},
+                  {"event": "message", "answer": "你"},
+                  {"event": "message", "answer": "好"},
+                  {"event": "message_end", "conversation_id": "c"}]
+        stream = b"".join(f"data: {json.dumps(event, ensure_ascii=False)}\r\n\r\n".encode() for event in events)
+        stream += b"event: ping\n\n"
+        decoder = DifySSEDecoder(events={"message", "message_end"})
+        decoded = []
+        for index in range(0, len(stream), 7):
+            decoded.extend(decoder.feed(stream[index:index + 7]))
+        self.assertEqual(decoded, events[1:])
+        self.assertEqual(decoder.skipped_count, 1)
+
+
+class TestDifyClient(unittest.TestCase):
+    def setUp(self):
+        self.server = DifyStubServer().start()
+        self.handler = HandlerDify()
+        config = DifyConfig(api_key="stub", api_url=self.server.base_url, enable_video_input=True)
+        session_context = SimpleNamespace(session_info=SimpleNamespace(session_id="dify-test"))
+        self.context = self.handler.create_context(session_context, config)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_connection_reuse_and_upload_dedup(self):
+        frame = np.zeros((1, 720, 1280, 3), dtype=np.uint8)
+        ttft_list = []
+        for _ in range(3):
+            self.context.frame_sampler.push(frame, 0)
+            images = self.handler._collect_images(self.context)
+            start = time.monotonic()
+            ttft = None
+            reply = ""
+            for text in self.handler._send_dify_request(self.context, "你好", images):
+                if ttft is None:
+                    ttft = time.monotonic() - start
+                reply += text
+            ttft_list.append(ttft)
+            self.assertEqual(reply, self.server.reply)
+        print(f"dify ttft {[round(ttft * 1e3, 1) for ttft in ttft_list]} ms, "
+              f"uploaded {self.server.upload_bytes} bytes in {self.server.upload_count} request(s)")
+        self.assertEqual(self.context.conversation_id, "conv-1")
+        self.assertEqual(self.server.upload_count, 1)
+        self.assertEqual(self.server.connection_count, 1)
+        self.assertEqual(self.server.chat_bodies[-1]["files"][0]["upload_file_id"], "file-1")
+
+    def test_shared_session(self):
+        self.assertIs(get_dify_session(self.server.base_url), get_dify_session(self.server.base_url + "/"))
+
+
+if __name__ == '__main__':
+    unittest.main()
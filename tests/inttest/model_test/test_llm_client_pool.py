@@ -0,0 +1,67 @@
+import os
+import sys
+import time
+import unittest
+
+from openai import OpenAI
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "..", "src"))
+sys.path.append(os.path.dirname(__file__))
+
+from engine_utils.llm_client_pool import LLMClientPool, LLMClientPoolConfig  # noqa: E402
+from openai_stub_server import OpenAIStubServer  # noqa: E402
+
+
+def measure_ttft(client: OpenAI) -> float:
+    start = time.monotonic()
+    completion = client.chat.completions.create(
+        model="stub", messages=[{"role": "user", "content": "hi"}], stream=True)
+    ttft = None
+    for chunk in completion:
+        if ttft is None and chunk.choices and chunk.choices[0].delta.content:
+            ttft = time.monotonic() - start
+    return ttft
+
+
+class TestLLMClientPool(unittest.TestCase):
+    def setUp(self):
+        self.server = OpenAIStubServer(connect_delay=0.1).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_first_turn_ttft(self):
+        session_num = 5
+        fresh_ttft = []
+        for _ in range(session_num):
+            client = OpenAI(api_key="stub", base_url=self.server.base_url)
+            fresh_ttft.append(measure_ttft(client))
+            client.close()
+
+        pool = LLMClientPool()
+        config = LLMClientPoolConfig(http2=False, prewarm_connections=1)
+        pool.acquire(self.server.base_url, "stub", config)
+        pool.prewarm(self.server.base_url, "stub")
+        time.sleep(0.5)
+        connection_count = self.server.connection_count
+        pooled_ttft = [measure_ttft(pool.get_client(self.server.base_url, "stub")) for _ in range(session_num)]
+        pool.release(self.server.base_url, "stub")
+
+        fresh_avg = sum(fresh_ttft) / session_num
+        pooled_avg = sum(pooled_ttft) / session_num
+        print(f"first turn ttft: new client {fresh_avg * 1e3:.1f} ms, pooled client {pooled_avg * 1e3:.1f} ms")
+        self.assertEqual(self.server.connection_count, connection_count)
+        self.assertLess(pooled_avg, fresh_avg)
+
+    def test_shared_client_per_endpoint(self):
+        pool = LLMClientPool()
+        client_a = pool.acquire(self.server.base_url, "stub")
+        client_b = pool.get_client(self.server.base_url + "/", "stub")
+        client_c = pool.get_client(self.server.base_url, "other")
+        self.assertIs(client_a, client_b)
+        self.assertIsNot(client_a, client_c)
+        pool.close_all()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+import os
+import sys
+import time
+import unittest
+
+from openai import OpenAI
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "..", "src"))
+sys.path.append(os.path.dirname(__file__))
+
+from chat_engine.common.handler_base import HandlerDataInfo  # noqa: E402
+from chat_engine.data_models.chat_data.chat_data_model import ChatData  # noqa: E402
+from chat_engine.data_models.chat_data_type import ChatDataType  # noqa: E402
+from chat_engine.data_models.runtime_data.data_bundle import (  # noqa: E402
+    DataBundle, DataBundleDefinition, DataBundleEntry)
+from handlers.llm.openai_compatible.chat_history_manager import ChatHistory  # noqa: E402
+from handlers.llm.openai_compatible.endpoint_router import EndpointRouter, LLMEndpoint, TTFTHistogram  # noqa: E402
+from handlers.llm.openai_compatible.llm_handler_openai_compatible import (  # noqa: E402
+    HandlerLLM, LLMConfig, LLMContext)
+from openai_stub_server import OpenAIStubServer  # noqa: E402
+
+
+def create_stream(endpoint: LLMEndpoint):
+    return endpoint.client.chat.completions.create(
+        model=endpoint.model_name, messages=[{"role": "user", "content": "hi"}], stream=True)
+
+
+def collect(router: EndpointRouter):
+    start = time.monotonic()
+    ttft = None
+    text = ''
+    for chunk in router.open_stream(create_stream):
+        if chunk.choices and chunk.choices[0].delta.content:
+            if ttft is None:
+                ttft = time.monotonic() - start
+            text += chunk.choices[0].delta.content
+    return text, ttft
+
+
+class TestEndpointRouter(unittest.TestCase):
+    def setUp(self):
+        self.servers = []
+        self.clients = []
+
+    def tearDown(self):
+        for client in self.clients:
+            client.close()
+        for server in self.servers:
+            server.stop()
+
+    def _create_endpoint(self, name, **kwargs) -> LLMEndpoint:
+        server = OpenAIStubServer(reply=name, **kwargs).start()
+        client = OpenAI(api_key="stub", base_url=server.base_url, max_retries=0)
+        self.servers.append(server)
+        self.clients.append(client)
+        return LLMEndpoint(name=name, client=client, model_name="stub")
+
+    def test_failover_on_error(self):
+        router = EndpointRouter([self._create_endpoint("primary", fail=True), self._create_endpoint("backup")])
+        text, _ = collect(router)
+        self.assertEqual(text, "backup")
+        self.assertEqual(router.endpoints[0].failure_count, 1)
+
+    def test_failover_on_first_token_timeout(self):
+        router = EndpointRouter([self._create_endpoint("primary", first_token_delay=2.0),
+                                 self._create_endpoint("backup")], first_token_timeout=0.3)
+        text, ttft = collect(router)
+        self.assertEqual(text, "backup")
+        self.assertLess(ttft, 1.0)
+
+    def test_hedge_keeps_faster_stream(self):
+        router = EndpointRouter([self._create_endpoint("primary", first_token_delay=1.5),
+                                 self._create_endpoint("backup", first_token_delay=0.05)],
+                                policy=EndpointRouter.POLICY_HEDGE, hedge_delay_ms=200)
+        text, ttft = collect(router)
+        print(f"hedged ttft {ttft * 1e3:.1f} ms")
+        self.assertEqual(text, "backup")
+        self.assertLess(ttft, 1.0)
+        self.assertEqual(router.hedge_count, 1)
+        self.assertEqual(router.endpoints[1].win_count, 1)
+
+    def test_hedge_not_fired_for_fast_primary(self):
+        router = EndpointRouter([self._create_endpoint("primary"), self._create_endpoint("backup")],
+                                policy=EndpointRouter.POLICY_HEDGE, hedge_delay_ms=500)
+        text, _ = collect(router)
+        self.assertEqual(text, "primary")
+        self.assertEqual(router.hedge_count, 0)
+        self.assertEqual(self.servers[1].request_count, 0)
+
+    def test_rank_by_ttft_histogram(self):
+        slow = self._create_endpoint("slow", first_token_delay=0.2)
+        fast = self._create_endpoint("fast")
+        router = EndpointRouter([slow, fast], min_samples=2)
+        for _ in range(2):
+            slow.histogram.record(600)
+            fast.histogram.record(80)
+        self.assertEqual(router.rank_endpoints()[0].name, "fast")
+        text, _ = collect(router)
+        self.assertEqual(text, "fast")
+
+    def test_rank_after_primary_keeps_losing(self):
+        router = EndpointRouter([self._create_endpoint("primary", first_token_delay=1.0),
+                                 self._create_endpoint("backup", first_token_delay=0.05)],
+                                policy=EndpointRouter.POLICY_HEDGE, hedge_delay_ms=200, min_samples=2)
+        for _ in range(2):
+            text, _ = collect(router)
+            self.assertEqual(text, "backup")
+        self.assertEqual(router.endpoints[0].censored_count, 2)
+        self.assertEqual(router.rank_endpoints()[0].name, "backup")
+        text, ttft = collect(router)
+        self.assertEqual(text, "backup")
+        self.assertLess(ttft, 0.2)
+        self.assertEqual(router.hedge_count, 2)
+
+    def test_handler_closes_turn_when_all_endpoints_fail(self):
+        handler = HandlerLLM()
+        handler.endpoint_router = EndpointRouter([self._create_endpoint("primary", first_token_delay=2.0),
+                                                  self._create_endpoint("backup", first_token_delay=2.0)],
+                                                 first_token_timeout=0.2)
+        context = LLMContext("session")
+        context.handler_config = LLMConfig()
+        context.is_first_interaction = False
+        context.system_prompt = {"role": "system", "content": "stub"}
+        context.history = ChatHistory(history_length=20, max_history_tokens=4096, model_name="stub")
+
+        input_definition = DataBundleDefinition()
+        input_definition.add_entry(DataBundleEntry.create_text_entry("human_text"))
+        input_bundle = DataBundle(input_definition)
+        input_bundle.set_main_data("你好")
+        input_bundle.add_meta("human_text_end", True)
+        input_bundle.add_meta("speech_id", "speech-1")
+        output_definition = DataBundleDefinition()
+        output_definition.add_entry(DataBundleEntry.create_text_entry("avatar_text"))
+        outputs = list(handler.handle(
+            context, ChatData(type=ChatDataType.HUMAN_TEXT, data=input_bundle),
+            {ChatDataType.AVATAR_TEXT: HandlerDataInfo(type=ChatDataType.AVATAR_TEXT,
+                                                       definition=output_definition)}))
+        # 端点全部超时：先返回错误文本，再以 avatar_text_end 结束本轮
+        self.assertEqual(len(outputs), 2)
+        self.assertIn("no first token", outputs[0].get_main_data())
+        self.assertTrue(outputs[-1].get_meta("avatar_text_end"))
+        self.assertEqual(outputs[-1].get_meta("speech_id"), "speech-1")
+
+    def test_histogram_percentile(self):
+        histogram = TTFTHistogram()
+        self.assertIsNone(histogram.percentile(0.5))
+        for ttft in [80, 90, 120, 450, 2500]:
+            histogram.record(ttft)
+        self.assertEqual(histogram.percentile(0.5), 150)
+        self.assertEqual(histogram.percentile(0.99), 3000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import multiprocessing
+import os
+import queue
+import resource
+import sys
+import time
+import unittest
+import uuid
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "..", "src"))
+
+from handlers.tts.cosyvoice.tts_task_router import TTSTaskRouter  # noqa: E402
+
+
+SENTENCES_PER_PROCESS = 20
+CHUNKS_PER_SENTENCE = 5
+# 24kHz 下 200ms 的音频块
+CHUNK_SAMPLES = 4800
+
+
+def _produce(output_queue, session_id, keys):
+    # 模拟合成进程：每句输出若干音频块和一个结束标记
+    chunk = np.zeros((1, CHUNK_SAMPLES), dtype=np.float32)
+    for key in keys:
+        for _ in range(CHUNKS_PER_SENTENCE):
+            output_queue.put({'key': key, 'tts_speech': chunk, 'session_id': session_id, 'send_time': time.time()})
+            time.sleep(0.002)
+        output_queue.put({'key': key, 'tts_speech': None, 'session_id': session_id, 'send_time': time.time()})
+
+
+class _Task:
+    def __init__(self):
+        self.result_queue = queue.Queue()
+
+
+def _run(context, output_queue, process_num):
+    router = TTSTaskRouter()
+    keys_per_process = []
+    for process_index in range(process_num):
+        keys = [uuid.uuid4() for _ in range(SENTENCES_PER_PROCESS)]
+        for key in keys:
+            router.register(f"session_{process_index}", key, _Task())
+        keys_per_process.append(keys)
+    cpu_before = time.process_time()
+    processes = [context.Process(target=_produce, args=(output_queue, f"session_{index}", keys))
+                 for index, keys in enumerate(keys_per_process)]
+    for process in processes:
+        process.start()
+    remaining = process_num * SENTENCES_PER_PROCESS
+    while remaining > 0:
+        output = output_queue.get(timeout=10)
+        task = router.dispatch(output)
+        if output['tts_speech'] is None:
+            remaining -= 1
+        else:
+            task.result_queue.put(output['tts_speech'])
+    for process in processes:
+        process.join()
+    consumer_cpu = time.process_time() - cpu_before
+    return router.hop_stats.summary(), consumer_cpu
+
+
+def _children_cpu() -> float:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class TestTTSOutputIPC(unittest.TestCase):
+    def setUp(self):
+        method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+        self.context = multiprocessing.get_context(method)
+
+    def test_direct_queue_vs_manager_queue(self):
+        results = {}
+        for process_num in (1, 2, 4):
+            # 子进程的 CPU 在进程退出后才计入 RUSAGE_CHILDREN，包含模拟合成进程和 Manager 服务进程
+            children_before = _children_cpu()
+            direct_stats, direct_cpu = _run(self.context, self.context.Queue(), process_num)
+            direct_children_cpu = _children_cpu() - children_before
+
+            children_before = _children_cpu()
+            manager = self.context.Manager()
+            manager_stats, manager_cpu = _run(self.context, manager.Queue(), process_num)
+            manager.shutdown()
+            manager_children_cpu = _children_cpu() - children_before
+
+            results[process_num] = (direct_stats, manager_stats)
+            print(f"process_num {process_num}: direct hop {direct_stats}, cpu consumer {direct_cpu * 1e3:.1f} ms "
+                  f"children {direct_children_cpu * 1e3:.1f} ms; manager hop {manager_stats}, "
+                  f"cpu consumer {manager_cpu * 1e3:.1f} ms children {manager_children_cpu * 1e3:.1f} ms")
+            expected = process_num * SENTENCES_PER_PROCESS * (CHUNKS_PER_SENTENCE + 1)
+            self.assertEqual(direct_stats["count"], expected)
+            self.assertEqual(manager_stats["count"], expected)
+        # 直接通信少了一次经 Manager 服务进程的转发
+        for direct_stats, manager_stats in results.values():
+            self.assertLess(direct_stats["p50_ms"], manager_stats["p50_ms"] * 1.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import tracemalloc
+import unittest
+
+import numpy as np
+from loguru import logger
+
+from chat_engine.data_models.runtime_data.data_bundle import DataBundle, DataBundleDefinition, DataBundleEntry
+from engine_utils.audio_format import to_float32, to_int16
+from handlers.avatar.liteavatar.media.speech_audio_processor import SpeechAudioProcessor
+from handlers.avatar.liteavatar.model.audio_input import SpeechAudio
+
+
+def _definition(dtype: str) -> DataBundleDefinition:
+    definition = DataBundleDefinition()
+    definition.add_entry(DataBundleEntry.create_audio_entry("avatar_audio", 1, 24000, dtype=dtype))
+    return definition
+
+
+class TestAudioFormat(unittest.TestCase):
+    def test_conversion_without_copy(self):
+        audio = np.linspace(-1, 1, 480, dtype=np.float32)
+        self.assertIs(to_float32(audio), audio)
+        pcm = to_int16(audio)
+        self.assertIs(to_int16(pcm), pcm)
+        self.assertEqual(pcm.dtype, np.int16)
+        self.assertEqual(pcm[0], -32767)
+        self.assertEqual(pcm[-1], 32767)
+        np.testing.assert_allclose(to_float32(pcm.tobytes()), audio, atol=1 / 32767)
+        # 超出范围的浮点值截断而不是溢出
+        self.assertEqual(to_int16(np.array([1.5, -1.5], dtype=np.float32)).tolist(), [32767, -32768])
+
+    def test_bundle_converts_once(self):
+        float_bundle = DataBundle(_definition("float32"))
+        audio = np.zeros((1, 480), dtype=np.float32)
+        float_bundle.set_main_data(audio)
+        self.assertIs(float_bundle.get_main_data(), audio)
+        float_bundle.set_main_data(np.full((1, 480), 16384, dtype=np.int16))
+        self.assertEqual(float_bundle.get_main_data().dtype, np.float32)
+        self.assertAlmostEqual(float(float_bundle.get_main_data()[0, 0]), 0.5, places=3)
+
+        int16_bundle = DataBundle(_definition("int16"))
+        pcm = np.frombuffer(bytes(960), dtype=np.int16).reshape(1, -1)
+        int16_bundle.set_main_data(pcm)
+        self.assertIs(int16_bundle.get_main_data(), pcm)
+
+    def test_allocation_per_audio_second(self):
+        # TTS 输出 -> LiteAvatar 输入转换 -> 切片与重采样 -> 输出 int16 视图，统计每秒音频的临时内存分配
+        seconds = 10
+        logger.disable("handlers.avatar.liteavatar")
+        self.addCleanup(logger.enable, "handlers.avatar.liteavatar")
+        pcm = (np.sin(np.arange(24000 * seconds) * 0.05) * 8000).astype(np.int16).tobytes()
+        chunks = [pcm[i:i + 24000] for i in range(0, len(pcm), 24000)]
+        processor = SpeechAudioProcessor(24000, 16000, 1)
+        tts_definition, output_definition = _definition("float32"), _definition("int16")
+        allocated = 0
+        tracemalloc.start()
+        try:
+            for i, chunk in enumerate(chunks):
+                tracemalloc.reset_peak()
+                current = tracemalloc.get_traced_memory()[0]
+                tts_output = DataBundle(tts_definition)
+                tts_output.set_main_data(to_float32(chunk)[np.newaxis, ...])
+                speech_audio = SpeechAudio(speech_id="speech", end_of_speech=i == len(chunks) - 1,
+                                           audio_data=to_int16(tts_output.get_main_data()).tobytes(),
+                                           sample_rate=24000)
+                for audio_slice in processor.get_speech_audio_slice(speech_audio):
+                    avatar_output = DataBundle(output_definition)
+                    avatar_output.set_main_data(
+                        np.frombuffer(audio_slice.play_audio_data, dtype=np.int16).reshape(1, -1))
+                allocated += tracemalloc.get_traced_memory()[1] - current
+        finally:
+            tracemalloc.stop()
+        per_second = allocated / seconds / 1024
+        print(f"transient allocation {per_second:.0f} KiB per audio second")
+        self.assertLess(per_second, 300)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import time
+import unittest
+
+import librosa
+import numpy as np
+
+from engine_utils.audio_resampler import StreamingResampler, resample
+
+
+RATE_PAIRS = [(22050, 24000), (24000, 16000), (16000, 24000), (48000, 16000), (44100, 16000)]
+
+
+def _test_signal(sample_rate: int, target_rate: int, seconds: float = 2.0) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    t = np.arange(int(sample_rate * seconds)) / sample_rate
+    frequencies = [220, 1000, 3100, min(sample_rate, target_rate) * 0.4]
+    return sum(0.2 * np.sin(2 * np.pi * f * t + rng.random() * 6) for f in frequencies).astype(np.float32)
+
+
+def _snr(reference: np.ndarray, audio: np.ndarray) -> float:
+    length = min(len(reference), len(audio))
+    # 两端滤波器边界处理不同，不参与比较
+    reference, audio = reference[200:length - 200], audio[200:length - 200]
+    return 10 * np.log10(np.sum(reference ** 2) / np.sum((reference - audio) ** 2))
+
+
+def _stream(resampler: StreamingResampler, audio: np.ndarray, chunk_sizes) -> np.ndarray:
+    outputs = []
+    start = 0
+    for size in chunk_sizes:
+        outputs.append(resampler.process(audio[start:start + size]))
+        start += size
+    outputs.append(resampler.process(audio[start:]))
+    outputs.append(resampler.flush())
+    return np.concatenate(outputs)
+
+
+def _best_time(run, repeat: int = 3) -> float:
+    # 先运行一次预热滤波器缓存，取多次中最快的一次
+    run()
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+class TestAudioResampler(unittest.TestCase):
+    def test_snr_against_librosa(self):
+        for orig_sr, target_sr in RATE_PAIRS:
+            audio = _test_signal(orig_sr, target_sr)
+            output = resample(audio, orig_sr, target_sr)
+            self.assertEqual(len(output), int(np.ceil(len(audio) * target_sr / orig_sr)))
+            snr = _snr(librosa.resample(audio, orig_sr=orig_sr, target_sr=target_sr), output)
+            print(f"{orig_sr} -> {target_sr} snr against librosa {snr:.1f} dB")
+            self.assertGreater(snr, 50)
+
+    def test_chunked_equals_whole(self):
+        rng = np.random.default_rng(1)
+        for orig_sr, target_sr in RATE_PAIRS:
+            audio = _test_signal(orig_sr, target_sr)
+            chunk_sizes = rng.integers(1, 5000, size=20)
+            chunked = _stream(StreamingResampler(orig_sr, target_sr), audio, chunk_sizes)
+            np.testing.assert_allclose(chunked, resample(audio, orig_sr, target_sr), atol=1e-6)
+
+    def test_fixed_latency_chunk_length(self):
+        resampler = StreamingResampler(24000, 16000, trim_delay=False)
+        audio = _test_signal(24000, 16000, seconds=3)
+        lengths = [len(resampler.process(audio[start:start + 24000])) for start in range(0, len(audio), 24000)]
+        self.assertEqual(lengths, [16000] * 3)
+        self.assertEqual(len(resampler.flush()), resampler.delay)
+
+    def test_throughput(self):
+        # 22050 -> 24000 是 CosyVoice HTTP 合成的调用点，160 个相位
+        for orig_sr, target_sr, chunk_size in ((22050, 24000, 8000), (24000, 16000, 24000), (24000, 16000, 960)):
+            audio = np.random.default_rng(0).standard_normal(orig_sr * 10).astype(np.float32) * 0.1
+
+            def run_librosa():
+                for offset in range(0, len(audio), chunk_size):
+                    librosa.resample(audio[offset:offset + chunk_size], orig_sr=orig_sr, target_sr=target_sr)
+
+            def run_stream():
+                resampler = StreamingResampler(orig_sr, target_sr)
+                for offset in range(0, len(audio), chunk_size):
+                    resampler.process(audio[offset:offset + chunk_size])
+                resampler.flush()
+
+            librosa_speed = 10 / _best_time(run_librosa)
+            stream_speed = 10 / _best_time(run_stream)
+            print(f"{orig_sr} -> {target_sr} chunk {chunk_size}: librosa per chunk x{librosa_speed:.0f} realtime, "
+                  f"streaming x{stream_speed:.0f} realtime")
+            self.assertGreater(stream_speed, 50)
+            if (orig_sr, target_sr) == (22050, 24000):
+                self.assertGreater(stream_speed, librosa_speed)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import io
+import unittest
+
+import av
+import numpy as np
+
+from engine_utils.audio_stream_decoder import StreamingAudioDecoder
+
+
+def _encode_mp3(samples: np.ndarray, sample_rate: int) -> bytes:
+    buffer = io.BytesIO()
+    container = av.open(buffer, "w", format="mp3")
+    stream = container.add_stream("mp3", rate=sample_rate)
+    stream.layout = "mono"
+    frame = av.AudioFrame.from_ndarray(samples[np.newaxis, :], format="flt", layout="mono")
+    frame.sample_rate = sample_rate
+    for packet in stream.encode(frame):
+        container.mux(packet)
+    for packet in stream.encode(None):
+        container.mux(packet)
+    container.close()
+    return buffer.getvalue()
+
+
+class TestStreamingAudioDecoder(unittest.TestCase):
+    def setUp(self):
+        time_axis = np.arange(24000 * 2) / 24000
+        self.samples = (0.3 * np.sin(2 * np.pi * 440 * time_axis)).astype(np.float32)
+        self.data = _encode_mp3(self.samples, 24000)
+
+    def test_decode_in_fixed_chunks_as_data_arrives(self):
+        decoder = StreamingAudioDecoder(24000, chunk_ms=160)
+        chunks = []
+        first_chunk_offset = None
+        for offset in range(0, len(self.data), 1024):
+            new_chunks = decoder.feed(self.data[offset:offset + 1024])
+            if new_chunks and first_chunk_offset is None:
+                first_chunk_offset = offset + 1024
+            chunks.extend(new_chunks)
+        chunks.extend(decoder.flush())
+        # 第一块在收到全部数据之前就已输出
+        self.assertLess(first_chunk_offset, len(self.data) // 4)
+        self.assertTrue(all(chunk.shape == (1, 3840) and chunk.dtype == np.float32 for chunk in chunks[:-1]))
+        audio = np.concatenate(chunks, axis=-1)
+        # MP3 编码会在首尾补少量样本
+        self.assertAlmostEqual(audio.shape[-1], len(self.samples), delta=2400)
+        self.assertAlmostEqual(float(np.abs(audio).max()), 0.3, delta=0.05)
+
+    def test_resample_to_target_rate(self):
+        decoder = StreamingAudioDecoder(16000, chunk_ms=100)
+        chunks = decoder.feed(self.data) + decoder.flush()
+        self.assertEqual(chunks[0].shape, (1, 1600))
+        self.assertAlmostEqual(sum(chunk.shape[-1] for chunk in chunks), 32000, delta=1600)
+
+
+if __name__ == '__main__':
+    unittest.main()
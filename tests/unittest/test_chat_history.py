@@ -0,0 +1,40 @@
+import unittest
+
+from handlers.llm.openai_compatible.chat_history_manager import ChatHistory, HistoryMessage, estimate_tokens
+
+
+class TestChatHistory(unittest.TestCase):
+    def test_trim_by_length(self):
+        history = ChatHistory(history_length=3)
+        for i in range(5):
+            history.add_message(HistoryMessage(role="human", content=f"message {i}"))
+        messages = history.generate_next_messages("next", [])
+        self.assertEqual([m["content"] for m in messages], ["message 3", "message 4", "next"])
+
+    def test_trim_by_token_budget(self):
+        history = ChatHistory(history_length=100, max_history_tokens=40, model_name="qwen-plus")
+        for i in range(10):
+            history.add_message(HistoryMessage(role="human", content="你好" * 10))
+        self.assertLessEqual(history.history_tokens, 40)
+        self.assertEqual(history.history_tokens,
+                         sum(history.estimate_prompt_tokens([m]) for m in history.get_history_messages()))
+
+    def test_messages_are_prefiltered(self):
+        history = ChatHistory(history_length=10)
+        history.add_message(HistoryMessage(role="human", content="你好😀"))
+        history.add_message(HistoryMessage(role="avatar", content="<b>hi</b>"))
+        messages = history.generate_next_messages("再见#", [])
+        self.assertEqual(messages, [
+            {"role": "user", "content": "你好"},
+            {"role": "assistant", "content": "bhib"},
+            {"role": "user", "content": "再见"},
+        ])
+        self.assertGreater(history.last_prompt_tokens, history.history_tokens)
+
+    def test_estimate_tokens(self):
+        self.assertEqual(estimate_tokens(""), 0)
+        self.assertGreater(estimate_tokens("你好世界", "gpt-4o"), estimate_tokens("你好世界", "qwen-plus"))
+
+
+if __name__ == '__main__':
+    unittest.main()
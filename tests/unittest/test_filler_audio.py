@@ -0,0 +1,121 @@
+import threading
+import time
+import unittest
+
+import numpy as np
+
+from engine_utils.filler_audio import FillerAudioLibrary, FillerAudioPlayer
+
+
+SAMPLE_RATE = 16000
+
+
+class _Recorder:
+    def __init__(self):
+        self.outputs = []
+        self.lock = threading.Lock()
+
+    def emit(self, audio, speech_id, speech_end):
+        with self.lock:
+            self.outputs.append((time.monotonic(), audio, speech_id, speech_end))
+
+    def samples(self) -> int:
+        with self.lock:
+            return sum(audio.shape[-1] for _, audio, _, _ in self.outputs)
+
+
+def _library(seconds: float = 1.0) -> FillerAudioLibrary:
+    library = FillerAudioLibrary(["嗯，"], SAMPLE_RATE)
+    library.prepare(lambda text: np.full(int(SAMPLE_RATE * seconds), 0.5, dtype=np.float32))
+    return library
+
+
+class TestFillerAudio(unittest.TestCase):
+    def setUp(self):
+        self.recorder = _Recorder()
+
+    def _player(self, **kwargs) -> FillerAudioPlayer:
+        player = FillerAudioPlayer(_library(), self.recorder.emit, **kwargs)
+        self.addCleanup(player.close)
+        return player
+
+    def test_filler_after_delay_paced(self):
+        player = self._player(delay_ms=100, chunk_ms=100)
+        start = time.monotonic()
+        player.start_turn("s1")
+        time.sleep(0.05)
+        self.assertEqual(self.recorder.samples(), 0)
+        time.sleep(0.35)
+        # 约 300ms 内按实时速度输出，最多领先一个分块
+        samples = self.recorder.samples()
+        elapsed = time.monotonic() - start - 0.1
+        self.assertGreater(samples, 0)
+        self.assertLessEqual(samples, int((elapsed + 0.1) * SAMPLE_RATE) + 1)
+        self.assertTrue(all(speech_id == "s1" and not end for _, _, speech_id, end in self.recorder.outputs))
+
+    def test_no_filler_when_audio_arrives_first(self):
+        player = self._player(delay_ms=200)
+        player.start_turn("s1")
+        audio = np.ones((1, 1600), dtype=np.float32)
+        self.assertIs(player.on_output("s1", audio, False), audio)
+        time.sleep(0.3)
+        self.assertEqual(self.recorder.samples(), 0)
+        self.assertEqual(player.get_stats()["filler_turns"], 0)
+
+    def test_crossfade_and_stop(self):
+        player = self._player(delay_ms=0, fade_ms=50)
+        player.start_turn("s1")
+        time.sleep(0.15)
+        audio = np.zeros((1, 1600), dtype=np.float32)
+        mixed = player.on_output("s1", audio, False)
+        fade_samples = int(SAMPLE_RATE * 0.05)
+        # 开头为填充语音，逐渐淡出为真实音频
+        self.assertAlmostEqual(float(mixed[0, 0]), 0.5, places=3)
+        self.assertTrue(np.all(np.diff(mixed[0, :fade_samples]) <= 0))
+        self.assertTrue(np.all(mixed[0, fade_samples:] == 0))
+        emitted = self.recorder.samples()
+        time.sleep(0.2)
+        self.assertEqual(self.recorder.samples(), emitted)
+        self.assertEqual(player.get_stats()["filler_turns"], 1)
+
+    def test_skip_while_previous_speech_active(self):
+        player = self._player(delay_ms=0)
+        player.on_output("s0", np.zeros((1, 160), dtype=np.float32), False)
+        player.start_turn("s1")
+        time.sleep(0.1)
+        self.assertEqual(self.recorder.samples(), 0)
+        player.on_output("s0", np.zeros((1, 160), dtype=np.float32), True)
+        player.start_turn("s2")
+        time.sleep(0.1)
+        self.assertGreater(self.recorder.samples(), 0)
+
+    def test_end_marker_on_timeout(self):
+        player = FillerAudioPlayer(_library(seconds=0.1), self.recorder.emit, delay_ms=0, max_wait_ms=300)
+        self.addCleanup(player.close)
+        player.start_turn("s1")
+        time.sleep(0.5)
+        self.assertTrue(self.recorder.outputs[-1][3])
+        self.assertEqual(player.get_stats()["timeouts"], 1)
+
+    def test_emit_not_holding_lock(self):
+        # 下游在其他线程处理填充音频并回调 on_output，emit 持锁时这里会超时
+        results = []
+
+        def emit(audio, speech_id, speech_end):
+            thread = threading.Thread(target=lambda: player.on_output("s1", np.zeros((1, 160), dtype=np.float32), False))
+            thread.start()
+            thread.join(1)
+            results.append(not thread.is_alive())
+
+        player = FillerAudioPlayer(_library(), emit, delay_ms=50)
+        self.addCleanup(player.close)
+        player.start_turn("s1")
+        deadline = time.monotonic() + 2
+        while len(results) == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(results, [True])
+        self.assertEqual(player.get_stats()["filler_turns"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
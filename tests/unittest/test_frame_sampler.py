@@ -0,0 +1,63 @@
+import unittest
+
+import numpy as np
+
+from engine_utils.frame_sampler import FrameSampler
+
+
+def _frame(value: int, height=720, width=1280):
+    frame = np.full((1, height, width, 3), value, dtype=np.uint8)
+    frame[0, :height // 2, :width // 2, 0] = 255 - value
+    return frame
+
+
+class TestFrameSampler(unittest.TestCase):
+    def test_static_frames_are_skipped(self):
+        sampler = FrameSampler(min_interval_ms=0)
+        self.assertIsNotNone(sampler.push(_frame(10), 0))
+        for timestamp in range(1, 10):
+            self.assertIsNone(sampler.push(_frame(10), timestamp))
+        self.assertIsNotNone(sampler.push(_frame(120), 10))
+        self.assertEqual(sampler.accepted_count, 2)
+        self.assertEqual(sampler.pushed_count, 11)
+
+    def test_downsize_and_cached_encoding(self):
+        sampler = FrameSampler(max_side=320, min_interval_ms=0)
+        sampled = sampler.push(_frame(10), 0)
+        self.assertEqual(sampled.size, (320, 180))
+        encoded = sampled.get_base64()
+        self.assertIs(sampled.get_base64(), encoded)
+        self.assertTrue(sampled.get_data_url().startswith("data:image/jpeg;base64,"))
+
+    def test_select_keeps_latest_and_most_different(self):
+        sampler = FrameSampler(min_interval_ms=0, pre_encode=False)
+        for timestamp, value in enumerate([0, 30, 230, 200, 150]):
+            sampler.push(_frame(value), timestamp)
+        self.assertEqual(sampler.count_between(1, 5), 4)
+        frames = sampler.select(2, start_time=1, end_time=5)
+        self.assertEqual([frame.timestamp for frame in frames], [2, 4])
+        self.assertEqual(sampler.select(2, start_time=1, end_time=5), [])
+        self.assertEqual(sampler.latest.timestamp, 4)
+
+    def test_static_scene_falls_back_to_latest(self):
+        sampler = FrameSampler(min_interval_ms=0, pre_encode=False)
+        for timestamp in range(10):
+            sampler.push(_frame(10), timestamp)
+        first = sampler.select_or_latest(1, start_time=0, end_time=5)
+        self.assertEqual([frame.timestamp for frame in first], [0])
+        self.assertEqual(sampler.select(1, start_time=5, end_time=10), [])
+        later = sampler.select_or_latest(1, start_time=5, end_time=10)
+        self.assertEqual([frame.timestamp for frame in later], [0])
+
+    def test_turn_stats(self):
+        sampler = FrameSampler(min_interval_ms=0)
+        sampled = sampler.push(_frame(10), 0)
+        sampler.record_sent(sampled, sampled.get_base64())
+        stats = sampler.take_turn_stats()
+        self.assertEqual(stats["frames"], 1)
+        self.assertGreater(stats["bytes"], 0)
+        self.assertEqual(sampler.take_turn_stats()["frames"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,30 @@
+import unittest
+
+from handlers.avatar.liteavatar.media.frame_time_stats import FrameTimeStats
+
+
+class TestFrameTimeStats(unittest.TestCase):
+    def test_summary(self):
+        stats = FrameTimeStats(fps=25)
+        self.assertEqual(stats.summary(), {"count": 0})
+        now = 100.0
+        for i in range(100):
+            stats.record(now)
+            # 每 10 帧有一帧间隔翻倍
+            now += 0.08 if i % 10 == 9 else 0.04
+        summary = stats.summary()
+        self.assertEqual(summary["count"], 99)
+        self.assertAlmostEqual(summary["max_ms"], 80, places=3)
+        self.assertAlmostEqual(summary["p99_ms"], 80, places=3)
+        self.assertAlmostEqual(summary["late_ratio"], 9 / 99, places=4)
+        self.assertGreater(summary["jitter_ms"], 0)
+
+        stats.reset()
+        stats.record(0.0)
+        stats.record(0.04)
+        self.assertEqual(stats.summary()["count"], 1)
+        self.assertEqual(stats.summary()["late_ratio"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
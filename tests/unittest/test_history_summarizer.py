@@ -0,0 +1,69 @@
+import time
+import unittest
+from types import SimpleNamespace
+
+from handlers.llm.openai_compatible.chat_history_manager import ChatHistory, HistoryMessage
+from handlers.llm.openai_compatible.history_summarizer import HistorySummarizer
+
+
+class _FakeCompletions:
+    def __init__(self, summary_text, delay=0.0):
+        self.summary_text = summary_text
+        self.delay = delay
+        self.requests = []
+
+    def create(self, **kwargs):
+        self.requests.append(kwargs)
+        time.sleep(self.delay)
+        message = SimpleNamespace(content=self.summary_text)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def _create_client(completions):
+    return SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+
+class TestHistorySummarizer(unittest.TestCase):
+    def setUp(self):
+        self.history = ChatHistory(history_length=100, model_name="qwen-plus")
+        for i in range(10):
+            self.history.add_message(HistoryMessage(role="human", content="我最近考试压力很大" * 3))
+            self.history.add_message(HistoryMessage(role="avatar", content="听起来你很辛苦" * 3))
+
+    def _wait(self, summarizer):
+        while summarizer.is_running():
+            time.sleep(0.01)
+
+    def test_summary_swapped_in_between_turns(self):
+        completions = _FakeCompletions("用户考试压力大")
+        summarizer = HistorySummarizer(_create_client(completions), "qwen-turbo", trigger_tokens=100,
+                                       keep_recent_messages=4)
+        tokens_before = self.history.history_tokens
+        self.assertTrue(summarizer.maybe_start(self.history))
+        self._wait(summarizer)
+        # 摘要完成前历史不变，直到下一轮开始前调用 apply_pending
+        self.assertEqual(self.history.history_tokens, tokens_before)
+        saved_tokens = summarizer.apply_pending(self.history)
+        self.assertGreater(saved_tokens, 0)
+        self.assertEqual(len(self.history.get_history_messages()), 4)
+        self.assertEqual(self.history.summary_text, "用户考试压力大")
+        self.assertEqual(completions.requests[0]["model"], "qwen-turbo")
+
+    def test_below_budget_not_started(self):
+        summarizer = HistorySummarizer(_create_client(_FakeCompletions("x")), "qwen-turbo", trigger_tokens=100000)
+        self.assertFalse(summarizer.maybe_start(self.history))
+
+    def test_messages_added_during_summary_are_kept(self):
+        summarizer = HistorySummarizer(_create_client(_FakeCompletions("摘要", delay=0.05)), "qwen-turbo",
+                                       trigger_tokens=100, keep_recent_messages=4)
+        summarizer.maybe_start(self.history)
+        self.history.add_message(HistoryMessage(role="human", content="新的消息"))
+        self._wait(summarizer)
+        summarizer.apply_pending(self.history)
+        messages = self.history.get_history_messages()
+        self.assertEqual(len(messages), 5)
+        self.assertEqual(messages[-1]["content"], "新的消息")
+
+
+if __name__ == '__main__':
+    unittest.main()
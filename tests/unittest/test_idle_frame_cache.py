@@ -0,0 +1,57 @@
+import unittest
+
+import numpy as np
+
+from handlers.avatar.liteavatar.algo.base_algo_adapter import BaseAlgoAdapter
+from handlers.avatar.liteavatar.media.idle_frame_cache import IdleFrameCache
+
+
+class _BgAdapter(BaseAlgoAdapter):
+    def __init__(self, bg_count):
+        self.bg_count = bg_count
+        self.rendered = []
+
+    def init(self, init_option):
+        pass
+
+    def audio2signal(self, audio_slice):
+        return []
+
+    def signal2img(self, signal_data, avatar_status):
+        return None, 0
+
+    def mouth2full(self, mouth_image, bg_frame_id):
+        return mouth_image
+
+    def get_idle_signal(self, idle_frame_count):
+        return []
+
+    def get_algo_config(self):
+        return None
+
+    def get_idle_image_count(self):
+        return self.bg_count
+
+    def render_idle_image(self, bg_frame_id):
+        self.rendered.append(bg_frame_id)
+        return np.full((4, 4, 3), bg_frame_id, dtype=np.uint8)
+
+
+class TestIdleFrameCache(unittest.TestCase):
+    def test_build_once_per_background_frame(self):
+        adapter = _BgAdapter(3)
+        cache = IdleFrameCache.build(adapter, lambda image, bg_frame_id: image[:, ::-1] + 1)
+        self.assertEqual(adapter.rendered, [0, 1, 2])
+        self.assertEqual(cache.nbytes, 3 * 4 * 4 * 3)
+        frame = cache.get(2)
+        self.assertIs(cache.get(2), frame)
+        self.assertTrue(np.all(frame == 3))
+        self.assertFalse(frame.flags.writeable)
+        self.assertIsNone(cache.get(3))
+
+    def test_adapter_without_idle_images(self):
+        self.assertIsNone(IdleFrameCache.build(_BgAdapter(0), lambda image, bg_frame_id: image))
+
+
+if __name__ == '__main__':
+    unittest.main()
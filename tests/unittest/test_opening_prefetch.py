@@ -0,0 +1,44 @@
+import threading
+import unittest
+
+from handlers.llm.openai_compatible.opening_prefetch import OpeningPrefetch
+
+
+def _build_messages():
+    return [{"role": "system", "content": "模板A"}, {"role": "user", "content": "你好"}]
+
+
+class TestOpeningPrefetch(unittest.TestCase):
+    def test_ready_after_completion(self):
+        ready = threading.Event()
+        prefetch = OpeningPrefetch(_build_messages, lambda messages: " 你好，最近睡得怎么样？ ",
+                                   on_ready=lambda _: ready.set())
+        self.assertTrue(prefetch.wait(1))
+        self.assertEqual(prefetch.text, "你好，最近睡得怎么样？")
+        self.assertEqual(prefetch.system_prompt["content"], "模板A")
+        self.assertTrue(ready.wait(1))
+
+    def test_not_ready_without_wait(self):
+        gate = threading.Event()
+
+        def _slow_completion(messages):
+            gate.wait(1)
+            return "你好"
+        prefetch = OpeningPrefetch(_build_messages, _slow_completion)
+        self.assertFalse(prefetch.wait(0))
+        prefetch.cancel()
+        gate.set()
+        self.assertFalse(prefetch.wait(1))
+
+    def test_failure_falls_back(self):
+        def _failing_completion(messages):
+            raise RuntimeError("llm failed")
+        called = threading.Event()
+        prefetch = OpeningPrefetch(_build_messages, _failing_completion, on_ready=lambda _: called.set())
+        self.assertFalse(prefetch.wait(1))
+        self.assertIsInstance(prefetch.error, RuntimeError)
+        self.assertFalse(called.is_set())
+
+
+if __name__ == '__main__':
+    unittest.main()
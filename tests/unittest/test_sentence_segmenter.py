@@ -0,0 +1,78 @@
+import re
+import time
+import unittest
+
+from engine_utils.sentence_segmenter import StreamingSentenceSegmenter
+
+
+def _stream(segmenter, text, step=1):
+    segments = []
+    for index in range(0, len(text), step):
+        segments.extend(segmenter.push(text[index:index + step]))
+    remaining = segmenter.flush()
+    if remaining is not None:
+        segments.append(remaining)
+    return segments
+
+
+class TestStreamingSentenceSegmenter(unittest.TestCase):
+    def test_short_first_clause_then_longer(self):
+        text = "好的，我明白了。你最近工作压力比较大，睡眠也不太好，这种情况持续多久了？我们可以一起想想办法。"
+        segments = _stream(StreamingSentenceSegmenter(first_min_chars=2, min_chars=8), text)
+        self.assertEqual("".join(segments), text)
+        self.assertEqual(segments[0], "好的，")
+        self.assertTrue(all(len(segment) >= 8 for segment in segments[1:-1]))
+
+    def test_streaming_matches_whole_text(self):
+        text = "Hello, Mr. Smith. The price is 3.14 dollars, or 1,000 cents! See example.com now."
+        whole = StreamingSentenceSegmenter().split(text)
+        for step in (1, 2, 5):
+            self.assertEqual(_stream(StreamingSentenceSegmenter(), text, step), whole)
+
+    def test_number_and_abbreviation_protection(self):
+        text = "Dr. Li said the rate is 3.5 percent, about 1,200 people. Really?"
+        segments = StreamingSentenceSegmenter(first_min_chars=2, first_max_chars=60, min_chars=2, growth=1.0).split(text)
+        self.assertEqual(segments, ["Dr. Li said the rate is 3.5 percent,", " about 1,200 people.", " Really?"])
+
+    def test_force_break_on_max_chars(self):
+        segmenter = StreamingSentenceSegmenter(first_max_chars=10, max_chars=20)
+        segments = segmenter.split("一" * 45)
+        self.assertEqual([len(segment) for segment in segments], [10, 20, 15])
+        segments = StreamingSentenceSegmenter(first_max_chars=12).split("hello world again and again")
+        self.assertEqual(segments[0], "hello world ")
+
+    def test_wait_for_lookahead(self):
+        segmenter = StreamingSentenceSegmenter(first_min_chars=2)
+        self.assertEqual(segmenter.push("It costs 3."), [])
+        self.assertEqual(segmenter.push("5 yuan. OK"), ["It costs 3.5 yuan."])
+        self.assertEqual(segmenter.flush(), " OK")
+
+    def test_first_segment_earlier_than_regex_split(self):
+        # 逐字流入时，统计第一段可以送去合成时已经到达的字符数，与原先按标点 re.split 的方式对比
+        text = "当然可以我来为你详细介绍一下这个产品的主要功能和使用方法。首先，它支持语音输入。" * 20
+        buffer, regex_first = '', None
+        regex_start = time.perf_counter()
+        for index, char in enumerate(text):
+            buffer += char
+            sentences = re.split(r'(?<=[,.~!?，。！？])', buffer)
+            if len(sentences) > 1:
+                if regex_first is None:
+                    regex_first = index + 1
+                buffer = sentences[-1]
+        regex_time = time.perf_counter() - regex_start
+
+        segmenter, segment_first = StreamingSentenceSegmenter(), None
+        segment_start = time.perf_counter()
+        for index, char in enumerate(text):
+            if segmenter.push(char) and segment_first is None:
+                segment_first = index + 1
+        segmenter.flush()
+        segment_time = time.perf_counter() - segment_start
+        print(f"first segment after {segment_first} chars (regex {regex_first}), "
+              f"cpu {segment_time * 1e3:.2f} ms (regex {regex_time * 1e3:.2f} ms)")
+        self.assertEqual(segment_first, 20)
+        self.assertEqual(regex_first, 29)
+
+
+if __name__ == '__main__':
+    unittest.main()
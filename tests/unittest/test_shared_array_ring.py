@@ -0,0 +1,97 @@
+import gc
+import multiprocessing
+import os
+import time
+import unittest
+import uuid
+
+import numpy as np
+
+from engine_utils.shared_array_ring import SharedArrayReader, SharedArrayRef, SharedArrayRing
+
+
+class TestSharedArrayRing(unittest.TestCase):
+    def setUp(self):
+        self.ring = SharedArrayRing(2)
+        self.reader = SharedArrayReader()
+        self.addCleanup(self.ring.close)
+        self.addCleanup(self.reader.close)
+
+    def test_slot_released_after_views_collected(self):
+        frame = np.arange(24, dtype=np.uint8).reshape(2, 4, 3)
+        first, second = self.ring.pack(frame), self.ring.pack(frame + 1)
+        self.assertIsInstance(first, SharedArrayRef)
+        self.assertIsInstance(second, SharedArrayRef)
+        # 两个槽位都在使用中，退回为数组本身
+        self.assertIs(self.ring.pack(frame), frame)
+
+        view = self.reader.unpack(first)
+        np.testing.assert_array_equal(view, frame)
+        derived = view[np.newaxis, ...][:, 1:]
+        del view
+        gc.collect()
+        self.assertIs(self.ring.pack(frame), frame)
+        del derived
+        self.assertIsInstance(self.ring.pack(frame + 2), SharedArrayRef)
+        self.assertEqual(self.ring.inline_count, 2)
+
+        # 没有交给消费者的引用由生产者直接释放
+        self.ring.release(second)
+        self.assertIsInstance(self.ring.pack(frame), SharedArrayRef)
+
+    def test_inline_when_too_large_or_disabled(self):
+        self.ring.pack(np.zeros(16, dtype=np.int16))
+        large = np.zeros(64, dtype=np.int16)
+        self.assertIs(self.ring.pack(large), large)
+        disabled = SharedArrayRing(0)
+        self.assertIs(disabled.pack(large), large)
+        self.assertIs(self.reader.unpack(large), large)
+
+
+def _produce_frames(ring_names, ref_queue):
+    rings = [SharedArrayRing(2, name=name) for name in ring_names]
+    for ring in rings:
+        ref_queue.put(ring.pack(np.ones((4, 4, 3), dtype=np.uint8)))
+    # 与算法进程一样不主动关闭，等待被结束
+    while True:
+        time.sleep(1)
+
+
+def _shm_segments():
+    # 队列与事件使用的 POSIX 信号量也在 /dev/shm 下，只统计共享内存
+    return [name for name in os.listdir("/dev/shm") if not name.startswith("sem.")]
+
+
+@unittest.skipUnless(os.path.isdir("/dev/shm"), "requires /dev/shm")
+class TestSharedArrayRingRespawn(unittest.TestCase):
+    def test_respawn_does_not_leak_segments(self):
+        context = multiprocessing.get_context("spawn")
+        reader = SharedArrayReader()
+        self.addCleanup(reader.close)
+        before = len(_shm_segments())
+        held = None
+        for _ in range(3):
+            ring_names = [f"test_{uuid.uuid4().hex[:12]}_{index}" for index in range(2)]
+            ref_queue = context.Queue()
+            process = context.Process(target=_produce_frames, args=(ring_names, ref_queue))
+            process.start()
+            views = [reader.unpack(ref_queue.get(timeout=30)) for _ in ring_names]
+            held = views[0]
+            del views
+            process.terminate()
+            process.join()
+            # 与 LiteAvatarWorker.destroy 相同：按名称删除，再解除 reader 的映射
+            for name in ring_names:
+                self.assertTrue(SharedArrayRing.unlink(name))
+            reader.close_rings(ring_names)
+            self.assertEqual(len(_shm_segments()), before)
+        # 仍被持有的视图所在的映射在视图回收后解除
+        self.assertEqual(reader.ring_count, 1)
+        np.testing.assert_array_equal(held, 1)
+        del held
+        gc.collect()
+        self.assertEqual(reader.ring_count, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
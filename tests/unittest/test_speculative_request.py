@@ -0,0 +1,54 @@
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+
+from handlers.llm.openai_compatible.speculative_request import SpeculativeRequest, normalize_speculative_text
+
+
+def _chunk(content):
+    return SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+
+
+def _create_stream(tokens, interval=0.0, gate: threading.Event = None):
+    def _stream():
+        for token in tokens:
+            if gate is not None:
+                gate.wait(1)
+            time.sleep(interval)
+            yield _chunk(token)
+    return _stream
+
+
+class TestSpeculativeRequest(unittest.TestCase):
+    def test_normalize(self):
+        self.assertEqual(normalize_speculative_text("你好，今天 天气怎么样？"), normalize_speculative_text("你好今天天气怎么样"))
+        self.assertNotEqual(normalize_speculative_text("你好"), normalize_speculative_text("你好呀"))
+
+    def test_hit_replays_buffered_chunks(self):
+        request = SpeculativeRequest("今天天气怎么样", _create_stream(["今", "天", "晴"]))
+        self.assertTrue(request.matches("今天天气怎么样？"))
+        contents = [chunk.choices[0].delta.content for chunk in request.iter_chunks()]
+        self.assertEqual(contents, ["今", "天", "晴"])
+
+    def test_cancel_counts_wasted_tokens(self):
+        gate = threading.Event()
+        request = SpeculativeRequest("今天", _create_stream(["好的", "我", "想", "想"] * 20, gate=gate))
+        gate.set()
+        time.sleep(0.05)
+        wasted_tokens = request.cancel()
+        self.assertGreater(wasted_tokens, 0)
+        self.assertFalse(request.matches("今天我想出去玩"))
+        # 取消后迭代会很快结束
+        list(request.iter_chunks())
+
+    def test_error_raised_on_hit(self):
+        def _failing_stream():
+            raise RuntimeError("stream failed")
+        request = SpeculativeRequest("你好", _failing_stream)
+        with self.assertRaises(RuntimeError):
+            list(request.iter_chunks())
+
+
+if __name__ == '__main__':
+    unittest.main()
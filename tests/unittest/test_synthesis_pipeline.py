@@ -0,0 +1,113 @@
+import threading
+import time
+import unittest
+
+import numpy as np
+
+from engine_utils.synthesis_pipeline import SentenceSynthesisPipeline
+
+
+SAMPLE_RATE = 1000
+
+
+class TestSentenceSynthesisPipeline(unittest.TestCase):
+    def setUp(self):
+        self.emitted = []
+        self.done = threading.Event()
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+        self.emit_gate = None
+
+    def _emit(self, job, audio):
+        if job.speech_end and self.emit_gate is not None:
+            self.emit_gate.wait(1)
+        self.emitted.append((job.text, job.speech_end))
+        if job.speech_end:
+            self.done.set()
+
+    def _synthesize(self, job):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delays.get(job.text, 0.01))
+        with self.lock:
+            self.active -= 1
+        yield np.zeros((1, self.durations.get(job.text, 10)), dtype=np.float32)
+
+    def _create_pipeline(self, max_parallel):
+        return SentenceSynthesisPipeline(self._synthesize, self._emit, SAMPLE_RATE, max_parallel=max_parallel)
+
+    def test_parallel_synthesis_keeps_order(self):
+        sentences = [f"s{index}" for index in range(6)]
+        # 句子越靠前合成越慢，检验输出顺序不受完成顺序影响
+        self.delays = {text: 0.12 - index * 0.02 for index, text in enumerate(sentences)}
+        self.durations = {}
+        pipeline = self._create_pipeline(max_parallel=3)
+        start_time = time.monotonic()
+        for text in sentences:
+            pipeline.submit(text, "speech")
+        pipeline.submit_audio(np.zeros((1, 10), dtype=np.float32), "speech", speech_end=True)
+        self.assertTrue(self.done.wait(2))
+        elapsed = time.monotonic() - start_time
+        pipeline.shutdown()
+        self.assertEqual(self.emitted, [(text, False) for text in sentences] + [(None, True)])
+        self.assertEqual(self.max_active, 3)
+        # 串行合成需要 0.42 秒
+        self.assertLess(elapsed, 0.35)
+
+    def test_cancel_drops_pending_sentences(self):
+        self.delays = {"slow": 0.2}
+        self.durations = {}
+        pipeline = self._create_pipeline(max_parallel=1)
+        pipeline.submit("slow", "old")
+        pipeline.submit("next", "old")
+        pipeline.submit_audio(np.zeros((1, 10), dtype=np.float32), "old", speech_end=True)
+        time.sleep(0.05)
+        pipeline.cancel()
+        pipeline.submit("new", "new")
+        pipeline.submit_audio(np.zeros((1, 10), dtype=np.float32), "new", speech_end=True)
+        deadline = time.monotonic() + 2
+        while len(self.emitted) < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        pipeline.shutdown()
+        self.assertEqual(self.emitted, [(None, True), ("new", False), (None, True)])
+        self.assertEqual(pipeline.cancel_count, 1)
+
+    def test_late_end_of_cancelled_turn_keeps_new_turn_stats(self):
+        self.delays = {"slow": 0.2, "new": 0.2}
+        self.durations = {}
+        self.emit_gate = threading.Event()
+        pipeline = self._create_pipeline(max_parallel=1)
+        pipeline.submit("slow", "old")
+        pipeline.submit_audio(np.zeros((1, 10), dtype=np.float32), "old", speech_end=True)
+        time.sleep(0.05)
+        pipeline.cancel()
+        # 旧语音的结束标记在新一轮提交之后才输出
+        pipeline.submit("new", "new")
+        self.emit_gate.set()
+        deadline = time.monotonic() + 2
+        while len(self.emitted) < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.02)
+        self.assertEqual(self.emitted, [(None, True)])
+        self.assertIsNotNone(pipeline._turn_stats["submit_time"])
+        self.assertIsNone(pipeline._turn_stats["first_audio_time"])
+        pipeline.shutdown()
+
+    def test_underrun_counted_when_synthesis_is_slower_than_playback(self):
+        # 第一句只有 10 ms 音频，第二句合成需要 100 ms，必然欠载；第三句在第二句的 500 ms 音频播放期间完成
+        self.delays = {"a": 0.0, "b": 0.1, "c": 0.1}
+        self.durations = {"b": 500}
+        pipeline = self._create_pipeline(max_parallel=1)
+        for text in ("a", "b", "c"):
+            pipeline.submit(text, "speech")
+        pipeline.submit_audio(np.zeros((1, 10), dtype=np.float32), "speech", speech_end=True)
+        self.assertTrue(self.done.wait(2))
+        pipeline.shutdown()
+        self.assertEqual(pipeline.underrun_count, 1)
+        self.assertGreater(pipeline.underrun_time, 0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import queue
+import unittest
+
+import numpy as np
+
+from handlers.tts.cosyvoice.synthesis_scheduler import SynthesisRequest, SynthesisScheduler
+
+
+class TestSynthesisScheduler(unittest.TestCase):
+    def setUp(self):
+        self.outputs = []
+        self.started = []
+
+    def _start_stream(self, request):
+        self.started.append(request.key)
+        # 文本长度即分块数，每块 100 个样本
+        for _ in range(len(request.text)):
+            yield np.zeros((1, 100), dtype=np.float32)
+
+    def _emit(self, request, chunk):
+        self.outputs.append((request.key, None if chunk is None else chunk.shape[-1]))
+
+    def _create(self, **kwargs):
+        return SynthesisScheduler(self._start_stream, self._emit, sample_rate=1000, **kwargs)
+
+    def _run(self, scheduler):
+        while scheduler.has_work():
+            scheduler.step()
+
+    def test_new_session_not_starved_by_long_answer(self):
+        scheduler = self._create(max_active=4)
+        for index in range(3):
+            scheduler.submit(SynthesisRequest(key=f"a{index}", session_id="a", text="x" * 20))
+        scheduler.step()
+        scheduler.submit(SynthesisRequest(key="b0", session_id="b", text="xx"))
+        scheduler.step()
+        # b 的第一个分块在第二轮就已输出，a 的后续句子仍在排队
+        self.assertIn(("b0", 100), self.outputs)
+        self.assertEqual(self.started, ["a0", "b0"])
+        self._run(scheduler)
+        self.assertEqual(self.started, ["a0", "b0", "a1", "a2"])
+        for key, length in (("a0", 20), ("a1", 20), ("a2", 20), ("b0", 2)):
+            key_outputs = [size for output_key, size in self.outputs if output_key == key]
+            self.assertEqual(key_outputs, [100] * length + [None])
+
+    def test_round_robin_admission_and_capacity(self):
+        scheduler = self._create(max_active=2)
+        self.assertEqual(scheduler.capacity, 2)
+        scheduler.submit(SynthesisRequest(key="a0", session_id="a", text="xxx"))
+        scheduler.submit(SynthesisRequest(key="a1", session_id="a", text="xxx"))
+        scheduler.submit(SynthesisRequest(key="b0", session_id="b", text="xxx"))
+        scheduler.submit(SynthesisRequest(key="c0", session_id="c", text="xxx"))
+        # 等待中的句子不占合成槽位
+        self.assertEqual(scheduler.capacity, 2)
+        scheduler.step()
+        self.assertEqual(self.started, ["a0", "b0"])
+        self._run(scheduler)
+        self.assertEqual(self.started, ["a0", "b0", "c0", "a1"])
+        self.assertEqual(scheduler.completed_count, 4)
+        self.assertAlmostEqual(scheduler.synthesized_seconds, 1.2)
+        self.assertGreater(scheduler.get_throughput(), 0)
+
+    @staticmethod
+    def _to_request(item):
+        return SynthesisRequest(key=item["key"], session_id=item["session_id"], text=item["text"])
+
+    def test_pull_from_shared_queue_does_not_block_new_session(self):
+        scheduler = self._create(max_active=4)
+        input_queue = queue.Queue()
+        for index in range(4):
+            input_queue.put({"key": f"a{index}", "session_id": "a", "text": "x" * 5})
+        scheduler.pull(input_queue, self._to_request)
+        scheduler.step()
+        input_queue.put({"key": "b0", "session_id": "b", "text": "xx"})
+        rounds = 0
+        while ("b0", 100) not in self.outputs and scheduler.has_work():
+            scheduler.pull(input_queue, self._to_request)
+            scheduler.step()
+            rounds += 1
+        # b 的第一个分块在下一轮输出，不必等 a 积压的句子合成完
+        self.assertEqual(rounds, 1)
+        self.assertNotIn(("a0", None), self.outputs)
+        self.assertTrue(input_queue.empty())
+
+    def test_pull_leaves_backlog_for_other_processes(self):
+        first, second = self._create(max_active=4), self._create(max_active=4)
+        input_queue = queue.Queue()
+        for index in range(8):
+            input_queue.put({"key": f"a{index}", "session_id": "a", "text": "x" * 5})
+        input_queue.put({"key": "b0", "session_id": "b", "text": "xx"})
+        # a 同时只能合成一句，第一个调度器取到能开始的一句和最多 max_active 句等待后停止
+        self.assertEqual(first.pull(input_queue, self._to_request), 5)
+        self.assertEqual(second.pull(input_queue, self._to_request), 4)
+        self.assertTrue(input_queue.empty())
+        first.step()
+        second.step()
+        self.assertEqual(self.started, ["a0", "a5", "b0"])
+
+    def test_failed_stream_still_ends_key(self):
+        def failing_stream(request):
+            yield np.zeros((1, 100), dtype=np.float32)
+            raise RuntimeError("model error")
+
+        scheduler = SynthesisScheduler(failing_stream, self._emit, sample_rate=1000)
+        scheduler.submit(SynthesisRequest(key="a0", session_id="a", text="x"))
+        self._run(scheduler)
+        self.assertEqual(self.outputs, [("a0", 100), ("a0", None)])
+
+
+if __name__ == '__main__':
+    unittest.main()
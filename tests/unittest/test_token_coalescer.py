@@ -0,0 +1,44 @@
+import unittest
+
+from handlers.llm.openai_compatible.token_coalescer import TokenCoalescer
+
+
+class TestTokenCoalescer(unittest.TestCase):
+    def test_first_chunk_immediate(self):
+        coalescer = TokenCoalescer(flush_chars=16, flush_interval_ms=200)
+        self.assertEqual(coalescer.push("你", now=0.0), "你")
+        self.assertIsNone(coalescer.push("好", now=0.01))
+
+    def test_flush_on_punctuation(self):
+        coalescer = TokenCoalescer(flush_chars=16, flush_interval_ms=200)
+        coalescer.push("嗯", now=0.0)
+        self.assertIsNone(coalescer.push("今天", now=0.01))
+        self.assertEqual(coalescer.push("天气，不", now=0.02), "今天天气，")
+        self.assertEqual(coalescer.flush(), "不")
+        self.assertIsNone(coalescer.flush())
+
+    def test_flush_on_chars_and_interval(self):
+        coalescer = TokenCoalescer(flush_chars=4, flush_interval_ms=100)
+        coalescer.push("a", now=0.0)
+        self.assertIsNone(coalescer.push("bc", now=0.01))
+        self.assertEqual(coalescer.push("de", now=0.02), "bcde")
+        self.assertIsNone(coalescer.push("f", now=0.05))
+        self.assertEqual(coalescer.push("g", now=0.2), "fg")
+
+    def test_disabled(self):
+        coalescer = TokenCoalescer(flush_chars=0)
+        tokens = ["你", "好", "呀"]
+        self.assertEqual([coalescer.push(token) for token in tokens], tokens)
+
+    def test_message_count_reduced(self):
+        coalescer = TokenCoalescer(flush_chars=16, flush_interval_ms=200)
+        reply = "我理解你现在的感受，最近压力确实比较大。我们可以一起想想有哪些办法能让你放松一些！"
+        outputs = [coalescer.push(token, now=0.0) for token in reply]
+        outputs.append(coalescer.flush())
+        emitted = [text for text in outputs if text is not None]
+        self.assertEqual("".join(emitted), reply)
+        self.assertLessEqual(len(emitted), len(reply) // 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
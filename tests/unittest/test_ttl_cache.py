@@ -0,0 +1,77 @@
+import threading
+import time
+import unittest
+
+from engine_utils.ttl_cache import TTLCache
+
+
+class TestTTLCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = TTLCache("test_cache", max_size=2, ttl=0.2, stale_ttl=0.5)
+
+    def tearDown(self):
+        self.cache.shutdown()
+
+    def test_hit_after_load(self):
+        calls = []
+        loader = lambda: calls.append(1) or "value"
+        self.assertEqual(self.cache.get("a", loader), "value")
+        self.assertEqual(self.cache.get("a", loader), "value")
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(self.cache.get_stats()["hit"], 1)
+
+    def test_lru_eviction(self):
+        self.cache.put("a", 1)
+        self.cache.put("b", 2)
+        self.cache.get("a", lambda: None)
+        self.cache.put("c", 3)
+        self.assertIsNone(self.cache.peek("b"))
+        self.assertEqual(self.cache.peek("a"), 1)
+        self.assertEqual(self.cache.peek("c"), 3)
+
+    def test_stale_while_revalidate(self):
+        self.cache.put("a", "old")
+        time.sleep(0.25)
+        refreshed = threading.Event()
+
+        def loader():
+            refreshed.set()
+            return "new"
+        self.assertEqual(self.cache.get("a", loader), "old")
+        self.assertTrue(refreshed.wait(1))
+        time.sleep(0.05)
+        self.assertEqual(self.cache.get("a", loader), "new")
+
+    def test_single_flight(self):
+        calls = []
+
+        def loader():
+            calls.append(1)
+            time.sleep(0.1)
+            return "value"
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.cache.get("a", loader))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ["value"] * 5)
+        self.assertEqual(len(calls), 1)
+
+    def test_bounded_wait_on_miss(self):
+        def loader():
+            time.sleep(0.3)
+            return "value"
+        start = time.monotonic()
+        self.assertEqual(self.cache.get("a", loader, timeout=0.05, default=""), "")
+        self.assertLess(time.monotonic() - start, 0.2)
+        time.sleep(0.35)
+        self.assertEqual(self.cache.peek("a"), "value")
+
+    def test_failed_load_not_cached(self):
+        self.assertEqual(self.cache.get("a", lambda: None, default=""), "")
+        self.assertIsNone(self.cache.peek("a"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from engine_utils.tts_cache import TTSCache, iter_audio_chunks
+
+
+def _audio(value: float, samples: int = 1000) -> np.ndarray:
+    return np.full((1, samples), value, dtype=np.float32)
+
+
+class TestTTSCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+
+    def test_key_normalizes_text_and_separates_voices(self):
+        key = TTSCache.make_key("edgetts", "zh-CN-XiaoxiaoNeural", 24000, " 你好， 欢迎\n光临。")
+        self.assertEqual(key, TTSCache.make_key("edgetts", "zh-CN-XiaoxiaoNeural", 24000, "你好， 欢迎 光临。"))
+        self.assertNotEqual(key, TTSCache.make_key("edgetts", "zh-CN-YunxiNeural", 24000, "你好， 欢迎 光临。"))
+        self.assertNotEqual(key, TTSCache.make_key("edgetts", "zh-CN-XiaoxiaoNeural", 16000, "你好， 欢迎 光临。"))
+
+    def test_memory_lru_eviction_by_size(self):
+        # 每条 4000 字节，内存只能放两条
+        cache = TTSCache(memory_budget=8000)
+        cache.put("a", _audio(0.1))
+        cache.put("b", _audio(0.2))
+        self.assertIsNotNone(cache.get("a"))
+        cache.put("c", _audio(0.3))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNotNone(cache.get("c"))
+        stats = cache.get_stats()
+        self.assertEqual((stats["memory_hits"], stats["misses"], stats["evictions"]), (3, 1, 1))
+        self.assertEqual(stats["hit_rate"], 0.75)
+
+    def test_disk_tier_survives_restart(self):
+        cache = TTSCache(memory_budget=8000, disk_dir=self.temp_dir.name, disk_budget=1024 * 1024)
+        cache.put("greeting", _audio(0.5))
+        restarted = TTSCache(memory_budget=8000, disk_dir=self.temp_dir.name, disk_budget=1024 * 1024)
+        audio = restarted.get("greeting")
+        self.assertIsInstance(audio, np.memmap)
+        np.testing.assert_array_equal(audio, _audio(0.5))
+        chunks = list(iter_audio_chunks(audio, 300))
+        self.assertFalse(any(isinstance(chunk, np.memmap) for chunk in chunks))
+        np.testing.assert_array_equal(np.concatenate(chunks, axis=-1), _audio(0.5))
+        self.assertEqual(restarted.get_stats()["disk_hits"], 1)
+
+    def test_disk_hit_does_not_evict_memory_entries(self):
+        cache = TTSCache(memory_budget=8000, disk_dir=self.temp_dir.name, disk_budget=1024 * 1024)
+        cache.put("greeting", _audio(0.5))
+        restarted = TTSCache(memory_budget=8000, disk_dir=self.temp_dir.name, disk_budget=1024 * 1024)
+        restarted.put("a", _audio(0.1))
+        restarted.put("b", _audio(0.2))
+        # 磁盘命中的映射不进入内存层，内存层中的条目不被挤出
+        for _ in range(2):
+            self.assertIsInstance(restarted.get("greeting"), np.memmap)
+        self.assertIsNotNone(restarted.get("a"))
+        self.assertIsNotNone(restarted.get("b"))
+        stats = restarted.get_stats()
+        self.assertEqual((stats["disk_hits"], stats["memory_hits"], stats["evictions"]), (2, 2, 0))
+        self.assertEqual((stats["memory_entries"], stats["memory_bytes"]), (2, 8000))
+
+    def test_disk_eviction_and_dtype(self):
+        cache = TTSCache(memory_budget=0, disk_dir=self.temp_dir.name, disk_budget=9000)
+        pcm = (np.arange(2000) % 100).astype(np.int16)
+        cache.put("pcm", pcm)
+        cache.put("a", _audio(0.1))
+        cache.put("b", _audio(0.2))
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir.name, "pcm.npy")))
+        self.assertIsNone(cache.get("pcm"))
+        self.assertLessEqual(cache.get_stats()["disk_bytes"], 9000)
+        cache.put("pcm", pcm)
+        self.assertEqual(cache.get("pcm").tobytes(), pcm.tobytes())
+
+    def test_iter_audio_chunks(self):
+        chunks = list(iter_audio_chunks(_audio(0.1, 2500), 1000))
+        self.assertEqual([chunk.shape[-1] for chunk in chunks], [1000, 1000, 500])
+
+
+if __name__ == '__main__':
+    unittest.main()